@@ -0,0 +1,324 @@
+"""
+Admission Control for Movie Reservation System
+Per-show waiting room that lets a bounded number of checkouts reach the database at once
+"""
+
+import math
+import os
+import re
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from booking import begin_immediate
+from db import get_pool
+
+ADMITTED = 'admitted'
+QUEUED = 'queued'
+EARLY = 'early'
+FULL = 'full'
+UNAVAILABLE = 'unavailable'
+
+# A ticket waits in line, is called when a slot frees up, and holds the slot while its checkout runs
+WAITING = 'waiting'
+CALLED = 'called'
+ACTIVE = 'active'
+
+# Ticket ids end in S and the show id, so a poll opens only that show's file
+TICKET_SHOW = re.compile(r'^[0-9a-f]{32}S([0-9]+)$')
+
+ADMISSION_SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS admission_tickets (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        ticket_id TEXT NOT NULL UNIQUE,
+        show_id INTEGER NOT NULL,
+        user_id INTEGER NOT NULL,
+        state TEXT NOT NULL,
+        changed_at REAL NOT NULL,
+        last_seen REAL NOT NULL
+    )
+    ''',
+    'CREATE INDEX IF NOT EXISTS idx_admission_tickets_show ON admission_tickets (show_id, state, seq)',
+    'CREATE INDEX IF NOT EXISTS idx_admission_tickets_user ON admission_tickets (show_id, user_id)',
+    # Moving average of checkout time per show, for wait estimates
+    '''
+    CREATE TABLE IF NOT EXISTS admission_service_times (
+        show_id INTEGER PRIMARY KEY,
+        seconds REAL NOT NULL
+    )
+    ''',
+]
+
+class Admission:
+    """
+    Outcome of asking to check out: admitted now, queued with a ticket, early (ticket not called yet), full,
+    or unavailable when the show's line could not be read
+    """
+
+    __slots__ = ('status', 'ticket_id', 'position', 'wait')
+
+    def __init__(self, status, ticket_id=None, position=0, wait=0.0):
+        self.status = status
+        self.ticket_id = ticket_id
+        self.position = position
+        self.wait = wait
+
+    @property
+    def retry_after(self):
+        """Whole seconds a client should wait before trying again"""
+        return max(1, math.ceil(self.wait))
+
+class AdmissionController:
+    """
+    Each show admits at most max_active checkouts at a time. Further buyers get a
+    ticket and wait in line, polling for their position; when a slot frees up the
+    head of the line is admitted and has admit_window seconds to come back. Once
+    max_waiting people are in line, new buyers are turned away immediately.
+    Tickets that stop polling for poll_timeout seconds lose their place.
+    Each show's line and slots live in its own SQLite file under directory, shared by
+    every server process, so a ticket can be polled and redeemed on any worker and a
+    rush on one show never waits on another show's write lock. Polls only read unless
+    the line needs tidying. An admitted checkout's slot is a lease that lapses after
+    checkout_timeout seconds in case its worker died.
+    """
+
+    def __init__(self, directory, max_active=4, max_waiting=200, admit_window=30, poll_timeout=20,
+                 checkout_timeout=60, service_time=0.5):
+        self.directory = directory
+        self.max_active = max_active
+        self.max_waiting = max_waiting
+        self.admit_window = admit_window
+        self.poll_timeout = poll_timeout
+        self.checkout_timeout = checkout_timeout
+        self.default_service_time = service_time
+        self._ready = set()
+        self._lock = threading.Lock()
+
+    def database_for(self, show_id):
+        return os.path.join(self.directory, f'show_{int(show_id)}.db')
+
+    def _connect(self, show_id):
+        database = self.database_for(show_id)
+        if database not in self._ready:
+            os.makedirs(self.directory, exist_ok=True)
+        conn = get_pool(database).connect()
+        if database not in self._ready:
+            with self._lock:
+                if database not in self._ready:
+                    for statement in ADMISSION_SCHEMA:
+                        conn.execute(statement)
+                    conn.commit()
+                    self._ready.add(database)
+        return conn
+
+    @contextmanager
+    def _transaction(self, show_id):
+        """Connection inside a write transaction on the show's file, so no other process changes its line meanwhile"""
+        conn = self._connect(show_id)
+        try:
+            begin_immediate(conn)
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    def acquire(self, show_id, user_id, ticket_id=None, now=None):
+        """Ask for a checkout slot; an ADMITTED result must be paired with release() of its ticket"""
+        now = now or time.time()
+        with self._transaction(show_id) as conn:
+            self._expire(conn, show_id, now)
+            self._promote(conn, show_id, now)
+
+            ticket = None
+            if ticket_id:
+                ticket = conn.execute(
+                    'SELECT * FROM admission_tickets WHERE ticket_id = ? AND show_id = ? AND user_id = ? AND state != ?',
+                    (ticket_id, show_id, user_id, ACTIVE)
+                ).fetchone()
+            if ticket is None:
+                ticket = conn.execute(
+                    'SELECT * FROM admission_tickets WHERE show_id = ? AND user_id = ? AND state != ? ORDER BY seq LIMIT 1',
+                    (show_id, user_id, ACTIVE)
+                ).fetchone()
+
+            if ticket is not None:
+                if ticket['state'] == CALLED:
+                    # The slot was reserved when the ticket was called; the checkout now owns it
+                    conn.execute(
+                        'UPDATE admission_tickets SET state = ?, changed_at = ? WHERE seq = ?', (ACTIVE, now, ticket['seq'])
+                    )
+                    return Admission(ADMITTED, ticket['ticket_id'])
+                conn.execute('UPDATE admission_tickets SET last_seen = ? WHERE seq = ?', (now, ticket['seq']))
+                position = self._position(conn, ticket)
+                return Admission(EARLY, ticket['ticket_id'], position, self._estimate(conn, show_id, position))
+
+            waiting, used = self._counts(conn, show_id)
+            if not waiting and used < self.max_active:
+                return Admission(ADMITTED, self._issue(conn, show_id, user_id, ACTIVE, now))
+
+            if waiting >= self.max_waiting:
+                return Admission(FULL, wait=self._estimate(conn, show_id, waiting + 1))
+
+            ticket_id = self._issue(conn, show_id, user_id, WAITING, now)
+            return Admission(QUEUED, ticket_id, waiting + 1, self._estimate(conn, show_id, waiting + 1))
+
+    def release(self, show_id, ticket_id, seconds, now=None):
+        """Give back an admitted checkout's slot, recording how long it took"""
+        now = now or time.time()
+        with self._transaction(show_id) as conn:
+            conn.execute('DELETE FROM admission_tickets WHERE ticket_id = ? AND state = ?', (ticket_id, ACTIVE))
+            conn.execute('''
+                INSERT INTO admission_service_times (show_id, seconds) VALUES (?, ?)
+                ON CONFLICT (show_id) DO UPDATE SET seconds = 0.8 * seconds + 0.2 * ?
+            ''', (show_id, 0.8 * self.default_service_time + 0.2 * seconds, seconds))
+            self._expire(conn, show_id, now)
+            self._promote(conn, show_id, now)
+            if not conn.execute('SELECT 1 FROM admission_tickets WHERE show_id = ? LIMIT 1', (show_id,)).fetchone():
+                conn.execute('DELETE FROM admission_service_times WHERE show_id = ?', (show_id,))
+
+    def poll(self, ticket_id, user_id, now=None):
+        """Return (status, position, estimated wait) for a ticket, or None once it is unknown or expired"""
+        now = now or time.time()
+        match = TICKET_SHOW.match(ticket_id)
+        if not match:
+            return None
+        show_id = int(match.group(1))
+        if not os.path.exists(self.database_for(show_id)):
+            return None
+
+        conn = self._connect(show_id)
+        try:
+            ticket = conn.execute(
+                'SELECT * FROM admission_tickets WHERE ticket_id = ? AND user_id = ? AND state != ?',
+                (ticket_id, user_id, ACTIVE)
+            ).fetchone()
+            if ticket is None:
+                return None
+            if not self._needs_tidying(conn, ticket, now):
+                if ticket['state'] == CALLED:
+                    return ADMITTED, 0, 0.0
+                position = self._position(conn, ticket)
+                return QUEUED, position, self._estimate(conn, show_id, position)
+        finally:
+            conn.close()
+
+        with self._transaction(show_id) as conn:
+            ticket = conn.execute(
+                'SELECT * FROM admission_tickets WHERE ticket_id = ? AND user_id = ? AND state != ?',
+                (ticket_id, user_id, ACTIVE)
+            ).fetchone()
+            if ticket is None:
+                return None
+            conn.execute('UPDATE admission_tickets SET last_seen = ? WHERE seq = ?', (now, ticket['seq']))
+            self._expire(conn, ticket['show_id'], now)
+            self._promote(conn, ticket['show_id'], now)
+            ticket = conn.execute('SELECT * FROM admission_tickets WHERE seq = ?', (ticket['seq'],)).fetchone()
+            if ticket is None:
+                return None
+            if ticket['state'] == CALLED:
+                return ADMITTED, 0, 0.0
+            position = self._position(conn, ticket)
+            return QUEUED, position, self._estimate(conn, ticket['show_id'], position)
+
+    def stats(self, now=None):
+        """
+        Checkouts in progress (including called tickets) and people waiting, across all
+        shows and processes. Only files written recently enough to hold a live ticket are read.
+        """
+        now = now or time.time()
+        cutoff = now - max(self.poll_timeout, self.admit_window, self.checkout_timeout)
+        totals = {'active': 0, 'waiting': 0, 'shows': 0}
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return totals
+        for name in names:
+            match = re.match(r'^show_([0-9]+)\.db$', name)
+            if not match or self._last_write(os.path.join(self.directory, name)) < cutoff:
+                continue
+            conn = self._connect(int(match.group(1)))
+            try:
+                row = conn.execute('''
+                    SELECT COALESCE(SUM(state != ?), 0) AS active, COALESCE(SUM(state = ?), 0) AS waiting
+                    FROM admission_tickets
+                ''', (WAITING, WAITING)).fetchone()
+            finally:
+                conn.close()
+            totals['active'] += row['active']
+            totals['waiting'] += row['waiting']
+            totals['shows'] += 1 if row['active'] or row['waiting'] else 0
+        return totals
+
+    @staticmethod
+    def _last_write(path):
+        """Latest modification time of a database file or its write-ahead log"""
+        times = [os.path.getmtime(candidate) for candidate in (path, path + '-wal') if os.path.exists(candidate)]
+        return max(times, default=0)
+
+    def _needs_tidying(self, conn, ticket, now):
+        """Whether a poll has to write: its heartbeat is going stale, a ticket has lapsed or a free slot can be handed out"""
+        if ticket['state'] == WAITING and ticket['last_seen'] < now - self.poll_timeout / 2:
+            return True
+        show_id = ticket['show_id']
+        lapsed = conn.execute('''
+            SELECT 1 FROM admission_tickets
+            WHERE show_id = ? AND ((state = ? AND last_seen < ?) OR (state = ? AND changed_at < ?)
+                                   OR (state = ? AND changed_at < ?))
+            LIMIT 1
+        ''', (show_id, WAITING, now - self.poll_timeout, CALLED, now - self.admit_window,
+              ACTIVE, now - self.checkout_timeout)).fetchone()
+        if lapsed:
+            return True
+        waiting, used = self._counts(conn, show_id)
+        return waiting > 0 and used < self.max_active
+
+    def _issue(self, conn, show_id, user_id, state, now):
+        ticket_id = f'{uuid.uuid4().hex}S{show_id}'
+        conn.execute(
+            'INSERT INTO admission_tickets (ticket_id, show_id, user_id, state, changed_at, last_seen) VALUES (?, ?, ?, ?, ?, ?)',
+            (ticket_id, show_id, user_id, state, now, now)
+        )
+        return ticket_id
+
+    def _counts(self, conn, show_id):
+        """(people waiting, slots taken by called tickets and running checkouts) for a show"""
+        row = conn.execute('''
+            SELECT COALESCE(SUM(state = ?), 0) AS waiting, COALESCE(SUM(state != ?), 0) AS used
+            FROM admission_tickets WHERE show_id = ?
+        ''', (WAITING, WAITING, show_id)).fetchone()
+        return row['waiting'], row['used']
+
+    def _position(self, conn, ticket):
+        return conn.execute(
+            'SELECT COUNT(*) FROM admission_tickets WHERE show_id = ? AND state = ? AND seq <= ?',
+            (ticket['show_id'], WAITING, ticket['seq'])
+        ).fetchone()[0]
+
+    def _estimate(self, conn, show_id, position):
+        """Seconds until the given place in line is called, from the show's recent checkout times"""
+        row = conn.execute('SELECT seconds FROM admission_service_times WHERE show_id = ?', (show_id,)).fetchone()
+        return math.ceil(position / self.max_active) * (row['seconds'] if row else self.default_service_time)
+
+    def _expire(self, conn, show_id, now):
+        """Drop tickets that stopped polling, called tickets that never came back and lapsed checkout leases"""
+        conn.execute('''
+            DELETE FROM admission_tickets
+            WHERE show_id = ? AND ((state = ? AND last_seen < ?) OR (state = ? AND changed_at < ?)
+                                   OR (state = ? AND changed_at < ?))
+        ''', (show_id, WAITING, now - self.poll_timeout, CALLED, now - self.admit_window,
+              ACTIVE, now - self.checkout_timeout))
+
+    def _promote(self, conn, show_id, now):
+        """Call tickets from the front of the line while slots are free"""
+        waiting, used = self._counts(conn, show_id)
+        free = min(self.max_active - used, waiting)
+        if free > 0:
+            conn.execute('''
+                UPDATE admission_tickets SET state = ?, changed_at = ?
+                WHERE seq IN (SELECT seq FROM admission_tickets WHERE show_id = ? AND state = ? ORDER BY seq LIMIT ?)
+            ''', (CALLED, now, show_id, WAITING, free))
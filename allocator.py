@@ -0,0 +1,82 @@
+"""
+Seat Allocator for Movie Reservation System
+Finds the best block of adjacent free seats in a show's occupancy bitmap
+"""
+
+import threading
+
+class SeatAllocator:
+    """
+    Best-available allocation over the same row-major bitmap SeatMapCache uses
+    (bit row_index * len(cols) + col_index is set when that seat is taken).
+    A block is N adjacent seats in one row; blocks whose centre is nearest the
+    centre of the hall win.
+    """
+
+    def __init__(self, rows, cols):
+        self.rows = list(rows)
+        self.cols = list(cols)
+        self.width = len(self.cols)
+        self.full_mask = (1 << len(self.rows) * self.width) - 1
+        self.seat_bits = {seat: 1 << i for i, seat in enumerate(f"{row}{col}" for row in self.rows for col in self.cols)}
+        self._candidates = {}
+        self._lock = threading.Lock()
+
+    def to_bitmap(self, seats):
+        """Convert an iterable of seat ids into an occupancy bitmap"""
+        bitmap = 0
+        for seat in seats:
+            bitmap |= self.seat_bits.get(seat, 0)
+        return bitmap
+
+    def _ranked(self, n):
+        """Valid block starts for party size n: (start mask, bit index list) best first"""
+        ranked = self._candidates.get(n)
+        if ranked is not None:
+            return ranked
+
+        height = len(self.rows)
+        starts_mask = 0
+        scored = []
+        for r in range(height):
+            row_offset = abs(2 * r - (height - 1))
+            for c in range(self.width - n + 1):
+                col_offset = abs(2 * c + n - self.width)
+                bit = r * self.width + c
+                starts_mask |= 1 << bit
+                scored.append((row_offset + col_offset, col_offset, r, c, bit))
+        scored.sort()
+        ranked = (starts_mask, [entry[-1] for entry in scored])
+
+        with self._lock:
+            self._candidates[n] = ranked
+        return ranked
+
+    def preload(self):
+        """Rank the candidate blocks of every party size up front instead of on first use"""
+        for n in range(1, self.width + 1):
+            self._ranked(n)
+
+    def block_starts(self, occupied, n):
+        """Bitmap with bit i set when seats i .. i+n-1 are free and in the same row"""
+        if n < 1 or n > self.width:
+            return 0
+        starts_mask, _ = self._ranked(n)
+        free = ~occupied & self.full_mask
+        runs, length = free, 1
+        while length < n:
+            step = min(length, n - length)
+            runs &= runs >> step
+            length += step
+        return runs & starts_mask
+
+    def best_block(self, occupied, n):
+        """Return the seat ids of the best free block of n seats, or None if there is none"""
+        runs = self.block_starts(occupied, n)
+        if not runs:
+            return None
+        for bit in self._ranked(n)[1]:
+            if runs >> bit & 1:
+                row, col = divmod(bit, self.width)
+                return [f"{self.rows[row]}{self.cols[col + i]}" for i in range(n)]
+        return None
@@ -3,43 +3,251 @@ Movie Reservation System - Main Flask Application
 Full-stack web application for movie ticket booking
 """
 
+import bisect
+import gc
+import hashlib
+import hmac
+import heapq
+import mimetypes
 import os
+import queue
 import re
 import sqlite3
+import time
 import uuid
 from functools import wraps
-from datetime import datetime
+from datetime import date, datetime, timedelta
 
-from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify
-from flask_mail import Mail, Message
+from flask import (Blueprint, Flask, Response, abort, current_app, g, render_template, request, redirect, url_for,
+                   session, flash, jsonify, send_from_directory, stream_with_context)
+from flask_mail import Mail
+from werkzeug.local import LocalProxy
 from werkzeug.security import generate_password_hash, check_password_hash
 from dotenv import load_dotenv
+from markupsafe import Markup
+
+from admission import ADMITTED, EARLY, FULL, QUEUED, UNAVAILABLE, Admission, AdmissionController
+from allocator import SeatAllocator
+from archive import HistoryArchive
+from assets import DIST_DIR, AssetManifest
+from booking import (SeatUnavailable, claim_batch, claim_best_seats, claim_seats, find_idempotent_booking,
+                     get_active_holds, get_occupancy, hold_seats, record_idempotency_key, release_hold)
+from catalog import CatalogCache
+from compression import encode, negotiate
+from db import close_pools, get_pool, set_statement_observer, sqlite_threads
+from events import SeatEventBroker, format_sse
+from export import EXPORTS, FORMATS, export
+from fragments import FragmentCache
+from mail_queue import MailQueue, enqueue_email
+from metrics import (admission_rejections, booking_conflicts, http_request_duration, http_requests, normalize_sql,
+                     registry, slow_queries, sql_statement_duration, sql_statement_rows, statement_name)
+from offload import BoundedPool, PoolSaturated
+from pagination import decode_cursor, encode_cursor, page_size
+from posters import VARIANTS as POSTER_VARIANTS, PosterCache, is_remote, poster_key
+from search import has_search_index, search_movies
+from seat_cache import SeatMapCache
+from shows import (SCHEDULE_DAYS, format_start_time, get_show, get_shows, get_shows_by_date, get_upcoming_shows,
+                   schedule_shows, show_is_open, show_label)
+from storage import create_storage
 
 VALID_ROWS = ['A', 'B', 'C', 'D', 'E', 'F', 'G', 'H']
 VALID_COLS = list(range(1, 11))
 SEAT_PATTERN = re.compile(r'^[A-H]([1-9]|10)$')
+IDEMPOTENCY_KEY_PATTERN = re.compile(r'^[A-Za-z0-9_.:-]{1,100}$')
+SEATS_PER_SHOW = len(VALID_ROWS) * len(VALID_COLS)
+LOOPBACK_ADDRESSES = ('127.0.0.1', '::1')
 
 load_dotenv()
 
-app = Flask(__name__)
-app.secret_key = os.getenv('SESSION_SECRET', 'dev-secret-key-change-in-production')
+SEAT_HOLD_TTL = int(os.getenv('SEAT_HOLD_TTL', 300))
+HOLD_MAX_SEATS = len(VALID_COLS)
+IDEMPOTENCY_TTL = int(os.getenv('IDEMPOTENCY_TTL', 24 * 3600))
+ADMIN_EMAILS = {email.strip().lower() for email in os.getenv('ADMIN_EMAILS', '').split(',') if email.strip()}
+# Requests one server process serves at once (gunicorn.conf.py reads the same setting)
+SERVING_CONNECTIONS = int(os.getenv('WEB_CONNECTIONS', 1000))
+AUTH_WORKERS = int(os.getenv('AUTH_WORKERS', max(1, (os.cpu_count() or 2) // 2)))
+# A few hashes per worker clear in well under AUTH_TIMEOUT; anything deeper fails fast instead of holding a request
+AUTH_MAX_PENDING = int(os.getenv('AUTH_MAX_PENDING', max(1, min(AUTH_WORKERS * 4, SERVING_CONNECTIONS // 16))))
+AUTH_TIMEOUT = float(os.getenv('AUTH_TIMEOUT', 2))
+AUTH_RETRY_AFTER = 5
+SEARCH_PAGE_SIZE = 20
+SEARCH_MAX_LIMIT = 100
+SEAT_STREAM_HEARTBEAT = 15
+MOVIES_PAGE_SIZE = 50
+MOVIES_MAX_LIMIT = 200
+MY_BOOKINGS_PAGE_SIZE = 12
+BATCH_MAX_ITEMS = 50
+HOME_SHOWS_PER_MOVIE = 4
+ADMISSION_POLL_INTERVAL = 2
+ASSET_MAX_AGE = 365 * 24 * 3600
+COMPRESS_MIN_SIZE = 500
+COMPRESS_MIMETYPES = ('application/json', 'text/html')
+COMPRESS_LEVELS = {'br': 5, 'gzip': 6}
+POSTER_MISSING_MAX_AGE = 300
+SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', 100))
+
+def default_config():
+    """Settings create_app starts from: mail from the environment, plus where the application keeps its data"""
+    return {
+        'SECRET_KEY': os.getenv('SESSION_SECRET', 'dev-secret-key-change-in-production'),
+        'MAIL_SERVER': os.getenv('MAIL_SERVER', 'smtp.gmail.com'),
+        'MAIL_PORT': int(os.getenv('MAIL_PORT', 587)),
+        'MAIL_USE_TLS': os.getenv('MAIL_USE_TLS', 'True').lower() == 'true',
+        'MAIL_USERNAME': os.getenv('MAIL_USERNAME', ''),
+        'MAIL_PASSWORD': os.getenv('MAIL_PASSWORD', ''),
+        'MAIL_DEFAULT_SENDER': os.getenv('MAIL_DEFAULT_SENDER', 'noreply@moviereservation.com'),
+        'DATABASE': 'database.db',
+        'STORAGE_BACKEND': os.getenv('STORAGE_BACKEND', 'single'),
+        'SHARD_DIR': os.getenv('SHARD_DIR', 'shards'),
+        'HISTORY_DATABASE': os.getenv('HISTORY_DATABASE', 'history.db'),
+        'ADMISSION_DIR': os.getenv('ADMISSION_DIR', 'admission'),
+        'POSTER_CACHE_DIR': os.getenv('POSTER_CACHE_DIR', 'poster_cache'),
+        'METRICS_TOKEN': os.getenv('METRICS_TOKEN', ''),
+    }
+
+def create_admission_control(directory):
+    """Waiting-room controller keeping each show's line in a file under directory, with limits from the environment"""
+    return AdmissionController(
+        directory,
+        max_active=int(os.getenv('ADMISSION_MAX_ACTIVE', 4)),
+        max_waiting=int(os.getenv('ADMISSION_MAX_WAITING', 200)),
+        admit_window=float(os.getenv('ADMISSION_WINDOW', 30)),
+        checkout_timeout=float(os.getenv('ADMISSION_CHECKOUT_TIMEOUT', 60))
+    )
+
+class Reservations:
+    """
+    Everything one application instance owns - storage, caches, worker pools and
+    the mail queue - built from its config and kept in app.extensions['reservations']
+    """
+
+    def __init__(self, app):
+        config = app.config
+        self.database = config['DATABASE']
+        self.storage = create_storage(config['STORAGE_BACKEND'], config['DATABASE'], config['SHARD_DIR'])
+        self.search_index_available = None
+        self.catalog_cache = CatalogCache(app.json.dumps)
+        self.seat_cache = SeatMapCache(VALID_ROWS, VALID_COLS, ttl=float(os.getenv('SEAT_CACHE_TTL', 5)),
+                                       max_shows=int(os.getenv('SEAT_CACHE_SHOWS', 5000)))
+        self.seat_events = SeatEventBroker()
+        self.seat_allocator = SeatAllocator(VALID_ROWS, VALID_COLS)
+        # Password hashing is deliberately slow; a few processes do all of it so a login rush cannot take every core
+        self.auth_pool = BoundedPool('auth', AUTH_WORKERS, max_pending=AUTH_MAX_PENDING, processes=True)
+        self.history = HistoryArchive(config['HISTORY_DATABASE'])
+        self.admission_control = create_admission_control(config['ADMISSION_DIR'])
+        self.asset_manifest = AssetManifest()
+        self.poster_cache = PosterCache(config['POSTER_CACHE_DIR'])
+        self.seat_fragments = FragmentCache(max_bytes=int(os.getenv('SEAT_FRAGMENT_CACHE_BYTES', 4 * 1024 * 1024)))
+        self.mail = Mail(app)
+        self.mail_queue = MailQueue(app, self.mail, self.storage, workers=int(os.getenv('MAIL_QUEUE_WORKERS', 1)),
+                                    retention=float(os.getenv('OUTBOX_RETENTION', 7 * 24 * 3600)))
+        self.worker_pools = (self.auth_pool, self.storage.pool, sqlite_threads, self.mail_queue.smtp_threads)
+
+def reservations():
+    """The Reservations of the application handling the current request"""
+    return current_app.extensions['reservations']
+
+# Views reach the current application's objects through these names
+storage = LocalProxy(lambda: reservations().storage)
+catalog_cache = LocalProxy(lambda: reservations().catalog_cache)
+seat_cache = LocalProxy(lambda: reservations().seat_cache)
+seat_events = LocalProxy(lambda: reservations().seat_events)
+seat_allocator = LocalProxy(lambda: reservations().seat_allocator)
+auth_pool = LocalProxy(lambda: reservations().auth_pool)
+history = LocalProxy(lambda: reservations().history)
+admission_control = LocalProxy(lambda: reservations().admission_control)
+asset_manifest = LocalProxy(lambda: reservations().asset_manifest)
+poster_cache = LocalProxy(lambda: reservations().poster_cache)
+seat_fragments = LocalProxy(lambda: reservations().seat_fragments)
+mail_queue = LocalProxy(lambda: reservations().mail_queue)
 
-app.config['MAIL_SERVER'] = os.getenv('MAIL_SERVER', 'smtp.gmail.com')
-app.config['MAIL_PORT'] = int(os.getenv('MAIL_PORT', 587))
-app.config['MAIL_USE_TLS'] = os.getenv('MAIL_USE_TLS', 'True').lower() == 'true'
-app.config['MAIL_USERNAME'] = os.getenv('MAIL_USERNAME', '')
-app.config['MAIL_PASSWORD'] = os.getenv('MAIL_PASSWORD', '')
-app.config['MAIL_DEFAULT_SENDER'] = os.getenv('MAIL_DEFAULT_SENDER', 'noreply@moviereservation.com')
+bp = Blueprint('main', __name__)
 
-mail = Mail(app)
+@bp.app_template_filter('show_date')
+def format_show_date(value):
+    """Jinja filter rendering '2026-10-18' as 'Sunday, 18 October'"""
+    return f"{date.fromisoformat(value):%A, %d %B}"
 
-DATABASE = 'database.db'
+bp.add_app_template_filter(format_start_time, 'start_time')
+
+@bp.app_template_global()
+def asset_url(filename):
+    """URL of a static file's fingerprinted copy, or its plain static URL until `python assets.py` has run"""
+    entry = asset_manifest.lookup(filename)
+    if entry:
+        return url_for('main.hashed_asset', filename=entry['path'])
+    return url_for('static', filename=filename)
+
+@bp.app_template_global()
+def poster_src(poster_url, variant='card'):
+    """Local URL of a movie poster at one of POSTER_VARIANTS, or the no-poster image when there is none"""
+    if is_remote(poster_url):
+        return url_for('main.poster_image', key=poster_key(poster_url), variant=variant)
+    return asset_url('images/no-poster.png')
 
 def get_db_connection():
-    """Create and return a database connection"""
-    conn = sqlite3.connect(DATABASE)
-    conn.row_factory = sqlite3.Row
-    return conn
+    """Check out a pooled catalog connection (users, movies, shows); close() returns it to the pool"""
+    return storage.connect()
+
+def observe_statement(conn, sql, params, seconds, rows):
+    """Record SQL timing and log the query plan of statements slower than SLOW_QUERY_MS"""
+    name = statement_name(sql)
+    sql_statement_duration.observe(seconds, name)
+    sql_statement_rows.inc(name, amount=rows)
+    if seconds * 1000 < SLOW_QUERY_MS:
+        return
+    
+    slow_queries.inc(name)
+    statement = normalize_sql(sql)
+    plan = ''
+    if params is not None and statement.split(' ', 1)[0].upper() in ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE'):
+        try:
+            plan = '\n'.join(f"  {row[3]}" for row in conn.execute(f'EXPLAIN QUERY PLAN {sql}', params))
+        except sqlite3.Error as e:
+            plan = f"  (no plan: {e})"
+    print(f"Slow query ({seconds * 1000:.1f} ms, {rows} rows): {statement}" + (f"\n{plan}" if plan else ''))
+
+set_statement_observer(observe_statement)
+
+# Scrapes run inside a request, so each gauge reads the objects of the application serving it
+registry.gauge('db_pool_connections_in_use', 'Pooled SQLite connections checked out',
+               lambda: get_pool(reservations().database).stats()['in_use'])
+registry.gauge('db_pool_connections_idle', 'Pooled SQLite connections waiting for reuse',
+               lambda: get_pool(reservations().database).stats()['idle'])
+registry.gauge('admission_active_checkouts', 'Checkouts admitted past the waiting room and not finished',
+               lambda: admission_control.stats()['active'])
+registry.gauge('admission_waiting', 'Buyers waiting in a show queue', lambda: admission_control.stats()['waiting'])
+worker_pools = LocalProxy(lambda: reservations().worker_pools)
+registry.gauge('worker_pool_queued_jobs', 'Jobs waiting for a worker in each offload pool',
+               lambda: {(pool.name,): pool.stats()['queued'] for pool in worker_pools}, ('pool',))
+registry.gauge('worker_pool_running_jobs', 'Jobs being run by each offload pool',
+               lambda: {(pool.name,): pool.stats()['running'] for pool in worker_pools}, ('pool',))
+registry.gauge('worker_pool_workers', 'Concurrency limit of each offload pool',
+               lambda: {(pool.name,): pool.workers for pool in worker_pools}, ('pool',))
+registry.counter_callback('worker_pool_rejected_total', 'Jobs refused because an offload pool was saturated',
+                          lambda: {(pool.name,): pool.stats().get('rejected', 0) for pool in worker_pools}, ('pool',))
+registry.gauge('email_outbox_pending', 'Outbox emails waiting for the mail queue workers',
+               lambda: mail_queue.stats()['pending'])
+registry.gauge('seat_stream_subscribers', 'Open seat map event streams', lambda: seat_events.subscriber_count())
+registry.counter_callback('seat_fragment_cache_hits_total', 'Seat grids served from the fragment cache',
+                          lambda: seat_fragments.stats()['hits'])
+registry.counter_callback('seat_fragment_cache_misses_total', 'Seat grids rendered because they were not cached',
+                          lambda: seat_fragments.stats()['misses'])
+registry.gauge('seat_fragment_cache_bytes', 'Memory held by cached seat grids', lambda: seat_fragments.stats()['bytes'])
+
+@bp.before_app_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@bp.after_app_request
+def record_request_metrics(response):
+    """Time every request by its route pattern, so /seats/1 and /seats/2 share a series"""
+    started = g.pop('request_started', None)
+    if started is not None:
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        http_request_duration.observe(time.perf_counter() - started, endpoint, request.method)
+        http_requests.inc(endpoint, request.method, response.status_code)
+    return response
 
 def login_required(f):
     """Decorator to require login for certain routes"""
@@ -47,29 +255,73 @@ def login_required(f):
     def decorated_function(*args, **kwargs):
         if 'user_id' not in session:
             flash('Please login to continue.', 'warning')
-            return redirect(url_for('login', next=request.url))
+            return redirect(url_for('.login', next=request.url))
+        return f(*args, **kwargs)
+    return decorated_function
+
+def admin_required(f):
+    """Decorator limiting a route to logged-in users listed in ADMIN_EMAILS"""
+    @wraps(f)
+    @login_required
+    def decorated_function(*args, **kwargs):
+        if session.get('user_email', '').lower() not in ADMIN_EMAILS:
+            return jsonify({'error': 'Admin access required.'}), 403
         return f(*args, **kwargs)
     return decorated_function
 
+def mark_seats_taken(show_id, seats):
+    """Record newly booked or held seats in the cache and notify seat map listeners"""
+    seat_cache.mark_booked(show_id, seats)
+    seat_fragments.invalidate(show_id)
+    seat_events.publish(show_id, 'taken', seats)
+
+def mark_seats_free(show_id, seats):
+    """Record released seats in the cache and notify seat map listeners"""
+    seat_cache.mark_free(show_id, seats)
+    seat_fragments.invalidate(show_id)
+    seat_events.publish(show_id, 'freed', seats)
+
 def validate_seat(seat):
     """Validate seat format (e.g., A1, B10, H5)"""
     return bool(SEAT_PATTERN.match(seat.upper()))
 
-def validate_showtime(showtime, movie_showtimes):
-    """Validate that showtime exists for the movie"""
-    valid_times = [s.strip() for s in movie_showtimes.split(',')]
-    return showtime.strip() in valid_times
+def parse_seats(seats):
+    """Split a comma-separated seat string into normalized seat ids"""
+    return list(dict.fromkeys(s.strip().upper() for s in seats.split(',') if s.strip()))
 
-def send_booking_email(user_email, user_name, booking_details, is_cancellation=False):
-    """Send booking confirmation or cancellation email"""
-    try:
-        if not app.config['MAIL_USERNAME']:
-            print("Email not configured. Skipping email send.")
-            return False
-        
-        if is_cancellation:
-            subject = f"Booking Cancelled - {booking_details['movie_title']}"
-            template = f"""
+def get_booked_seat_bitmap(show_id):
+    """Return the occupancy bitmap for a show, loading it from the database on a miss; None if there is no such show"""
+    def load():
+        conn = get_db_connection()
+        exists = conn.execute('SELECT 1 FROM shows WHERE id = ?', (show_id,)).fetchone()
+        conn.close()
+        if not exists:
+            return None
+        conn = storage.connect_for_show(show_id)
+        rows = conn.execute('SELECT seat FROM booked_seats WHERE show_id = ?', (show_id,)).fetchall()
+        held = get_active_holds(conn, show_id)
+        conn.close()
+        return [row['seat'] for row in rows] + held
+    
+    return seat_cache.get(show_id, load)
+
+def get_seats_left(shows):
+    """Return {show_id: seats left} for many shows from the occupancy counters, one query per database holding them"""
+    booked = {}
+    for counts in storage.scatter_shows(shows, get_occupancy):
+        for show_id, count in counts.items():
+            booked[show_id] = booked.get(show_id, 0) + count
+    return {show['id']: max(show['capacity'] - booked.get(show['id'], 0), 0) for show in shows}
+
+def mail_configured():
+    """Whether outbound email has somewhere to go"""
+    return bool(current_app.config['MAIL_USERNAME']) or current_app.config['MAIL_SERVER'] in ('localhost', '127.0.0.1')
+
+def build_booking_email(user_name, booking_details, is_cancellation=False):
+    """Build the subject and body of a booking confirmation or cancellation email"""
+    if is_cancellation:
+        subject = f"Booking Cancelled - {booking_details['movie_title']}"
+        template = f"""
 Dear {user_name},
 
 Your booking has been successfully cancelled.
@@ -86,10 +338,10 @@ Thank you for using Movie Reservation System!
 
 Best regards,
 Movie Reservation Team
-            """
-        else:
-            subject = f"Booking Confirmed - {booking_details['movie_title']}"
-            template = f"""
+        """
+    else:
+        subject = f"Booking Confirmed - {booking_details['movie_title']}"
+        template = f"""
 Dear {user_name},
 
 Your booking has been confirmed!
@@ -107,90 +359,389 @@ Thank you for choosing Movie Reservation System!
 
 Best regards,
 Movie Reservation Team
-            """
-        
-        msg = Message(subject, recipients=[user_email])
-        msg.body = template
-        mail.send(msg)
-        return True
-    except Exception as e:
-        print(f"Error sending email: {e}")
+        """
+    return subject, template
+
+def build_batch_email(user_name, bookings):
+    """Build one summary email covering every booking made by a batch request"""
+    lines = '\n'.join(
+        f"- {b['booking_id']}: {b['movie_title']}, {b['showtime']}, seats {b['seats']}"
+        for b in bookings
+    )
+    subject = f"Bookings Confirmed - {len(bookings)} booking{'s' if len(bookings) != 1 else ''}"
+    template = f"""
+Dear {user_name},
+
+Your bookings have been confirmed!
+
+Bookings:
+{lines}
+
+Please arrive at least 15 minutes before each showtime.
+
+Thank you for choosing Movie Reservation System!
+
+Best regards,
+Movie Reservation Team
+    """
+    return subject, template
+
+def queue_booking_email(conn, user_email, user_name, booking_details, is_cancellation=False):
+    """Write a booking email to the outbox as part of the caller's transaction"""
+    if not mail_configured():
+        print("Email not configured. Skipping email send.")
         return False
+    
+    subject, body = build_booking_email(user_name, booking_details, is_cancellation)
+    enqueue_email(conn, user_email, subject, body)
+    return True
 
-@app.route('/')
+@bp.route('/')
 def index():
     """Homepage - Display all movies"""
     conn = get_db_connection()
-    movies = conn.execute('SELECT * FROM movies ORDER BY title').fetchall()
+    catalog = catalog_cache.get(conn)
+    today = date.today()
+    upcoming = get_shows_by_date(conn, today.isoformat(), (today + timedelta(days=1)).isoformat())
     conn.close()
-    return render_template('index.html', movies=movies)
+    
+    showtimes = {}
+    for show in upcoming:
+        movie_shows = showtimes.setdefault(show['movie_id'], [])
+        if len(movie_shows) < HOME_SHOWS_PER_MOVIE and show_is_open(show):
+            movie_shows.append(show)
+    seats_left = get_seats_left([show for movie_shows in showtimes.values() for show in movie_shows])
+    return render_template('index.html', movies=catalog.movies, showtimes=showtimes, seats_left=seats_left)
 
-@app.route('/api/movies')
+@bp.route('/api/movies')
 def api_movies():
     """API endpoint to get all movies"""
     conn = get_db_connection()
-    movies = conn.execute('SELECT * FROM movies ORDER BY title').fetchall()
+    catalog = catalog_cache.get(conn)
     conn.close()
-    return jsonify([dict(movie) for movie in movies])
+    
+    if 'limit' in request.args or 'cursor' in request.args:
+        limit = page_size(request.args.get('limit', type=int), MOVIES_PAGE_SIZE, MOVIES_MAX_LIMIT)
+        after = decode_cursor(request.args.get('cursor'), (str, int))
+        if request.args.get('cursor') and after is None:
+            return jsonify({'error': 'Invalid cursor.'}), 400
+        
+        start = bisect.bisect_right(catalog.keys, tuple(after)) if after else 0
+        movies = catalog.movies[start:start + limit]
+        response = jsonify(movies)
+        if start + limit < len(catalog.movies):
+            next_url = url_for('.api_movies', limit=limit, cursor=encode_cursor(movies[-1]['title'], movies[-1]['id']))
+            response.headers['Link'] = f'<{next_url}>; rel="next"'
+        return response
+    
+    response = current_app.response_class(mimetype='application/json')
+    response.set_etag(catalog.etag)
+    response.last_modified = catalog.last_modified
+    response.cache_control.no_cache = True
+    response.vary.add('Accept-Encoding')
+    
+    if request.if_none_match.contains_weak(catalog.etag) or (
+        not request.if_none_match and request.if_modified_since and request.if_modified_since >= catalog.last_modified
+    ):
+        response.status_code = 304
+        return response
+    
+    if request.accept_encodings['gzip']:
+        response.set_data(catalog.gzip_body)
+        response.content_encoding = 'gzip'
+    else:
+        response.set_data(catalog.body)
+    return response
 
-@app.route('/api/movies/search')
+@bp.route('/api/movies/search')
 def api_search_movies():
-    """API endpoint to search movies"""
-    query = request.args.get('q', '').lower()
+    """API endpoint to search movies by title, genre or description"""
+    query = request.args.get('q', '')
+    limit = min(max(request.args.get('limit', SEARCH_PAGE_SIZE, type=int), 1), SEARCH_MAX_LIMIT)
+    page = max(request.args.get('page', 1, type=int), 1)
+    
+    state = reservations()
     conn = get_db_connection()
-    movies = conn.execute(
-        'SELECT * FROM movies WHERE LOWER(title) LIKE ? OR LOWER(genre) LIKE ?',
-        (f'%{query}%', f'%{query}%')
-    ).fetchall()
+    if state.search_index_available is None:
+        state.search_index_available = has_search_index(conn)
+    movies = search_movies(conn, query, limit + 1, (page - 1) * limit, use_fts=state.search_index_available)
     conn.close()
-    return jsonify([dict(movie) for movie in movies])
+    
+    response = jsonify([dict(movie) for movie in movies[:limit]])
+    if len(movies) > limit:
+        next_url = url_for('.api_search_movies', q=query, limit=limit, page=page + 1)
+        response.headers['Link'] = f'<{next_url}>; rel="next"'
+    return response
 
-@app.route('/movie/<int:movie_id>')
+@bp.route('/movie/<int:movie_id>')
 def movie_details(movie_id):
     """Movie details page"""
     conn = get_db_connection()
     movie = conn.execute('SELECT * FROM movies WHERE id = ?', (movie_id,)).fetchone()
-    conn.close()
     
     if not movie:
+        conn.close()
         flash('Movie not found.', 'error')
-        return redirect(url_for('index'))
+        return redirect(url_for('.index'))
     
-    showtimes = movie['showtimes'].split(',') if movie['showtimes'] else []
-    return render_template('movie.html', movie=movie, showtimes=showtimes)
+    shows = get_upcoming_shows(conn, movie_id)
+    if not shows or shows[-1]['show_date'] < (date.today() + timedelta(days=SCHEDULE_DAYS - 1)).isoformat():
+        schedule_shows(conn, movie_id=movie_id, capacity=SEATS_PER_SHOW)
+        shows = get_upcoming_shows(conn, movie_id)
+    conn.close()
+    
+    shows = [show for show in shows if show_is_open(show)]
+    return render_template('movie.html', movie=movie, shows=shows, seats_left=get_seats_left(shows))
 
-@app.route('/seats/<int:movie_id>/<showtime>')
-def seat_selection(movie_id, showtime):
+@bp.route('/seats/<int:show_id>')
+def seat_selection(show_id):
     """Seat selection page"""
     conn = get_db_connection()
-    movie = conn.execute('SELECT * FROM movies WHERE id = ?', (movie_id,)).fetchone()
+    show = get_show(conn, show_id)
+    conn.close()
     
-    if not movie:
-        flash('Movie not found.', 'error')
-        return redirect(url_for('index'))
+    if not show:
+        flash('Show not found.', 'error')
+        return redirect(url_for('.index'))
+    
+    bitmap = get_booked_seat_bitmap(show_id)
+    
+    hold = session.get('seat_hold')
+    if hold and hold['show_id'] == show_id and hold['expires_at'] > time.time():
+        bitmap &= ~seat_cache.to_bitmap(hold['seats'])
+    
+    # The grid depends only on occupancy, so it is rendered once per (show, bitmap)
+    seat_grid = seat_fragments.get((show_id, bitmap), lambda: Markup(render_template(
+        'seat_grid.html', rows=VALID_ROWS, cols=VALID_COLS, booked_seats=set(seat_cache.to_seats(bitmap))
+    )))
     
-    booked_seats = conn.execute(
-        'SELECT seat FROM booked_seats WHERE movie_id = ? AND showtime = ?',
-        (movie_id, showtime)
-    ).fetchall()
+    return render_template('seats.html', show=show, showtime=show_label(show), seat_grid=seat_grid,
+                           idempotency_key=uuid.uuid4().hex)
+
+@bp.route('/api/booked-seats/<int:show_id>')
+def api_booked_seats(show_id):
+    """API endpoint to get booked seats for a show"""
+    bitmap = get_booked_seat_bitmap(show_id)
+    if bitmap is None:
+        return jsonify({'error': 'Show not found.'}), 404
+    etag = seat_cache.etag(bitmap)
+    
+    if request.if_none_match.contains_weak(etag):
+        response = current_app.response_class(status=304)
+    else:
+        response = jsonify(seat_cache.to_seats(bitmap))
+    
+    response.set_etag(etag)
+    response.cache_control.no_cache = True
+    return response
+
+@bp.route('/api/shows/availability')
+def api_show_availability():
+    """API endpoint with seats left for every open show, optionally filtered by movie_id and date"""
+    movie_id = request.args.get('movie_id', type=int)
+    day = request.args.get('date', '')
+    if day:
+        try:
+            date.fromisoformat(day)
+        except ValueError:
+            return jsonify({'error': 'date must be YYYY-MM-DD.'}), 400
+    
+    today = date.today().isoformat()
+    last_day = (date.today() + timedelta(days=SCHEDULE_DAYS - 1)).isoformat()
+    conn = get_db_connection()
+    shows = [show for show in get_shows_by_date(conn, day or today, day or last_day, movie_id) if show_is_open(show)]
+    conn.close()
+    
+    seats_left = get_seats_left(shows)
+    return jsonify({'shows': [
+        {
+            'show_id': show['id'],
+            'movie_id': show['movie_id'],
+            'show_date': show['show_date'],
+            'start_time': show['start_time'],
+            'capacity': show['capacity'],
+            'seats_left': seats_left[show['id']],
+        }
+        for show in shows
+    ]})
+
+@bp.route('/api/shows/<int:show_id>/best-seats')
+def api_best_seats(show_id):
+    """API endpoint suggesting the best block of n adjacent free seats"""
+    n = request.args.get('n', 1, type=int)
+    if not 1 <= n <= len(VALID_COLS):
+        return jsonify({'error': f'n must be between 1 and {len(VALID_COLS)}.'}), 400
+    
+    conn = get_db_connection()
+    show = get_show(conn, show_id)
     conn.close()
     
-    booked_seat_list = [seat['seat'] for seat in booked_seats]
+    if not show or not show_is_open(show):
+        return jsonify({'error': 'Show not found.'}), 404
     
-    return render_template('seats.html', movie=movie, showtime=showtime, booked_seats=booked_seat_list)
+    seats = seat_allocator.best_block(get_booked_seat_bitmap(show_id), n)
+    if not seats:
+        return jsonify({'error': f'No block of {n} adjacent seats is free.', 'seats': []}), 409
+    return jsonify({'show_id': show_id, 'seats': seats})
 
-@app.route('/api/booked-seats/<int:movie_id>/<showtime>')
-def api_booked_seats(movie_id, showtime):
-    """API endpoint to get booked seats for a movie and showtime"""
+@bp.route('/api/shows/<int:show_id>/seats/stream')
+def api_seat_stream(show_id):
+    """Server-sent event stream of seat changes for a show"""
     conn = get_db_connection()
-    booked_seats = conn.execute(
-        'SELECT seat FROM booked_seats WHERE movie_id = ? AND showtime = ?',
-        (movie_id, showtime)
-    ).fetchall()
+    show = get_show(conn, show_id)
     conn.close()
-    return jsonify([seat['seat'] for seat in booked_seats])
+    
+    if not show:
+        return jsonify({'error': 'Show not found.'}), 404
+    
+    hold = session.get('seat_hold')
+    own_bits = seat_cache.to_bitmap(hold['seats']) if hold and hold['show_id'] == show_id else 0
+    
+    def stream():
+        # Subscribing only once the body is read means HEAD requests and aborted responses leave nothing behind
+        subscription = seat_events.subscribe(show_id)
+        try:
+            bitmap = get_booked_seat_bitmap(show_id) & ~own_bits
+            yield f'retry: {SEAT_STREAM_HEARTBEAT * 1000}\n\n'
+            yield format_sse('snapshot', {'booked': seat_cache.to_seats(bitmap)})
+            
+            while True:
+                try:
+                    event, seats = subscription.events.get(timeout=SEAT_STREAM_HEARTBEAT)
+                except queue.Empty:
+                    event, seats = None, []
+                
+                if subscription.overflowed or event is None:
+                    # Catch up on changes made by other workers, expired holds or dropped deltas
+                    subscription.overflowed = False
+                    while not subscription.events.empty():
+                        subscription.events.get_nowait()
+                    current = get_booked_seat_bitmap(show_id) & ~own_bits
+                    if current != bitmap:
+                        bitmap = current
+                        yield format_sse('snapshot', {'booked': seat_cache.to_seats(bitmap)})
+                    else:
+                        yield ': keepalive\n\n'
+                    continue
+                
+                bits = seat_cache.to_bitmap(seats) & ~own_bits
+                bitmap = bitmap | bits if event == 'taken' else bitmap & ~bits
+                if bits:
+                    yield format_sse(event, {'seats': seat_cache.to_seats(bits)})
+        finally:
+            seat_events.unsubscribe(subscription)
+    
+    response = Response(stream_with_context(stream()), mimetype='text/event-stream')
+    response.cache_control.no_cache = True
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@bp.route('/api/db-stats')
+def api_db_stats():
+    """API endpoint to report connection pool usage"""
+    return jsonify(get_pool(reservations().database).stats())
+
+@bp.after_app_request
+def compress_response(response):
+    """Compress JSON and HTML bodies for clients that accept gzip or brotli"""
+    if (response.direct_passthrough or response.is_streamed or response.content_encoding
+            or response.mimetype not in COMPRESS_MIMETYPES or not 200 <= response.status_code < 300):
+        return response
+    
+    data = response.get_data()
+    if len(data) < COMPRESS_MIN_SIZE:
+        return response
+    
+    response.vary.add('Accept-Encoding')
+    encoding = negotiate(request.accept_encodings)
+    if encoding:
+        response.set_data(encode(data, encoding, COMPRESS_LEVELS[encoding]))
+        response.content_encoding = encoding
+        etag, _ = response.get_etag()
+        if etag:
+            response.set_etag(etag, weak=True)
+    return response
+
+@bp.route('/assets/<path:filename>')
+def hashed_asset(filename):
+    """Serve a fingerprinted static file, precompressed when possible; its URL changes whenever it does"""
+    entry = asset_manifest.entry_for(filename)
+    if not entry:
+        return Response('Not found', status=404, mimetype='text/plain')
+    
+    encoding = negotiate(request.accept_encodings, entry['encodings'])
+    suffix = {'br': '.br', 'gzip': '.gz'}.get(encoding, '')
+    response = send_from_directory(DIST_DIR, filename + suffix, mimetype=mimetypes.guess_type(filename)[0],
+                                   max_age=ASSET_MAX_AGE)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    if entry['encodings']:
+        response.vary.add('Accept-Encoding')
+    if encoding:
+        response.content_encoding = encoding
+    return response
+
+@bp.route('/posters/<key>/<variant>')
+def poster_image(key, variant):
+    """Serve a cached poster; the key is derived from the poster URL, so a cached file never changes"""
+    path = poster_cache.find(key, variant) if variant in POSTER_VARIANTS else None
+    if path is None:
+        # Not downloaded (yet): short-lived placeholder so the real poster shows up once it is cached
+        response = send_from_directory(current_app.static_folder, 'images/no-poster.png', max_age=POSTER_MISSING_MAX_AGE)
+        response.cache_control.public = True
+        return response
+    
+    response = send_from_directory(os.path.dirname(os.path.abspath(path)), os.path.basename(path),
+                                   max_age=ASSET_MAX_AGE)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+@bp.route('/admin/exports/<kind>.<fmt>')
+@admin_required
+def admin_export(kind, fmt):
+    """Stream bookings or a seat manifest as CSV or NDJSON, filtered by show, movie, show dates or booking day"""
+    if kind not in EXPORTS or fmt not in FORMATS:
+        return jsonify({'error': f"Unknown export; use one of {sorted(EXPORTS)} as {sorted(FORMATS)}."}), 404
+    
+    filters = {
+        'show_id': request.args.get('show_id', type=int),
+        'movie_id': request.args.get('movie_id', type=int),
+    }
+    for name in ('date_from', 'date_to', 'booked_on'):
+        value = request.args.get(name, '')
+        if value:
+            try:
+                date.fromisoformat(value)
+            except ValueError:
+                return jsonify({'error': f'{name} must be YYYY-MM-DD.'}), 400
+        filters[name] = value or None
+    
+    response = Response(stream_with_context(export(storage, kind, fmt, history=history, **filters)), mimetype=FORMATS[fmt])
+    response.headers['Content-Disposition'] = f'attachment; filename="{kind}-{date.today().isoformat()}.{fmt}"'
+    response.cache_control.no_store = True
+    return response
 
-@app.route('/login', methods=['GET', 'POST'])
+@bp.route('/metrics')
+def metrics():
+    """Prometheus scrape endpoint: needs the METRICS_TOKEN bearer token, or a loopback client when no token is set"""
+    token = current_app.config.get('METRICS_TOKEN')
+    if token:
+        allowed = hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}')
+    else:
+        allowed = request.remote_addr in LOOPBACK_ADDRESSES
+    if not allowed:
+        abort(404)
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+def auth_busy(template):
+    """Fast 503 for a login or signup that could not get a password hashing worker in time"""
+    flash('Sign-in is very busy right now. Please try again in a few seconds.', 'error')
+    response = current_app.make_response((render_template(template), 503))
+    response.headers['Retry-After'] = str(AUTH_RETRY_AFTER)
+    return response
+
+@bp.route('/login', methods=['GET', 'POST'])
 def login():
     """User login page"""
     if request.method == 'POST':
@@ -205,7 +756,13 @@ def login():
         user = conn.execute('SELECT * FROM users WHERE email = ?', (email,)).fetchone()
         conn.close()
         
-        if user and check_password_hash(user['password_hash'], password):
+        try:
+            valid = bool(user) and auth_pool.call(check_password_hash, user['password_hash'], password,
+                                                  timeout=AUTH_TIMEOUT)
+        except (PoolSaturated, TimeoutError):
+            return auth_busy('login.html')
+        
+        if valid:
             session['user_id'] = user['id']
             session['user_name'] = f"{user['first_name']} {user['last_name']}"
             session['user_email'] = user['email']
@@ -214,13 +771,13 @@ def login():
             next_url = request.args.get('next')
             if next_url:
                 return redirect(next_url)
-            return redirect(url_for('index'))
+            return redirect(url_for('.index'))
         else:
             flash('Invalid email or password.', 'error')
     
     return render_template('login.html')
 
-@app.route('/signup', methods=['GET', 'POST'])
+@bp.route('/signup', methods=['GET', 'POST'])
 def signup():
     """User signup page"""
     if request.method == 'POST':
@@ -244,14 +801,18 @@ def signup():
         
         conn = get_db_connection()
         existing_user = conn.execute('SELECT id FROM users WHERE email = ?', (email,)).fetchone()
+        conn.close()
         
         if existing_user:
-            conn.close()
             flash('Email already registered. Please login.', 'error')
             return render_template('signup.html')
         
-        password_hash = generate_password_hash(password)
+        try:
+            password_hash = auth_pool.call(generate_password_hash, password, timeout=AUTH_TIMEOUT)
+        except (PoolSaturated, TimeoutError):
+            return auth_busy('signup.html')
         
+        conn = get_db_connection()
         try:
             conn.execute(
                 'INSERT INTO users (first_name, last_name, email, password_hash) VALUES (?, ?, ?, ?)',
@@ -271,7 +832,7 @@ def signup():
             next_url = request.args.get('next')
             if next_url:
                 return redirect(next_url)
-            return redirect(url_for('index'))
+            return redirect(url_for('.index'))
         except Exception as e:
             conn.close()
             flash('An error occurred. Please try again.', 'error')
@@ -279,126 +840,465 @@ def signup():
     
     return render_template('signup.html')
 
-@app.route('/logout')
+@bp.route('/logout')
 def logout():
     """User logout"""
     session.clear()
     flash('You have been logged out.', 'info')
-    return redirect(url_for('index'))
+    return redirect(url_for('.index'))
 
-@app.route('/book', methods=['POST'])
+@bp.route('/book', methods=['POST'])
 @login_required
 def book_tickets():
     """Process ticket booking"""
-    movie_id = request.form.get('movie_id')
-    showtime = request.form.get('showtime')
+    show_id = request.form.get('show_id', type=int)
     seats = request.form.get('seats', '')
+    party_size = request.form.get('party_size', type=int) if request.form.get('auto_assign') else None
     
-    if not all([movie_id, showtime, seats]):
+    if not show_id or not (seats or party_size):
         flash('Please select seats before booking.', 'error')
-        return redirect(url_for('index'))
-    
-    seat_list = [s.strip().upper() for s in seats.split(',') if s.strip()]
+        return redirect(url_for('.index'))
     
-    if not seat_list:
-        flash('Please select at least one seat.', 'error')
-        return redirect(url_for('seat_selection', movie_id=movie_id, showtime=showtime))
+    if party_size is not None:
+        seat_list = []
+        if not 1 <= party_size <= len(VALID_COLS):
+            flash(f'Party size must be between 1 and {len(VALID_COLS)}.', 'error')
+            return redirect(url_for('.seat_selection', show_id=show_id))
+    else:
+        seat_list = parse_seats(seats)
+        
+        if not seat_list:
+            flash('Please select at least one seat.', 'error')
+            return redirect(url_for('.seat_selection', show_id=show_id))
+        
+        for seat in seat_list:
+            if not validate_seat(seat):
+                flash(f'Invalid seat format: {seat}. Seats must be A1-H10.', 'error')
+                return redirect(url_for('.seat_selection', show_id=show_id))
     
-    for seat in seat_list:
-        if not validate_seat(seat):
-            flash(f'Invalid seat format: {seat}. Seats must be A1-H10.', 'error')
-            return redirect(url_for('seat_selection', movie_id=movie_id, showtime=showtime))
+    idempotency_key = request.headers.get('Idempotency-Key') or request.form.get('idempotency_key')
+    request_hash = None
+    if idempotency_key:
+        if not IDEMPOTENCY_KEY_PATTERN.match(idempotency_key):
+            flash('Invalid idempotency key.', 'error')
+            return redirect(url_for('.seat_selection', show_id=show_id))
+        
+        # A retry of a booking that already went through is answered from one indexed row
+        request_hash = hashlib.sha1(
+            f"{show_id}:{f'auto:{party_size}' if party_size is not None else ','.join(sorted(seat_list))}".encode()
+        ).hexdigest()[:16]
+        replay = replay_booking(show_id, idempotency_key, request_hash)
+        if replay:
+            return replay
     
     conn = get_db_connection()
-    movie = conn.execute('SELECT * FROM movies WHERE id = ?', (movie_id,)).fetchone()
+    show = get_show(conn, show_id)
     
-    if not movie:
+    if not show:
         conn.close()
-        flash('Movie not found.', 'error')
-        return redirect(url_for('index'))
+        flash('Show not found.', 'error')
+        return redirect(url_for('.index'))
     
-    if not validate_showtime(showtime, movie['showtimes'] or ''):
+    if not show_is_open(show):
         conn.close()
-        flash('Invalid showtime selected.', 'error')
-        return redirect(url_for('movie_details', movie_id=movie_id))
+        flash('This show has already started.', 'error')
+        return redirect(url_for('.movie_details', movie_id=show['movie_id']))
     
-    existing_seats = conn.execute(
-        'SELECT seat FROM booked_seats WHERE movie_id = ? AND showtime = ? AND seat IN ({})'.format(
-            ','.join('?' * len(seat_list))
-        ),
-        [movie_id, showtime] + seat_list
-    ).fetchall()
+    conn.close()
     
-    if existing_seats:
-        conn.close()
-        flash('Some selected seats are already booked. Please try again.', 'error')
-        return redirect(url_for('seat_selection', movie_id=movie_id, showtime=showtime))
+    try:
+        admission = admission_control.acquire(show_id, session['user_id'], request.form.get('admission_ticket'))
+    except sqlite3.Error as e:
+        # The show's line stayed locked past the busy timeout; ask the buyer to come back instead of failing
+        print(f"Admission error: {e}")
+        admission = Admission(UNAVAILABLE, wait=ADMISSION_POLL_INTERVAL)
+    if admission.status != ADMITTED:
+        return waiting_room(show, admission)
+    
+    started = time.perf_counter()
+    try:
+        return checkout(show, seat_list, seats, party_size, idempotency_key, request_hash)
+    finally:
+        # The booking has already been decided; a slot that fails to free lapses after its checkout lease
+        try:
+            admission_control.release(show_id, admission.ticket_id, time.perf_counter() - started)
+        except sqlite3.Error as e:
+            print(f"Admission release error for ticket {admission.ticket_id}: {e}")
+
+def replay_booking(show_id, idempotency_key, request_hash):
+    """Redirect to the booking an idempotency key already produced, or None if it has not been used"""
+    conn = storage.connect_for_show(show_id)
+    stored = find_idempotent_booking(conn, session['user_id'], idempotency_key, IDEMPOTENCY_TTL)
+    conn.close()
+    if stored is None:
+        return None
     
-    booking_id = f"BK{uuid.uuid4().hex[:8].upper()}"
+    booking_id, stored_hash = stored
+    if stored_hash != request_hash:
+        flash('This booking form was already submitted with different seats. Please choose your seats again.', 'error')
+        return redirect(url_for('.seat_selection', show_id=show_id))
+    
+    response = redirect(url_for('.confirmation', booking_id=booking_id))
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
+def checkout(show, seat_list, seats, party_size, idempotency_key=None, request_hash=None):
+    """Claim seats for an admitted checkout and redirect to its confirmation"""
+    show_id = show['id']
+    conn = storage.connect_for_movie(show['movie_id'])
+    booking_id = storage.new_record_id('BK', show['movie_id'])
     
     try:
-        conn.execute(
-            'INSERT INTO bookings (booking_id, user_id, movie_id, seats, showtime) VALUES (?, ?, ?, ?, ?)',
-            (booking_id, session['user_id'], movie_id, seats, showtime)
-        )
-        
-        for seat in seat_list:
-            conn.execute(
-                'INSERT INTO booked_seats (movie_id, showtime, seat, booking_id) VALUES (?, ?, ?, ?)',
-                (movie_id, showtime, seat, booking_id)
+        if party_size is not None:
+            seat_list, released = claim_best_seats(
+                conn, booking_id, session['user_id'], show, seat_allocator, party_size
             )
+            seats = ','.join(seat_list)
+        else:
+            released = claim_seats(conn, booking_id, session['user_id'], show, seat_list, seats)
         
-        conn.commit()
+        if idempotency_key:
+            record_idempotency_key(conn, session['user_id'], idempotency_key, request_hash, booking_id, IDEMPOTENCY_TTL)
         
         booking_details = {
             'booking_id': booking_id,
-            'movie_title': movie['title'],
-            'showtime': showtime,
+            'movie_title': show['title'],
+            'showtime': show_label(show),
             'seats': seats,
             'booking_date': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         }
         
-        email_sent = send_booking_email(
+        email_queued = queue_booking_email(
+            conn,
             session['user_email'],
             session['user_name'],
             booking_details,
             is_cancellation=False
         )
         
+        conn.commit()
         conn.close()
+        mark_seats_taken(show_id, seat_list)
+        mark_seats_free(show_id, released)
+        session.pop('seat_hold', None)
         
-        if not email_sent:
+        if email_queued:
+            mail_queue.wake()
+        else:
             flash('Booking confirmed! Note: Confirmation email could not be sent.', 'warning')
         
-        return redirect(url_for('confirmation', booking_id=booking_id))
+        return redirect(url_for('.confirmation', booking_id=booking_id))
+    
+    except SeatUnavailable as e:
+        conn.close()
+        # A concurrent duplicate of this request may have taken the seats first
+        replay = replay_booking(show_id, idempotency_key, request_hash) if idempotency_key else None
+        if replay:
+            return replay
+        booking_conflicts.inc('book')
+        if party_size is not None:
+            flash(f'No block of {party_size} seats together is left for this show.', 'error')
+            return redirect(url_for('.seat_selection', show_id=show_id))
+        mark_seats_taken(show_id, e.seats)
+        flash('Some selected seats are already booked. Please try again.', 'error')
+        return redirect(url_for('.seat_selection', show_id=show_id))
+    
+    except sqlite3.IntegrityError as e:
+        conn.rollback()
+        conn.close()
+        replay = replay_booking(show_id, idempotency_key, request_hash) if idempotency_key else None
+        if replay:
+            return replay
+        flash('An error occurred while booking. Please try again.', 'error')
+        print(f"Booking error: {e}")
+        return redirect(url_for('.seat_selection', show_id=show_id))
     
     except Exception as e:
         conn.rollback()
         conn.close()
         flash('An error occurred while booking. Please try again.', 'error')
         print(f"Booking error: {e}")
-        return redirect(url_for('seat_selection', movie_id=movie_id, showtime=showtime))
+        return redirect(url_for('.seat_selection', show_id=show_id))
+
+def waiting_room(show, admission):
+    """
+    Queue page for a checkout that was not admitted: 202 when newly queued, 429 when polling early,
+    503 when the line is full or unavailable
+    """
+    if admission.status != QUEUED:
+        admission_rejections.inc(admission.status)
+    
+    status = {QUEUED: 202, EARLY: 429, FULL: 503, UNAVAILABLE: 503}[admission.status]
+    form = {key: request.form[key] for key in ('show_id', 'seats', 'party_size', 'auto_assign', 'idempotency_key') if request.form.get(key)}
+    response = current_app.make_response((render_template(
+        'waiting_room.html', show=show, showtime=show_label(show), admission=admission, form=form,
+        poll_interval=ADMISSION_POLL_INTERVAL
+    ), status))
+    response.headers['Retry-After'] = str(ADMISSION_POLL_INTERVAL if admission.ticket_id else admission.retry_after)
+    if admission.ticket_id:
+        response.headers['X-Admission-Ticket'] = admission.ticket_id
+    response.cache_control.no_store = True
+    return response
+
+@bp.route('/api/admission/<ticket_id>')
+@login_required
+def api_admission_status(ticket_id):
+    """Polling endpoint for a waiting-room ticket; 404 once it has expired"""
+    try:
+        state = admission_control.poll(ticket_id, session['user_id'])
+    except sqlite3.Error as e:
+        print(f"Admission error: {e}")
+        response = jsonify({'error': 'Waiting room is busy. Please try again.', 'poll_interval': ADMISSION_POLL_INTERVAL})
+        response.status_code = 503
+        response.headers['Retry-After'] = str(ADMISSION_POLL_INTERVAL)
+        response.cache_control.no_store = True
+        return response
+    if state is None:
+        response = jsonify({'error': 'Ticket expired. Please submit your booking again.'})
+        response.status_code = 404
+    else:
+        status, position, wait = state
+        response = jsonify({'status': status, 'position': position, 'estimated_wait': round(wait, 1),
+                            'poll_interval': ADMISSION_POLL_INTERVAL})
+    response.cache_control.no_store = True
+    return response
+
+@bp.route('/api/bookings/batch', methods=['POST'])
+@login_required
+def api_batch_booking():
+    """
+    API endpoint to book seats for several shows at once.
+    Body: {"items": [{"show_id": 1, "seats": ["A1", "A2"]}, ...], "mode": "all" | "partial"}.
+    In "all" mode (the default) nothing is booked unless every item can be;
+    in "partial" mode the bookable items are kept. One summary email covers the batch.
+    """
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Body must be a JSON object with an items list.'}), 400
+    items = data.get('items')
+    mode = data.get('mode', 'all')
+    
+    if mode not in ('all', 'partial'):
+        return jsonify({'error': 'mode must be "all" or "partial".'}), 400
+    if not isinstance(items, list) or not items:
+        return jsonify({'error': 'items must be a non-empty list.'}), 400
+    if len(items) > BATCH_MAX_ITEMS:
+        return jsonify({'error': f'At most {BATCH_MAX_ITEMS} items per batch.'}), 400
+    
+    results = []
+    for index, item in enumerate(items):
+        item = item if isinstance(item, dict) else {}
+        show_id = item.get('show_id')
+        if isinstance(show_id, str) and show_id.isdigit():
+            show_id = int(show_id)
+        seats = item.get('seats', '')
+        if isinstance(seats, list) and all(isinstance(seat, str) for seat in seats):
+            seats = ','.join(seats)
+        seat_list = parse_seats(seats) if isinstance(seats, str) else []
+        result = {'index': index, 'show_id': show_id, 'seats': seat_list}
+        # bool is an int subclass, so "show_id": true would otherwise pass as show 1
+        if isinstance(show_id, bool) or not isinstance(show_id, int) or not seat_list:
+            result.update(status='invalid', error='show_id and seats are required.')
+        elif not all(validate_seat(seat) for seat in seat_list):
+            result.update(status='invalid', error='Seats must be A1-H10.')
+        results.append(result)
+    
+    conn = get_db_connection()
+    shows = get_shows(conn, {r['show_id'] for r in results if 'status' not in r})
+    conn.close()
+    for result in results:
+        if 'status' not in result:
+            show = shows.get(result['show_id'])
+            if not show or not show_is_open(show):
+                result.update(status='invalid', error='Show not found.')
+    
+    valid = [r for r in results if 'status' not in r]
+    if not valid or (mode == 'all' and len(valid) < len(results)):
+        return jsonify({'mode': mode, 'booked': 0, 'items': results}), 400
+    
+    groups = {}
+    for result in valid:
+        result['booking_id'] = storage.new_record_id('BK', shows[result['show_id']]['movie_id'])
+        groups.setdefault(storage.shard_for_movie(shows[result['show_id']]['movie_id']), []).append(result)
+    
+    conns = {}
+    released = {}
+    try:
+        # Shards are locked in a fixed order so two batches cannot wait on each other
+        for database in sorted(groups):
+            conn = conns[database] = storage.connect_shard(database)
+            conflicts, freed = claim_batch(
+                conn, session['user_id'],
+                [(r['booking_id'], shows[r['show_id']], r['seats']) for r in groups[database]],
+                atomic=(mode == 'all')
+            )
+            for result, taken in zip(groups[database], conflicts):
+                result['conflicts'] = taken
+            released.update(freed)
+        
+        failed = any(r['conflicts'] for r in valid)
+        for result in valid:
+            if result['conflicts']:
+                result.update(status='conflict', error='Seats are no longer available.')
+                del result['booking_id']
+            elif mode == 'all' and failed:
+                result.update(status='rolled_back')
+                del result['booking_id'], result['conflicts']
+            else:
+                result['status'] = 'booked'
+                del result['conflicts']
+        
+        booked = [r for r in results if r['status'] == 'booked']
+        email_queued = False
+        if booked and mail_configured():
+            bookings = [{
+                'booking_id': r['booking_id'],
+                'movie_title': shows[r['show_id']]['title'],
+                'showtime': show_label(shows[r['show_id']]),
+                'seats': ','.join(r['seats'])
+            } for r in booked]
+            subject, body = build_batch_email(session['user_name'], bookings)
+            enqueue_email(conns[min(groups)], session['user_email'], subject, body)
+            email_queued = True
+        for conn in conns.values():
+            if booked:
+                conn.commit()
+            else:
+                conn.rollback()
+    
+    except Exception as e:
+        for conn in conns.values():
+            conn.rollback()
+        print(f"Batch booking error: {e}")
+        return jsonify({'error': 'An error occurred while booking. Please try again.'}), 500
+    
+    finally:
+        for conn in conns.values():
+            conn.close()
+    
+    for result in valid:
+        if result['status'] == 'conflict':
+            booking_conflicts.inc('batch')
+            mark_seats_taken(result['show_id'], result['conflicts'])
+        elif result['status'] == 'booked':
+            mark_seats_taken(result['show_id'], result['seats'])
+    for show_id, seats in released.items():
+        mark_seats_free(show_id, seats)
+    hold = session.get('seat_hold')
+    if hold and any(r['show_id'] == hold['show_id'] for r in booked):
+        session.pop('seat_hold', None)
+    if email_queued:
+        mail_queue.wake()
+    
+    return jsonify({
+        'mode': mode,
+        'booked': len(booked),
+        'email_queued': email_queued,
+        'items': results
+    }), 201 if booked else 409
+
+@bp.route('/api/holds', methods=['POST'])
+@login_required
+def api_hold_seats():
+    """API endpoint to hold seats for a short time while the user checks out"""
+    data = request.get_json(silent=True) or request.form
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Body must be a JSON object or form with show_id and seats.'}), 400
+    show_id = str(data.get('show_id', ''))
+    seats = data.get('seats', '')
+    if isinstance(seats, list) and all(isinstance(seat, str) for seat in seats):
+        seats = ','.join(seats)
+    if not isinstance(seats, str):
+        return jsonify({'error': 'seats must be a list of seat ids or a comma-separated string.'}), 400
+    seat_list = parse_seats(seats)
+    
+    if not show_id.isdigit() or not seat_list:
+        return jsonify({'error': 'show_id and seats are required.'}), 400
+    if len(seat_list) > HOLD_MAX_SEATS:
+        return jsonify({'error': f'At most {HOLD_MAX_SEATS} seats can be held at once.'}), 400
+    
+    invalid = [seat for seat in seat_list if not validate_seat(seat)]
+    if invalid:
+        return jsonify({'error': 'Seats must be A1-H10.', 'seats': invalid}), 400
+    
+    conn = get_db_connection()
+    show = get_show(conn, int(show_id))
+    
+    conn.close()
+    if not show or not show_is_open(show):
+        return jsonify({'error': 'Show not found.'}), 404
+    
+    conn = storage.connect_for_movie(show['movie_id'])
+    try:
+        hold, released = hold_seats(conn, session['user_id'], show['id'], seat_list, SEAT_HOLD_TTL,
+                                    hold_id=storage.new_record_id('HD', show['movie_id']))
+    except SeatUnavailable as e:
+        booking_conflicts.inc('hold')
+        mark_seats_taken(show['id'], e.seats)
+        return jsonify({'error': 'Some selected seats are no longer available.', 'seats': e.seats}), 409
+    finally:
+        conn.close()
+    
+    mark_seats_taken(show['id'], seat_list)
+    if released:
+        mark_seats_free(show['id'], released)
+    session['seat_hold'] = hold
+    return jsonify(hold), 201
+
+@bp.route('/api/holds/<hold_id>', methods=['DELETE'])
+@login_required
+def api_release_hold(hold_id):
+    """API endpoint to release a seat hold before it expires"""
+    user_id = session['user_id']
+    database, _ = storage.find_record(hold_id, lambda conn: conn.execute(
+        'SELECT 1 FROM seat_holds WHERE hold_id = ? AND user_id = ? LIMIT 1', (hold_id, user_id)
+    ).fetchone())
+    
+    released = None
+    if database:
+        conn = storage.connect_shard(database)
+        released = release_hold(conn, hold_id, user_id)
+        conn.close()
+    
+    if not released:
+        return jsonify({'error': 'Hold not found.'}), 404
+    
+    show_id, seats = released
+    mark_seats_free(show_id, seats)
+    if session.get('seat_hold', {}).get('hold_id') == hold_id:
+        session.pop('seat_hold')
+    return jsonify({'hold_id': hold_id, 'seats': seats})
 
-@app.route('/confirmation/<booking_id>')
+@bp.route('/confirmation/<booking_id>')
 def confirmation(booking_id):
     """Booking confirmation page"""
-    conn = get_db_connection()
-    booking = conn.execute('''
+    _, booking = storage.find_record(booking_id, lambda conn: conn.execute('''
         SELECT b.*, m.title, m.poster_url, m.release_year, u.first_name, u.last_name, u.email
         FROM bookings b
         JOIN movies m ON b.movie_id = m.id
         JOIN users u ON b.user_id = u.id
         WHERE b.booking_id = ?
-    ''', (booking_id,)).fetchone()
-    conn.close()
+    ''', (booking_id,)).fetchone())
+    
+    if not booking:
+        booking = history.find_booking(booking_id)
+        if booking:
+            conn = get_db_connection()
+            details = conn.execute('''
+                SELECT m.title, m.poster_url, m.release_year, u.first_name, u.last_name, u.email
+                FROM movies m, users u
+                WHERE m.id = ? AND u.id = ?
+            ''', (booking['movie_id'], booking['user_id'])).fetchone()
+            conn.close()
+            booking = dict(booking, **details) if details else None
     
     if not booking:
         flash('Booking not found.', 'error')
-        return redirect(url_for('index'))
+        return redirect(url_for('.index'))
     
     return render_template('confirmation.html', booking=booking)
 
-@app.route('/cancel', methods=['GET', 'POST'])
+@bp.route('/cancel', methods=['GET', 'POST'])
 def cancel_booking():
     """Cancel booking page"""
     if request.method == 'POST':
@@ -409,24 +1309,22 @@ def cancel_booking():
             flash('Please fill in all fields.', 'error')
             return render_template('cancel.html')
         
-        conn = get_db_connection()
-        booking = conn.execute('''
+        database, booking = storage.find_record(booking_id, lambda conn: conn.execute('''
             SELECT b.*, m.title, u.first_name, u.last_name, u.email
             FROM bookings b
             JOIN movies m ON b.movie_id = m.id
             JOIN users u ON b.user_id = u.id
             WHERE b.booking_id = ? AND u.email = ?
-        ''', (booking_id, email)).fetchone()
+        ''', (booking_id, email)).fetchone())
         
         if not booking:
-            conn.close()
             flash('Booking not found. Please check your booking ID and email.', 'error')
             return render_template('cancel.html')
         
+        conn = storage.connect_shard(database)
         try:
             conn.execute('DELETE FROM booked_seats WHERE booking_id = ?', (booking_id,))
             conn.execute('DELETE FROM bookings WHERE booking_id = ?', (booking_id,))
-            conn.commit()
             
             booking_details = {
                 'booking_id': booking_id,
@@ -435,14 +1333,21 @@ def cancel_booking():
                 'seats': booking['seats']
             }
             
-            send_booking_email(
+            email_queued = queue_booking_email(
+                conn,
                 booking['email'],
                 f"{booking['first_name']} {booking['last_name']}",
                 booking_details,
                 is_cancellation=True
             )
             
+            conn.commit()
             conn.close()
+            mark_seats_free(booking['show_id'], parse_seats(booking['seats']))
+            
+            if email_queued:
+                mail_queue.wake()
+            
             flash(f'Booking {booking_id} has been successfully cancelled.', 'success')
             return render_template('cancel.html', cancelled=True, booking_id=booking_id)
         
@@ -454,23 +1359,106 @@ def cancel_booking():
     
     return render_template('cancel.html')
 
-@app.route('/my-bookings')
+def get_archived_bookings(user_id, limit, after=None):
+    """A page of the user's archived bookings with the movie columns my_bookings shows"""
+    bookings = history.user_bookings(user_id, limit, after)
+    if not bookings:
+        return []
+    
+    movie_ids = list({booking['movie_id'] for booking in bookings})
+    conn = get_db_connection()
+    movies = {row['id']: row for row in conn.execute(
+        f"SELECT id, title, poster_url FROM movies WHERE id IN ({','.join('?' * len(movie_ids))})", movie_ids
+    )}
+    conn.close()
+    return [
+        dict(booking, title=movies[booking['movie_id']]['title'], poster_url=movies[booking['movie_id']]['poster_url'])
+        for booking in bookings if booking['movie_id'] in movies
+    ]
+
+@bp.route('/my-bookings')
 @login_required
 def my_bookings():
-    """View user's bookings"""
-    conn = get_db_connection()
-    bookings = conn.execute('''
+    """View user's bookings, newest first, one page at a time"""
+    after = decode_cursor(request.args.get('cursor'), (str, str))
+    query = '''
         SELECT b.*, m.title, m.poster_url
         FROM bookings b
         JOIN movies m ON b.movie_id = m.id
         WHERE b.user_id = ?
-        ORDER BY b.booking_date DESC
-    ''', (session['user_id'],)).fetchall()
-    conn.close()
+    '''
+    params = [session['user_id']]
+    if after:
+        query += ' AND (b.booking_date, b.booking_id) < (?, ?)'
+        params += after
+    query += ' ORDER BY b.booking_date DESC, b.booking_id DESC LIMIT ?'
+    params.append(MY_BOOKINGS_PAGE_SIZE + 1)
     
-    return render_template('my_bookings.html', bookings=bookings)
+    # Each shard returns its own newest page; merging them yields the overall newest page
+    pages = storage.scatter(lambda conn: conn.execute(query, params).fetchall())
+    pages.append(get_archived_bookings(session['user_id'], MY_BOOKINGS_PAGE_SIZE + 1, after))
+    bookings = list(heapq.merge(*pages, key=lambda b: (b['booking_date'], b['booking_id']), reverse=True))
+    
+    next_url = None
+    if len(bookings) > MY_BOOKINGS_PAGE_SIZE:
+        bookings = bookings[:MY_BOOKINGS_PAGE_SIZE]
+        last = bookings[-1]
+        next_url = url_for('.my_bookings', cursor=encode_cursor(last['booking_date'], last['booking_id']))
+    
+    return render_template('my_bookings.html', bookings=bookings, next_url=next_url, paged=after is not None)
+
+def warm_start(app):
+    """
+    Load what workers only read - the movie catalog, shard routes, compiled templates
+    and seat-layout tables - in the process that forks them, so every worker shares
+    one copy instead of rebuilding its own on its first requests
+    """
+    state = app.extensions['reservations']
+    if not os.path.exists(state.database):
+        raise RuntimeError(f"Database '{state.database}' not found. Please run 'python init_db.py' first.")
+
+    conn = state.storage.connect()
+    try:
+        state.catalog_cache.get(conn)
+        state.search_index_available = has_search_index(conn)
+    finally:
+        conn.close()
+    state.storage.preload()
+    for name in app.jinja_env.list_templates():
+        app.jinja_env.get_template(name)
+    state.seat_allocator.preload()
+    mimetypes.init()
+
+    # Each worker opens its own database handles after the fork
+    close_pools()
+    # Stop the garbage collector from writing to, and so un-sharing, every preloaded object
+    gc.freeze()
+
+def start_background_workers(app):
+    """
+    Start this process's mail queue workers, so outbox rows left pending, backing off
+    or leased by a previous process are delivered without waiting for the next booking
+    """
+    with app.app_context():
+        if mail_configured():
+            mail_queue.start()
+
+def create_app(config=None):
+    """
+    Build an application: default_config() overridden by config, its own Reservations
+    in app.extensions and the routes from the blueprint. Nothing is shared with other
+    applications in the process except the database connection pools.
+    """
+    app = Flask(__name__)
+    app.config.update(default_config())
+    app.config.update(config or {})
+    app.extensions['reservations'] = Reservations(app)
+    app.register_blueprint(bp)
+    return app
 
 if __name__ == '__main__':
-    if not os.path.exists(DATABASE):
+    app = create_app()
+    if not os.path.exists(app.config['DATABASE']):
         print("Database not found. Please run 'python init_db.py' first.")
+    start_background_workers(app)
     app.run(host='0.0.0.0', port=5000, debug=True)
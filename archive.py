@@ -0,0 +1,278 @@
+"""
+Booking Archive for Movie Reservation System
+Moves bookings of finished shows out of the hot tables into a compressed history database
+
+    python archive.py                  # archive every show dated before today
+    python archive.py --keep-days 7    # keep the last week of past shows in the hot tables
+"""
+
+import argparse
+import json
+import os
+import time
+import zlib
+from datetime import date, timedelta
+
+from dotenv import load_dotenv
+
+from booking import begin_immediate
+from db import connect_readonly, get_pool
+from storage import create_storage
+
+load_dotenv()
+
+DATABASE = 'database.db'
+HISTORY_DATABASE = os.getenv('HISTORY_DATABASE', 'history.db')
+ARCHIVE_BATCH_SHOWS = 50
+BOOKING_FIELDS = ('booking_id', 'user_id', 'movie_id', 'show_id', 'seats', 'showtime', 'booking_date')
+
+HISTORY_SCHEMA = [
+    # One row per show: its summary plus every booking as zlib-compressed JSON
+    '''
+    CREATE TABLE IF NOT EXISTS archived_shows (
+        show_id INTEGER PRIMARY KEY,
+        movie_id INTEGER NOT NULL,
+        show_date TEXT NOT NULL,
+        start_time TEXT NOT NULL,
+        capacity INTEGER NOT NULL,
+        bookings INTEGER NOT NULL,
+        seats_sold INTEGER NOT NULL,
+        payload BLOB NOT NULL,
+        archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''',
+    # Just enough to find a booking's show without decompressing anything
+    '''
+    CREATE TABLE IF NOT EXISTS archived_bookings (
+        booking_id TEXT PRIMARY KEY,
+        user_id INTEGER NOT NULL,
+        show_id INTEGER NOT NULL,
+        booking_date TIMESTAMP NOT NULL
+    ) WITHOUT ROWID
+    ''',
+    'CREATE INDEX IF NOT EXISTS idx_archived_bookings_user ON archived_bookings (user_id, booking_date, booking_id)',
+    'CREATE INDEX IF NOT EXISTS idx_archived_shows_movie ON archived_shows (movie_id, show_date)',
+    '''
+    CREATE VIEW IF NOT EXISTS movie_sales AS
+    SELECT movie_id, COUNT(*) AS shows, SUM(bookings) AS bookings, SUM(seats_sold) AS seats_sold,
+           ROUND(100.0 * SUM(seats_sold) / SUM(capacity), 1) AS occupancy_pct
+    FROM archived_shows
+    GROUP BY movie_id
+    ''',
+]
+
+def create_history_tables(conn):
+    """Create the archive tables and the per-movie sales summary view"""
+    for statement in HISTORY_SCHEMA:
+        conn.execute(statement)
+
+def encode_bookings(bookings):
+    return zlib.compress(json.dumps(bookings, separators=(',', ':')).encode('utf-8'), 9)
+
+def decode_bookings(payload):
+    return json.loads(zlib.decompress(payload))
+
+def find_finished_shows(conn, before, limit):
+    """Ids of shows dated before `before` that still have bookings in this database"""
+    rows = conn.execute('''
+        SELECT s.id FROM shows s
+        WHERE s.show_date < ? AND EXISTS (SELECT 1 FROM bookings b WHERE b.show_id = s.id)
+        ORDER BY s.id
+        LIMIT ?
+    ''', (before, limit)).fetchall()
+    return [row['id'] for row in rows]
+
+def archive_batch(conn, history, show_ids):
+    """
+    Copy the bookings of show_ids into the history database, then delete them from conn.
+    The booking database's write lock is held throughout, and the history commit comes
+    first, so a crash can only leave rows in both places; re-running merges them again.
+    Returns the number of bookings moved.
+    """
+    placeholders = ','.join('?' * len(show_ids))
+    begin_immediate(conn)
+    try:
+        shows = conn.execute(
+            f'SELECT id, movie_id, show_date, start_time, capacity FROM shows WHERE id IN ({placeholders})', show_ids
+        ).fetchall()
+        by_show = {show_id: [] for show_id in show_ids}
+        for row in conn.execute(
+            f"SELECT {', '.join(BOOKING_FIELDS)} FROM bookings WHERE show_id IN ({placeholders})", show_ids
+        ):
+            by_show[row['show_id']].append(dict(row))
+
+        begin_immediate(history)
+        try:
+            for show in shows:
+                bookings = by_show[show['id']]
+                existing = history.execute('SELECT payload FROM archived_shows WHERE show_id = ?', (show['id'],)).fetchone()
+                if existing:
+                    # Bookings of one show can sit in two databases (made before and after sharding)
+                    merged = {booking['booking_id']: booking for booking in decode_bookings(existing['payload'])}
+                    merged.update((booking['booking_id'], booking) for booking in bookings)
+                    bookings = sorted(merged.values(), key=lambda booking: booking['booking_id'])
+
+                history.execute('''
+                    INSERT OR REPLACE INTO archived_shows
+                        (show_id, movie_id, show_date, start_time, capacity, bookings, seats_sold, payload)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ''', (
+                    show['id'], show['movie_id'], show['show_date'], show['start_time'], show['capacity'],
+                    len(bookings), sum(len(booking['seats'].split(',')) for booking in bookings),
+                    encode_bookings(bookings)
+                ))
+                history.executemany(
+                    'INSERT OR REPLACE INTO archived_bookings (booking_id, user_id, show_id, booking_date) VALUES (?, ?, ?, ?)',
+                    [(b['booking_id'], b['user_id'], b['show_id'], b['booking_date']) for b in bookings]
+                )
+            history.commit()
+        except Exception:
+            history.rollback()
+            raise
+
+        conn.execute(f'DELETE FROM booked_seats WHERE show_id IN ({placeholders})', show_ids)
+        moved = conn.execute(f'DELETE FROM bookings WHERE show_id IN ({placeholders})', show_ids).rowcount
+        conn.execute(f'DELETE FROM show_occupancy WHERE show_id IN ({placeholders})', show_ids)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return moved
+
+def archive(storage, history_database=HISTORY_DATABASE, before=None, batch_shows=ARCHIVE_BATCH_SHOWS):
+    """Archive every show dated before `before` (default today) from every booking database"""
+    before = before or date.today().isoformat()
+    history = get_pool(history_database).connect()
+    create_history_tables(history)
+    history.commit()
+
+    totals = {'shows': 0, 'bookings': 0}
+    try:
+        for database in storage.shard_databases():
+            conn = storage.connect_shard(database)
+            try:
+                while True:
+                    show_ids = find_finished_shows(conn, before, batch_shows)
+                    if not show_ids:
+                        break
+                    totals['bookings'] += archive_batch(conn, history, show_ids)
+                    totals['shows'] += len(show_ids)
+            finally:
+                conn.close()
+    finally:
+        history.close()
+    return totals
+
+class HistoryArchive:
+    """Read side of the history database; every lookup is empty until the first archive run"""
+
+    def __init__(self, database=HISTORY_DATABASE):
+        self.database = database
+
+    def _connect(self):
+        if not os.path.exists(self.database):
+            return None
+        return get_pool(self.database).connect()
+
+    def _load(self, conn, show_ids):
+        """{booking_id: booking} for every archived booking of the given shows"""
+        show_ids = list(show_ids)
+        if not show_ids:
+            return {}
+        rows = conn.execute(
+            f"SELECT payload FROM archived_shows WHERE show_id IN ({','.join('?' * len(show_ids))})", show_ids
+        ).fetchall()
+        return {booking['booking_id']: booking for row in rows for booking in decode_bookings(row['payload'])}
+
+    def find_booking(self, booking_id):
+        """Return an archived booking as a dict, or None"""
+        conn = self._connect()
+        if conn is None:
+            return None
+        try:
+            row = conn.execute('SELECT show_id FROM archived_bookings WHERE booking_id = ?', (booking_id,)).fetchone()
+            return self._load(conn, [row['show_id']]).get(booking_id) if row else None
+        finally:
+            conn.close()
+
+    def user_bookings(self, user_id, limit, after=None):
+        """A user's archived bookings newest first, continuing after a (booking_date, booking_id) key"""
+        conn = self._connect()
+        if conn is None:
+            return []
+        try:
+            query = 'SELECT booking_id, show_id FROM archived_bookings WHERE user_id = ?'
+            params = [user_id]
+            if after:
+                query += ' AND (booking_date, booking_id) < (?, ?)'
+                params += after
+            rows = conn.execute(query + ' ORDER BY booking_date DESC, booking_id DESC LIMIT ?', [*params, limit]).fetchall()
+            bookings = self._load(conn, {row['show_id'] for row in rows})
+            return [bookings[row['booking_id']] for row in rows]
+        finally:
+            conn.close()
+
+    def export_shows(self, show_id=None, movie_id=None, date_from=None, date_to=None, booked_on=None,
+                     batch_shows=ARCHIVE_BATCH_SHOWS):
+        """
+        Yield lists of (archived show, its bookings) in show order, batch_shows shows at a time,
+        filtered like export.build_query. Reads through a read-only connection, as exports do.
+        """
+        if not os.path.exists(self.database):
+            return
+        clauses = []
+        params = []
+        if show_id is not None:
+            clauses.append('show_id = ?')
+            params.append(show_id)
+        if movie_id is not None:
+            clauses.append('movie_id = ?')
+            params.append(movie_id)
+        if date_from:
+            clauses.append('show_date >= ?')
+            params.append(date_from)
+        if date_to:
+            clauses.append('show_date <= ?')
+            params.append(date_to)
+        booked = None
+        if booked_on:
+            booked = (booked_on, (date.fromisoformat(booked_on) + timedelta(days=1)).isoformat())
+            clauses.append(
+                'show_id IN (SELECT show_id FROM archived_bookings WHERE booking_date >= ? AND booking_date < ?)'
+            )
+            params += booked
+
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ''
+        conn = connect_readonly(self.database)
+        try:
+            cursor = conn.execute(
+                f'SELECT show_id, movie_id, show_date, start_time, payload FROM archived_shows{where} ORDER BY show_id',
+                params
+            )
+            while True:
+                rows = cursor.fetchmany(batch_shows)
+                if not rows:
+                    break
+                batch = []
+                for row in rows:
+                    bookings = sorted(decode_bookings(row['payload']),
+                                      key=lambda booking: (booking['booking_date'], booking['booking_id']))
+                    if booked:
+                        bookings = [b for b in bookings if booked[0] <= b['booking_date'] < booked[1]]
+                    batch.append((row, bookings))
+                yield batch
+        finally:
+            conn.close()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Move bookings of finished shows into the history database')
+    parser.add_argument('--keep-days', type=int, default=0, help='also keep shows from this many past days hot')
+    parser.add_argument('--batch-shows', type=int, default=ARCHIVE_BATCH_SHOWS, help='shows moved per transaction')
+    args = parser.parse_args()
+
+    storage = create_storage(os.getenv('STORAGE_BACKEND', 'single'), DATABASE, os.getenv('SHARD_DIR', 'shards'))
+    started = time.perf_counter()
+    cutoff = (date.today() - timedelta(days=args.keep_days)).isoformat()
+    moved = archive(storage, before=cutoff, batch_shows=args.batch_shows)
+    print(f"Archived {moved['bookings']} bookings from {moved['shows']} shows dated before {cutoff} "
+          f"into {HISTORY_DATABASE} in {time.perf_counter() - started:.2f}s")
@@ -0,0 +1,89 @@
+"""
+Static Asset Pipeline for Movie Reservation System
+Writes content-hashed copies of static files with precompressed variants, plus a manifest
+
+    python assets.py
+"""
+
+import hashlib
+import json
+import os
+import shutil
+
+from compression import ENCODINGS, encode
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+DIST_DIR = os.path.join(STATIC_DIR, 'dist')
+MANIFEST_NAME = 'manifest.json'
+
+COMPRESSIBLE = ('.css', '.js', '.svg', '.json', '.txt', '.html')
+MIN_COMPRESS_SIZE = 256
+
+def hashed_name(path, data):
+    """css/style.css -> css/style.<first 10 hex of sha256>.css"""
+    root, ext = os.path.splitext(path)
+    return f"{root}.{hashlib.sha256(data).hexdigest()[:10]}{ext}"
+
+def build(static_dir=STATIC_DIR, dist_dir=DIST_DIR):
+    """Fingerprint every file under static_dir into dist_dir and return the manifest"""
+    shutil.rmtree(dist_dir, ignore_errors=True)
+    manifest = {}
+
+    for root, dirs, files in os.walk(static_dir):
+        dirs[:] = [d for d in dirs if os.path.join(root, d) != dist_dir]
+        for name in sorted(f for f in files if not f.startswith('.')):
+            source = os.path.join(root, name)
+            logical = os.path.relpath(source, static_dir).replace(os.sep, '/')
+            with open(source, 'rb') as f:
+                data = f.read()
+
+            target = hashed_name(logical, data)
+            target_path = os.path.join(dist_dir, target)
+            os.makedirs(os.path.dirname(target_path), exist_ok=True)
+            with open(target_path, 'wb') as f:
+                f.write(data)
+
+            encodings = []
+            if logical.endswith(COMPRESSIBLE) and len(data) >= MIN_COMPRESS_SIZE:
+                for encoding in ENCODINGS:
+                    compressed = encode(data, encoding)
+                    if len(compressed) < len(data):
+                        with open(f"{target_path}.{'gz' if encoding == 'gzip' else encoding}", 'wb') as f:
+                            f.write(compressed)
+                        encodings.append(encoding)
+
+            manifest[logical] = {'path': target, 'encodings': encodings}
+
+    with open(os.path.join(dist_dir, MANIFEST_NAME), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+class AssetManifest:
+    """Maps logical static paths to their fingerprinted copies; empty until `python assets.py` has run"""
+
+    def __init__(self, dist_dir=DIST_DIR):
+        self.dist_dir = dist_dir
+        self.assets = {}
+        self.by_path = {}
+        self.reload()
+
+    def reload(self):
+        try:
+            with open(os.path.join(self.dist_dir, MANIFEST_NAME)) as f:
+                self.assets = json.load(f)
+        except (OSError, ValueError):
+            self.assets = {}
+        self.by_path = {entry['path']: entry for entry in self.assets.values()}
+
+    def lookup(self, filename):
+        """Return the manifest entry for a logical path, or None if it was not built"""
+        return self.assets.get(filename)
+
+    def entry_for(self, hashed_path):
+        """Return the manifest entry for a fingerprinted path, or None"""
+        return self.by_path.get(hashed_path)
+
+if __name__ == '__main__':
+    built = build()
+    variants = sum(len(entry['encodings']) for entry in built.values())
+    print(f"Built {len(built)} assets with {variants} precompressed variants in {DIST_DIR}")
@@ -0,0 +1,373 @@
+"""
+Flash-Sale Benchmark for Movie Reservation System
+Seeds a synthetic database, starts a local server and drives concurrent
+booking, cancel and seat-polling workloads against it.
+
+    python benchmarks/flash_sale.py --bookers 32 --pollers 64 --duration 30
+    python benchmarks/flash_sale.py --compare before.json after.json
+"""
+
+import argparse
+import glob
+import json
+import os
+import random
+import shutil
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+import requests
+from werkzeug.security import generate_password_hash
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+import init_db
+from shows import schedule_shows
+
+PASSWORD = 'benchpass'
+GENRES = ['Action', 'Comedy', 'Drama', 'Horror', 'Sci-Fi', 'Thriller', 'Animation', 'Romance']
+SEATS = [f"{row}{col}" for row in 'ABCDEFGH' for col in range(1, 11)]
+
+def seed_database(path, movies, users, days):
+    """Create a synthetic database through init_db and return the ids of tomorrow's shows"""
+    init_db.DATABASE = path
+    init_db.create_tables()
+
+    conn = init_db.get_db_connection()
+    conn.executemany(
+        'INSERT INTO movies (imdb_id, title, poster_url, release_year, description, genre, rating) VALUES (?, ?, ?, ?, ?, ?, ?)',
+        [
+            (f'bench{i:06d}', f'Benchmark Movie {i}', '/static/images/no-poster.png', str(1980 + i % 45),
+             f'Synthetic movie number {i} for load testing.', random.choice(GENRES), f'{5 + i % 50 / 10:.1f}')
+            for i in range(movies)
+        ]
+    )
+    password_hash = generate_password_hash(PASSWORD)
+    conn.executemany(
+        'INSERT INTO users (first_name, last_name, email, password_hash) VALUES (?, ?, ?, ?)',
+        [('Bench', f'User{i}', f'user{i}@bench.local', password_hash) for i in range(users)]
+    )
+    conn.commit()
+    schedule_shows(conn, days=days)
+
+    tomorrow = (date.today() + timedelta(days=1)).isoformat()
+    show_ids = [row['id'] for row in conn.execute('SELECT id FROM shows WHERE show_date = ? ORDER BY id', (tomorrow,))]
+    conn.close()
+    return show_ids
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def start_server(workdir, port, storage):
+    """Run app.py's Flask app in a subprocess against the database in workdir"""
+    env = dict(os.environ, PYTHONPATH=REPO_DIR, MAIL_USERNAME='', MAIL_SERVER='smtp.invalid', STORAGE_BACKEND=storage)
+    code = f"from app import create_app; create_app().run(host='127.0.0.1', port={port}, threaded=True)"
+    server = subprocess.Popen([sys.executable, '-c', code], cwd=workdir, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f'http://127.0.0.1:{port}'
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            if requests.get(f'{base_url}/api/db-stats', timeout=1).ok:
+                return server, base_url
+        except requests.ConnectionError:
+            time.sleep(0.2)
+    server.kill()
+    raise RuntimeError('Server did not start')
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+def summarize(latencies, elapsed):
+    values = sorted(latencies)
+    return {
+        'count': len(values),
+        'throughput_per_s': round(len(values) / elapsed, 2),
+        'p50_ms': round(percentile(values, 50) * 1000, 2) if values else None,
+        'p95_ms': round(percentile(values, 95) * 1000, 2) if values else None,
+        'p99_ms': round(percentile(values, 99) * 1000, 2) if values else None,
+        'max_ms': round(values[-1] * 1000, 2) if values else None,
+    }
+
+class Recorder:
+    """Thread-safe collection of latencies and counters"""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.counters = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def timing(self, name, seconds):
+        with self._lock:
+            self.latencies[name].append(seconds)
+
+    def count(self, name, amount=1):
+        with self._lock:
+            self.counters[name] += amount
+
+def login(base_url, user_index):
+    session = requests.Session()
+    # Sign-in sheds load with 503 and Retry-After when password hashing is saturated
+    while True:
+        response = session.post(f'{base_url}/login', data={'email': f'user{user_index}@bench.local', 'password': PASSWORD},
+                                allow_redirects=False)
+        if response.status_code != 503:
+            return session
+        time.sleep(float(response.headers.get('Retry-After', 1)))
+
+def wait_for_admission(base_url, session, response, form, recorder, stop):
+    """Poll a waiting-room ticket like the queue page does, then resubmit the booking once admitted"""
+    ticket = response.headers.get('X-Admission-Ticket')
+    if response.status_code not in (202, 429) or not ticket:
+        return response
+
+    recorder.count('queued')
+    while not stop.is_set():
+        time.sleep(float(response.headers.get('Retry-After', 1)))
+        status = session.get(f'{base_url}/api/admission/{ticket}')
+        if status.status_code != 200:
+            return response
+        if status.json()['status'] == 'admitted':
+            return session.post(f'{base_url}/book', data={**form, 'admission_ticket': ticket}, allow_redirects=False)
+    return response
+
+def booker(base_url, user_index, shows, recorder, stop, max_retries, booked):
+    """Read a seat map, try to book 1-4 free seats, and retry with new seats on conflict"""
+    session = login(base_url, user_index)
+    while not stop.is_set():
+        show_id = random.choice(shows)
+        for attempt in range(max_retries + 1):
+            started = time.perf_counter()
+            taken = set(session.get(f'{base_url}/api/booked-seats/{show_id}').json())
+            recorder.timing('poll', time.perf_counter() - started)
+
+            free = [seat for seat in SEATS if seat not in taken]
+            if not free:
+                recorder.count('sold_out')
+                time.sleep(0.05)
+                break
+
+            seats = random.sample(free, min(len(free), random.randint(1, 4)))
+            started = time.perf_counter()
+            response = session.post(f'{base_url}/book', data={'show_id': show_id, 'seats': ','.join(seats)},
+                                    allow_redirects=False)
+            response = wait_for_admission(base_url, session, response, {'show_id': show_id, 'seats': ','.join(seats)},
+                                          recorder, stop)
+            recorder.timing('book', time.perf_counter() - started)
+            recorder.count('book_attempts')
+            location = response.headers.get('Location', '')
+
+            if response.status_code == 503:
+                recorder.count('shed')
+                time.sleep(float(response.headers.get('Retry-After', 1)))
+                break
+            if response.status_code >= 500:
+                recorder.count('errors')
+                break
+            if response.status_code in (202, 429):
+                recorder.count('queue_expired')
+                break
+            if '/confirmation/' in location:
+                recorder.count('bookings')
+                recorder.count('retries', attempt)
+                booked.append((location.rsplit('/', 1)[-1], f'user{user_index}@bench.local'))
+                break
+
+            # Follow the redirect to read the flash message, like a user looking at the seat page again
+            page = session.get(requests.compat.urljoin(base_url, location))
+            if 'already booked' in page.text:
+                recorder.count('conflicts')
+            else:
+                recorder.count('failed_other')
+                break
+        else:
+            recorder.count('gave_up')
+
+def canceller(base_url, recorder, stop, booked, interval):
+    """Cancel random earlier bookings to free seats back into the sale"""
+    session = requests.Session()
+    while not stop.is_set():
+        time.sleep(interval)
+        try:
+            booking_id, email = booked.pop(random.randrange(len(booked)))
+        except (IndexError, ValueError):
+            continue
+        started = time.perf_counter()
+        response = session.post(f'{base_url}/cancel', data={'booking_id': booking_id, 'email': email})
+        recorder.timing('cancel', time.perf_counter() - started)
+        recorder.count('cancellations' if response.ok and 'successfully cancelled' in response.text else 'cancel_failed')
+
+def poller(base_url, shows, recorder, stop, interval):
+    """Poll a seat map with If-None-Match the way an open seat page would"""
+    session = requests.Session()
+    show_id = random.choice(shows)
+    etag = None
+    while not stop.is_set():
+        headers = {'If-None-Match': etag} if etag else {}
+        started = time.perf_counter()
+        response = session.get(f'{base_url}/api/booked-seats/{show_id}', headers=headers)
+        recorder.timing('poll', time.perf_counter() - started)
+        recorder.count('poll_not_modified' if response.status_code == 304 else 'poll_full')
+        etag = response.headers.get('ETag', etag)
+        time.sleep(interval)
+
+def probe_databases(workdir):
+    """(timing name, path) of every database the server writes: the main file, movie shards and admission lines"""
+    databases = [('lock_wait', os.path.join(workdir, 'database.db'))]
+    for name, directory in (('lock_wait_shard', 'shards'), ('lock_wait_admission', 'admission')):
+        databases += [(name, path) for path in sorted(glob.glob(os.path.join(workdir, directory, '*.db')))]
+    return databases
+
+def lock_probe(workdir, recorder, stop, interval):
+    """Measure how long a writer waits for SQLite's write lock on each database while the load runs"""
+    conns = {}
+    while not stop.is_set():
+        # Shard and admission files appear as the sale reaches them, so look again every round
+        for name, path in probe_databases(workdir):
+            if path not in conns:
+                conns[path] = sqlite3.connect(path, timeout=30, isolation_level=None)
+            started = time.perf_counter()
+            try:
+                conns[path].execute('BEGIN IMMEDIATE')
+                recorder.timing(name, time.perf_counter() - started)
+                conns[path].execute('ROLLBACK')
+            except sqlite3.OperationalError:
+                recorder.count(name.replace('lock_wait', 'lock_timeouts'))
+        time.sleep(interval)
+    for conn in conns.values():
+        conn.close()
+
+def run(args):
+    workdir = args.workdir or tempfile.mkdtemp(prefix='flash-sale-')
+    os.makedirs(workdir, exist_ok=True)
+    db_path = os.path.join(workdir, 'database.db')
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    shutil.rmtree(os.path.join(workdir, 'shards'), ignore_errors=True)
+    shutil.rmtree(os.path.join(workdir, 'admission'), ignore_errors=True)
+
+    print(f"Seeding {args.movies} movies, {args.users} users, {args.days} days of shows in {workdir}...")
+    show_ids = seed_database(db_path, args.movies, args.users, args.days)
+    hot_shows = show_ids[:args.hot_shows]
+
+    server, base_url = start_server(workdir, args.port or free_port(), args.storage)
+    recorder = Recorder()
+    stop = threading.Event()
+    booked = []
+    threads = [threading.Thread(target=lock_probe, args=(workdir, recorder, stop, 0.05))]
+    threads += [
+        threading.Thread(target=booker, args=(base_url, i % args.users, hot_shows, recorder, stop, args.max_retries, booked))
+        for i in range(args.bookers)
+    ]
+    threads += [
+        threading.Thread(target=poller, args=(base_url, hot_shows, recorder, stop, args.poll_interval))
+        for _ in range(args.pollers)
+    ]
+    threads += [
+        threading.Thread(target=canceller, args=(base_url, recorder, stop, booked, args.cancel_interval))
+        for _ in range(args.cancellers)
+    ]
+
+    print(f"Running {args.bookers} bookers, {args.pollers} pollers, {args.cancellers} cancellers "
+          f"on {len(hot_shows)} shows for {args.duration}s against {base_url}...")
+    try:
+        started = time.perf_counter()
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+        time.sleep(args.duration)
+        stop.set()
+        for thread in threads:
+            thread.join(30)
+        elapsed = time.perf_counter() - started
+        db_stats = requests.get(f'{base_url}/api/db-stats', timeout=5).json()
+    finally:
+        server.terminate()
+        server.wait(10)
+
+    counters = dict(recorder.counters)
+    attempts = counters.get('book_attempts', 0)
+    results = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'config': {key: value for key, value in vars(args).items() if key not in ('compare', 'output')},
+        'elapsed_s': round(elapsed, 2),
+        'latency': {name: summarize(values, elapsed) for name, values in recorder.latencies.items()},
+        'counters': counters,
+        'conflict_rate': round(counters.get('conflicts', 0) / attempts, 4) if attempts else 0,
+        'retry_rate': round(counters.get('retries', 0) / max(counters.get('bookings', 0), 1), 4),
+        'db_pool': db_stats,
+    }
+
+    output = args.output or os.path.join(REPO_DIR, 'benchmarks', 'results', f"flash_sale-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+
+    print_report(results)
+    print(f"Results saved to {output}")
+
+def print_report(results):
+    print(f"\n{'operation':<20}{'count':>8}{'ops/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for name, stats in sorted(results['latency'].items()):
+        print(f"{name:<20}{stats['count']:>8}{stats['throughput_per_s']:>10}{stats['p50_ms']:>10}"
+              f"{stats['p95_ms']:>10}{stats['p99_ms']:>10}{stats['max_ms']:>10}")
+    print(f"\nconflict rate {results['conflict_rate']:.2%}, retries per booking {results['retry_rate']:.2f}")
+    print(f"counters: {json.dumps(results['counters'], sort_keys=True)}")
+
+def compare(before_path, after_path):
+    """Print the change in latency and throughput between two result files"""
+    with open(before_path) as f:
+        before = json.load(f)
+    with open(after_path) as f:
+        after = json.load(f)
+
+    print(f"{'operation':<20}{'metric':<18}{'before':>12}{'after':>12}{'change':>10}")
+    for name in sorted(set(before['latency']) | set(after['latency'])):
+        for metric in ('throughput_per_s', 'p50_ms', 'p95_ms', 'p99_ms'):
+            old = before['latency'].get(name, {}).get(metric)
+            new = after['latency'].get(name, {}).get(metric)
+            change = f"{(new - old) / old:+.1%}" if old and new is not None else '-'
+            print(f"{name:<20}{metric:<18}{str(old):>12}{str(new):>12}{change:>10}")
+    for metric in ('conflict_rate', 'retry_rate'):
+        print(f"{'booking':<20}{metric:<18}{before[metric]:>12}{after[metric]:>12}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Flash-sale load test for the booking paths')
+    parser.add_argument('--movies', type=int, default=500)
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--days', type=int, default=7)
+    parser.add_argument('--hot-shows', type=int, default=5, help='number of shows the sale concentrates on')
+    parser.add_argument('--bookers', type=int, default=16)
+    parser.add_argument('--pollers', type=int, default=32)
+    parser.add_argument('--cancellers', type=int, default=2)
+    parser.add_argument('--duration', type=float, default=20)
+    parser.add_argument('--max-retries', type=int, default=3)
+    parser.add_argument('--poll-interval', type=float, default=0.5)
+    parser.add_argument('--cancel-interval', type=float, default=0.2)
+    parser.add_argument('--storage', choices=['single', 'sharded'], default='single', help='STORAGE_BACKEND for the server')
+    parser.add_argument('--port', type=int)
+    parser.add_argument('--workdir', help='directory for the benchmark database (defaults to a temp dir)')
+    parser.add_argument('--output', help='where to write the JSON results')
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'), help='compare two result files')
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+    else:
+        run(args)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""
+Ingestion Benchmark for Movie Reservation System
+Runs init_db's OMDb ingestion (search, details, posters, show scheduling) against the local stub server
+and reports throughput for several worker counts
+
+    python benchmarks/ingest.py --terms 40 --latency 50 --workers 1,8,16
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+import init_db
+from omdb import OmdbClient
+from omdb_stub import start_stub
+
+def ingest(workdir, stub, terms, workers, results_per_term):
+    """Ingest into a fresh database in workdir and return timings and request counts"""
+    shutil.rmtree(workdir, ignore_errors=True)
+    os.makedirs(workdir)
+    init_db.DATABASE = os.path.join(workdir, 'database.db')
+    init_db.POSTER_CACHE_DIR = os.path.join(workdir, 'poster_cache')
+    init_db.OMDB_WORKERS = workers
+    init_db.RESULTS_PER_TERM = results_per_term
+    with contextlib.redirect_stdout(io.StringIO()):
+        init_db.create_tables()
+
+    stub.counts.update(requests=0, posters=0)
+    client = OmdbClient('stub', base_url=stub.base_url, cache_dir=None, pool_size=workers)
+    log = io.StringIO()
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(log):
+        init_db.fetch_movies_from_omdb(terms, client=client)
+    elapsed = time.perf_counter() - started
+
+    conn = sqlite3.connect(init_db.DATABASE)
+    movies, shows = conn.execute('SELECT (SELECT COUNT(*) FROM movies), (SELECT COUNT(*) FROM shows)').fetchone()
+    conn.close()
+    return {
+        'workers': workers,
+        'seconds': elapsed,
+        'movies': movies,
+        'shows': shows,
+        'movies_per_second': movies / elapsed,
+        'api_requests': client.stats['requests'],
+        'stub_requests': stub.counts['requests'],
+        'poster_downloads': stub.counts['posters'],
+        'log': [line for line in log.getvalue().splitlines() if not line.startswith('Added: ')],
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline OMDb ingestion throughput against a stub server')
+    parser.add_argument('--terms', type=int, default=20, help='number of search terms')
+    parser.add_argument('--results-per-term', type=int, default=init_db.RESULTS_PER_TERM)
+    parser.add_argument('--latency', type=float, default=20, help='milliseconds the stub adds to every response')
+    parser.add_argument('--workers', default='1,8', help='comma-separated OMDB_WORKERS values to compare')
+    parser.add_argument('--output', help='where to write the JSON results')
+    args = parser.parse_args()
+
+    stub = start_stub(latency=args.latency / 1000)
+    terms = [f'stub term {i}' for i in range(args.terms)]
+    workdir = tempfile.mkdtemp(prefix='ingest-bench-')
+    try:
+        runs = [ingest(os.path.join(workdir, f'workers-{workers}'), stub, terms, workers, args.results_per_term)
+                for workers in (int(value) for value in args.workers.split(','))]
+    finally:
+        stub.shutdown()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"{'workers':>7} {'seconds':>8} {'movies':>7} {'movies/s':>9} {'API req':>8} {'posters':>8} {'shows':>6}")
+    for run in runs:
+        print(f"{run['workers']:>7} {run['seconds']:>8.2f} {run['movies']:>7} {run['movies_per_second']:>9.1f} "
+              f"{run['api_requests']:>8} {run['poster_downloads']:>8} {run['shows']:>6}")
+
+    results = {'started_at': datetime.now().isoformat(timespec='seconds'), 'config': vars(args), 'runs': runs}
+    output = args.output or os.path.join(REPO_DIR, 'benchmarks', 'results', f"ingest-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nresults saved to {output}")
+
+if __name__ == '__main__':
+    main()
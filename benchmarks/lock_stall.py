@@ -0,0 +1,166 @@
+"""
+Lock-Stall Benchmark for Movie Reservation System
+Starts the production gunicorn setup, holds a show's booking database write lock from another process
+while a booking waits on it, and times seat-map reads meanwhile; readers must not wait behind the writer
+
+    python benchmarks/lock_stall.py --hold 3 --readers 8
+    python benchmarks/lock_stall.py --storage sharded
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+import requests
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from flash_sale import Recorder, free_port, login, seed_database, summarize
+
+def start_gunicorn(workdir, port, storage):
+    """Run wsgi:app under gunicorn.conf.py with one gevent worker, against the database in workdir"""
+    env = dict(os.environ, PYTHONPATH=REPO_DIR, MAIL_USERNAME='', MAIL_SERVER='smtp.invalid', STORAGE_BACKEND=storage,
+               WEB_CONCURRENCY='1', BIND=f'127.0.0.1:{port}', ACCESS_LOG='')
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', os.path.join(REPO_DIR, 'gunicorn.conf.py'), 'wsgi:app'],
+        cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    base_url = f'http://127.0.0.1:{port}'
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            if requests.get(f'{base_url}/api/db-stats', timeout=1).ok:
+                return server, base_url
+        except requests.ConnectionError:
+            time.sleep(0.2)
+    server.kill()
+    raise RuntimeError('Server did not start')
+
+def booking_database(workdir, show_id):
+    """Path of the database holding a show's bookings, once a booking has routed it"""
+    conn = sqlite3.connect(os.path.join(workdir, 'database.db'))
+    row = conn.execute('''
+        SELECT r.database FROM shows s LEFT JOIN shard_routes r ON r.movie_id = s.movie_id WHERE s.id = ?
+    ''', (show_id,)).fetchone()
+    conn.close()
+    return os.path.join(workdir, row[0] if row and row[0] else 'database.db')
+
+def hold_write_lock(path, seconds, locked):
+    """Take the write lock the way another process's long transaction would, and keep it for `seconds`"""
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute('BEGIN IMMEDIATE')
+    locked.set()
+    time.sleep(seconds)
+    conn.execute('ROLLBACK')
+    conn.close()
+
+def reader(base_url, show_id, recorder, stop):
+    session = requests.Session()
+    while not stop.is_set():
+        for name, path in (('booked_seats', f'/api/booked-seats/{show_id}'), ('availability', '/api/shows/availability')):
+            started = time.perf_counter()
+            response = session.get(f'{base_url}{path}', timeout=30)
+            recorder.timing(name, time.perf_counter() - started)
+            if not response.ok:
+                recorder.count(f'{name}_errors')
+
+def run(args):
+    workdir = args.workdir or tempfile.mkdtemp(prefix='lock-stall-')
+    os.makedirs(workdir, exist_ok=True)
+    db_path = os.path.join(workdir, 'database.db')
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    shutil.rmtree(os.path.join(workdir, 'shards'), ignore_errors=True)
+    shutil.rmtree(os.path.join(workdir, 'admission'), ignore_errors=True)
+    show_id = seed_database(db_path, 20, 2, 2)[0]
+
+    server, base_url = start_gunicorn(workdir, args.port or free_port(), args.storage)
+    try:
+        session = login(base_url, 0)
+        # A first booking routes the show to its database and warms the seat cache
+        session.post(f'{base_url}/book', data={'show_id': show_id, 'seats': 'A1'}, allow_redirects=False)
+        session.get(f'{base_url}/api/booked-seats/{show_id}')
+        lock_path = booking_database(workdir, show_id)
+
+        recorder = Recorder()
+        stop = threading.Event()
+        locked = threading.Event()
+        locker = threading.Thread(target=hold_write_lock, args=(lock_path, args.hold, locked), daemon=True)
+        locker.start()
+        locked.wait()
+
+        writer = {}
+        def book():
+            started = time.perf_counter()
+            response = session.post(f'{base_url}/book', data={'show_id': show_id, 'seats': 'B1'}, allow_redirects=False,
+                                    timeout=30)
+            writer.update(seconds=time.perf_counter() - started, status=response.status_code)
+        threads = [threading.Thread(target=book, daemon=True)]
+        threads += [threading.Thread(target=reader, args=(base_url, show_id, recorder, stop), daemon=True)
+                    for _ in range(args.readers)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        locker.join()
+        stop.set()
+        for thread in threads:
+            thread.join(30)
+        elapsed = time.perf_counter() - started
+    finally:
+        server.terminate()
+        server.wait(10)
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    latency = {name: summarize(values, elapsed) for name, values in recorder.latencies.items()}
+    stalled = [name for name, stats in latency.items() if stats['max_ms'] > args.max_read_ms]
+    results = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'config': {key: value for key, value in vars(args).items() if key != 'output'},
+        'lock_held_s': args.hold,
+        'writer': writer,
+        'latency': latency,
+        'counters': dict(recorder.counters),
+        'stalled': stalled,
+    }
+
+    output = args.output or os.path.join(REPO_DIR, 'benchmarks', 'results', f"lock_stall-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+
+    print(f"writer: {writer.get('seconds', 0) * 1000:.0f} ms, status {writer.get('status')} "
+          f"(lock held {args.hold * 1000:.0f} ms)")
+    print(f"{'reader':<14} {'count':>6} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for name, stats in latency.items():
+        print(f"{name:<14} {stats['count']:>6} {stats['p50_ms']:>8} {stats['p99_ms']:>8} {stats['max_ms']:>8}")
+    print(f"Results saved to {output}")
+    if stalled:
+        print(f"FAIL: {', '.join(stalled)} waited longer than {args.max_read_ms} ms behind the blocked writer")
+    return not stalled
+
+def main():
+    parser = argparse.ArgumentParser(description='Seat-map read latency while a booking waits on a locked database')
+    parser.add_argument('--hold', type=float, default=3, help='seconds the outside process keeps the write lock')
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--max-read-ms', type=float, default=500, help='slowest read that still counts as not stalled')
+    parser.add_argument('--storage', choices=['single', 'sharded'], default='single', help='STORAGE_BACKEND for the app')
+    parser.add_argument('--port', type=int)
+    parser.add_argument('--workdir', help='directory for the benchmark database (defaults to a temp dir)')
+    parser.add_argument('--output', help='where to write the JSON results')
+    args = parser.parse_args()
+
+    if not run(args):
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
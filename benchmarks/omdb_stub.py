@@ -0,0 +1,108 @@
+"""
+OMDb Stub Server for Movie Reservation System
+Answers OMDb search and detail requests with deterministic synthetic movies, and serves their posters,
+so ingestion can run and be benchmarked offline
+
+    python benchmarks/omdb_stub.py --port 8089 --latency 50
+    OMDB_API_URL=http://127.0.0.1:8089/ python init_db.py
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+POSTER_PATH = os.path.join(REPO_DIR, 'static', 'images', 'no-poster.png')
+GENRES = ['Action', 'Comedy', 'Drama', 'Horror', 'Sci-Fi', 'Thriller', 'Animation', 'Romance']
+RESULTS_PER_PAGE = 10
+
+def imdb_id(term, index):
+    """Stable fake IMDb id for the index-th result of a search term"""
+    return 'tt' + str(int(hashlib.sha1(f'{term}:{index}'.encode('utf-8')).hexdigest()[:10], 16) % 10 ** 8).zfill(8)
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        server = self.server
+        time.sleep(server.latency)
+        with server.lock:
+            server.counts['requests'] += 1
+
+        url = urlparse(self.path)
+        if url.path.startswith('/posters/'):
+            with server.lock:
+                server.counts['posters'] += 1
+            return self._send(200, server.poster, 'image/png')
+
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        if 's' in params:
+            term = params['s']
+            results = [{
+                'Title': f'{term.title()} {index + 1}',
+                'Year': str(1980 + index),
+                'imdbID': imdb_id(term, index),
+                'Type': 'movie',
+                'Poster': self._poster_url(imdb_id(term, index)),
+            } for index in range(RESULTS_PER_PAGE)]
+            body = {'Search': results, 'totalResults': str(RESULTS_PER_PAGE), 'Response': 'True'}
+        elif 'i' in params:
+            movie_id = params['i']
+            seed = int(movie_id[2:] or 0)
+            body = {
+                'Title': f'Stub Movie {movie_id}',
+                'Year': str(1980 + seed % 45),
+                'Genre': GENRES[seed % len(GENRES)],
+                'Plot': f'Synthetic plot for {movie_id}.',
+                'Poster': self._poster_url(movie_id),
+                'imdbRating': f'{5 + seed % 50 / 10:.1f}',
+                'imdbID': movie_id,
+                'Response': 'True',
+            }
+        else:
+            body = {'Response': 'False', 'Error': 'Incorrect IMDb ID.'}
+        self._send(200, json.dumps(body).encode('utf-8'), 'application/json')
+
+    def _poster_url(self, movie_id):
+        return f'http://{self.server.server_address[0]}:{self.server.server_address[1]}/posters/{movie_id}.png'
+
+    def _send(self, status, body, content_type):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_stub(port=0, latency=0.0):
+    """Serve the stub from a background thread; returns the server (base URL in server.base_url)"""
+    server = ThreadingHTTPServer(('127.0.0.1', port), StubHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.lock = threading.Lock()
+    server.counts = {'requests': 0, 'posters': 0}
+    with open(POSTER_PATH, 'rb') as f:
+        server.poster = f.read()
+    server.base_url = f'http://127.0.0.1:{server.server_address[1]}/'
+    threading.Thread(target=server.serve_forever, name='omdb-stub', daemon=True).start()
+    return server
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Offline stand-in for the OMDb API')
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--latency', type=float, default=0, help='milliseconds added to every response')
+    args = parser.parse_args()
+
+    server = start_stub(args.port, args.latency / 1000)
+    print(f"OMDb stub listening on {server.base_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,193 @@
+"""
+Startup Benchmark for Movie Reservation System
+Forks workers the way a prefork server does and times each one's first requests,
+once with the application imported cold in every worker and once preloaded in the parent.
+
+    python benchmarks/startup.py --workers 4
+    python benchmarks/startup.py --storage sharded --movies 2000
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from flash_sale import seed_database
+
+MODES = ('cold', 'preload')
+MEMORY_FIELDS = ('Pss', 'Private_Clean', 'Private_Dirty', 'Shared_Clean', 'Shared_Dirty')
+
+# The application built and warmed before forking in preload mode; forked workers inherit it
+preloaded = None
+
+def memory_kb():
+    """Proportional, private and shared memory of this process from /proc, or {} where it is not available"""
+    try:
+        with open('/proc/self/smaps_rollup') as f:
+            lines = [line.split() for line in f]
+    except OSError:
+        return {}
+    return {line[0].rstrip(':'): int(line[1]) for line in lines if line and line[0].rstrip(':') in MEMORY_FIELDS}
+
+def first_requests(application, paths):
+    """Request each path once and return its latency; any error status fails the run"""
+    client = application.test_client()
+    latencies = {}
+    for path in paths:
+        started = time.monotonic()
+        response = client.get(path)
+        latencies[path] = time.monotonic() - started
+        if response.status_code >= 400:
+            raise RuntimeError(f"{path} returned {response.status_code}")
+    return latencies
+
+def worker(mode, paths, forked_at):
+    """Body of one forked worker: build or reuse the app, then serve its first requests"""
+    if mode == 'cold':
+        from app import create_app, start_background_workers
+        application = create_app()
+        start_background_workers(application)
+    else:
+        application = preloaded
+    app_ready = time.monotonic() - forked_at
+    latencies = first_requests(application, paths)
+    return {
+        'app_ready': app_ready,
+        'first_request': app_ready + latencies[paths[0]],
+        'all_paths': time.monotonic() - forked_at,
+        'latency': latencies,
+        'memory_kb': memory_kb(),
+    }
+
+def run_mode(mode, workers, paths):
+    """Runs in a fresh interpreter: optionally preload, fork the workers and collect their reports"""
+    global preloaded
+    started = time.monotonic()
+    if mode == 'preload':
+        from app import create_app, warm_start
+        preloaded = create_app()
+        warm_start(preloaded)
+    preload_seconds = time.monotonic() - started
+
+    children = []
+    for _ in range(workers):
+        read_fd, write_fd = os.pipe()
+        forked_at = time.monotonic()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            try:
+                report = worker(mode, paths, forked_at)
+            except Exception as e:
+                report = {'error': f"{type(e).__name__}: {e}"}
+            os.write(write_fd, json.dumps(report).encode('utf-8'))
+            os._exit(0)
+        os.close(write_fd)
+        children.append((pid, read_fd))
+
+    reports = []
+    for pid, read_fd in children:
+        with os.fdopen(read_fd, 'rb') as f:
+            reports.append(json.loads(f.read() or b'{"error": "worker exited without a report"}'))
+        os.waitpid(pid, 0)
+    return {
+        'mode': mode,
+        'preload_seconds': preload_seconds,
+        'all_workers_ready': time.monotonic() - started,
+        'workers': reports,
+    }
+
+def run(args):
+    workdir = args.workdir or tempfile.mkdtemp(prefix='startup-bench-')
+    try:
+        db_path = os.path.join(workdir, 'database.db')
+        if not os.path.exists(db_path):
+            seed_database(db_path, args.movies, 10, args.days)
+        tomorrow = (date.today() + timedelta(days=1)).isoformat()
+        conn = sqlite3.connect(db_path)
+        movie_id, show_id = conn.execute(
+            'SELECT movie_id, id FROM shows WHERE show_date = ? ORDER BY id LIMIT 1', (tomorrow,)
+        ).fetchone()
+        conn.close()
+        paths = ['/', f'/movie/{movie_id}', '/api/movies', f'/api/shows/{show_id}/best-seats?n=4']
+
+        env = dict(os.environ, PYTHONPATH=REPO_DIR, MAIL_USERNAME='', MAIL_SERVER='smtp.invalid',
+                   STORAGE_BACKEND=args.storage)
+        results = {'started_at': datetime.now().isoformat(timespec='seconds'), 'config': vars(args), 'paths': paths,
+                   'modes': {}}
+        for mode in MODES:
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), '--child', mode, '--workers', str(args.workers),
+                 '--paths', json.dumps(paths)],
+                cwd=workdir, env=env, capture_output=True, text=True, check=True
+            ).stdout
+            results['modes'][mode] = json.loads(output.strip().splitlines()[-1])
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    output = args.output or os.path.join(REPO_DIR, 'benchmarks', 'results', f"startup-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print_report(results)
+    print(f"\nresults saved to {output}")
+
+def print_report(results):
+    print(f"{'mode':<8} {'preload':>9} {'first req p50':>14} {'first req max':>14} {'all paths max':>14} "
+          f"{'all ready':>10} {'private MB':>11} {'PSS MB':>8}")
+    for mode, stats in results['modes'].items():
+        reports = [report for report in stats['workers'] if 'error' not in report]
+        for report in stats['workers']:
+            if 'error' in report:
+                print(f"{mode}: worker failed: {report['error']}")
+        if not reports:
+            continue
+        first = [report['first_request'] * 1000 for report in reports]
+        memory = [report['memory_kb'] for report in reports if report['memory_kb']]
+        private = statistics.mean(m['Private_Clean'] + m['Private_Dirty'] for m in memory) / 1024 if memory else 0
+        pss = statistics.mean(m['Pss'] for m in memory) / 1024 if memory else 0
+        print(f"{mode:<8} {stats['preload_seconds'] * 1000:>7.0f}ms {statistics.median(first):>12.1f}ms "
+              f"{max(first):>12.1f}ms {max(r['all_paths'] for r in reports) * 1000:>12.1f}ms "
+              f"{stats['all_workers_ready'] * 1000:>8.0f}ms {private:>11.1f} {pss:>8.1f}")
+
+    print('\nfirst-hit latency per path (median over workers):')
+    for path in results['paths']:
+        cells = []
+        for mode, stats in results['modes'].items():
+            latencies = [report['latency'][path] * 1000 for report in stats['workers'] if 'error' not in report]
+            if latencies:
+                cells.append(f"{mode} {statistics.median(latencies):7.1f}ms")
+        print(f"  {path:<36} {'   '.join(cells)}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Time-to-first-request of forked workers, cold versus preloaded')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--movies', type=int, default=500)
+    parser.add_argument('--days', type=int, default=7)
+    parser.add_argument('--storage', choices=['single', 'sharded'], default='single', help='STORAGE_BACKEND for the app')
+    parser.add_argument('--workdir', help='directory for the benchmark database (defaults to a temp dir)')
+    parser.add_argument('--output', help='where to write the JSON results')
+    parser.add_argument('--child', choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument('--paths', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if not hasattr(os, 'fork'):
+        parser.error('this benchmark forks workers and needs a POSIX system')
+    if args.child:
+        print(json.dumps(run_mode(args.child, args.workers, json.loads(args.paths))))
+    else:
+        run(args)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,357 @@
+"""
+Booking Engine for Movie Reservation System
+Claims seats atomically in one write transaction and manages temporary seat holds
+"""
+
+import sqlite3
+import time
+import uuid
+
+from shows import show_label
+
+BOOKING_SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS bookings (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        booking_id TEXT UNIQUE NOT NULL,
+        user_id INTEGER NOT NULL,
+        movie_id INTEGER NOT NULL,
+        show_id INTEGER,
+        seats TEXT NOT NULL,
+        showtime TEXT NOT NULL,
+        booking_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users (id),
+        FOREIGN KEY (movie_id) REFERENCES movies (id),
+        FOREIGN KEY (show_id) REFERENCES shows (id)
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS booked_seats (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        show_id INTEGER NOT NULL,
+        seat TEXT NOT NULL,
+        booking_id TEXT NOT NULL,
+        FOREIGN KEY (show_id) REFERENCES shows (id),
+        UNIQUE(show_id, seat)
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS seat_holds (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        hold_id TEXT NOT NULL,
+        user_id INTEGER NOT NULL,
+        show_id INTEGER NOT NULL,
+        seat TEXT NOT NULL,
+        expires_at REAL NOT NULL,
+        FOREIGN KEY (user_id) REFERENCES users (id),
+        FOREIGN KEY (show_id) REFERENCES shows (id),
+        UNIQUE(show_id, seat)
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS email_outbox (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        recipient TEXT NOT NULL,
+        subject TEXT NOT NULL,
+        body TEXT NOT NULL,
+        status TEXT NOT NULL DEFAULT 'pending',
+        attempts INTEGER NOT NULL DEFAULT 0,
+        next_attempt_at REAL NOT NULL,
+        last_error TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        sent_at REAL
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS show_occupancy (
+        show_id INTEGER PRIMARY KEY,
+        booked INTEGER NOT NULL DEFAULT 0
+    )
+    ''',
+    # Counters move with booked_seats inside whatever transaction books or cancels
+    '''
+    CREATE TRIGGER IF NOT EXISTS booked_seats_occupancy_insert AFTER INSERT ON booked_seats BEGIN
+        INSERT INTO show_occupancy (show_id, booked) VALUES (NEW.show_id, 1)
+        ON CONFLICT (show_id) DO UPDATE SET booked = booked + 1;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS booked_seats_occupancy_delete AFTER DELETE ON booked_seats BEGIN
+        UPDATE show_occupancy SET booked = booked - 1 WHERE show_id = OLD.show_id;
+    END
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS idempotency_keys (
+        user_id INTEGER NOT NULL,
+        idempotency_key TEXT NOT NULL,
+        request_hash TEXT NOT NULL,
+        booking_id TEXT NOT NULL,
+        created_at REAL NOT NULL,
+        PRIMARY KEY (user_id, idempotency_key)
+    ) WITHOUT ROWID
+    ''',
+    'CREATE INDEX IF NOT EXISTS idx_idempotency_keys_created ON idempotency_keys (created_at)',
+    'CREATE INDEX IF NOT EXISTS idx_seat_holds_expires ON seat_holds (expires_at)',
+    'CREATE INDEX IF NOT EXISTS idx_seat_holds_hold ON seat_holds (hold_id)',
+    'CREATE INDEX IF NOT EXISTS idx_email_outbox_due ON email_outbox (status, next_attempt_at)',
+    'CREATE INDEX IF NOT EXISTS idx_bookings_show ON bookings (show_id)',
+    'CREATE INDEX IF NOT EXISTS idx_booked_seats_booking ON booked_seats (booking_id)',
+    'CREATE INDEX IF NOT EXISTS idx_bookings_user_recent ON bookings (user_id, booking_date, booking_id)',
+]
+
+def create_booking_tables(conn):
+    """Create the tables that hold bookings, seats, holds, occupancy counters and outbound email"""
+    for statement in BOOKING_SCHEMA:
+        conn.execute(statement)
+
+def get_occupancy(conn, show_ids=None):
+    """Return {show_id: booked seat count} from the counters, for the given shows or all of them"""
+    if show_ids is None:
+        rows = conn.execute('SELECT show_id, booked FROM show_occupancy').fetchall()
+    else:
+        show_ids = list(show_ids)
+        if not show_ids:
+            return {}
+        rows = conn.execute(
+            f"SELECT show_id, booked FROM show_occupancy WHERE show_id IN ({','.join('?' * len(show_ids))})",
+            show_ids
+        ).fetchall()
+    return {row['show_id']: row['booked'] for row in rows}
+
+def find_occupancy_drift(conn):
+    """Return {show_id: (counted, actual)} for every show whose counter disagrees with booked_seats"""
+    actual = {
+        row['show_id']: row['booked']
+        for row in conn.execute('SELECT show_id, COUNT(*) AS booked FROM booked_seats GROUP BY show_id')
+    }
+    counted = get_occupancy(conn)
+    return {
+        show_id: (counted.get(show_id, 0), actual.get(show_id, 0))
+        for show_id in actual.keys() | counted.keys()
+        if counted.get(show_id, 0) != actual.get(show_id, 0)
+    }
+
+def rebuild_occupancy(conn):
+    """Recount every show from booked_seats inside the caller's transaction; returns the drift it fixed"""
+    drift = find_occupancy_drift(conn)
+    conn.execute('DELETE FROM show_occupancy')
+    conn.execute('INSERT INTO show_occupancy (show_id, booked) SELECT show_id, COUNT(*) FROM booked_seats GROUP BY show_id')
+    return drift
+
+class SeatUnavailable(Exception):
+    """Raised when requested seats are already booked or held by someone else"""
+
+    def __init__(self, seats):
+        super().__init__(f"Seats unavailable: {', '.join(seats)}")
+        self.seats = seats
+
+def begin_immediate(conn):
+    """Start a transaction that takes the write lock up front"""
+    conn.execute('BEGIN IMMEDIATE')
+
+def sweep_expired_holds(conn, now=None):
+    """Delete every expired hold in one statement and return how many were removed"""
+    cursor = conn.execute('DELETE FROM seat_holds WHERE expires_at <= ?', (now or time.time(),))
+    return cursor.rowcount
+
+def find_conflicts(conn, show_id, seat_list, user_id, now):
+    """Return requested seats that are booked, or held by a different user"""
+    placeholders = ','.join('?' * len(seat_list))
+    rows = conn.execute(f'''
+        SELECT seat FROM booked_seats
+        WHERE show_id = ? AND seat IN ({placeholders})
+        UNION
+        SELECT seat FROM seat_holds
+        WHERE show_id = ? AND seat IN ({placeholders})
+          AND expires_at > ? AND user_id != ?
+    ''', [show_id, *seat_list, show_id, *seat_list, now, user_id]).fetchall()
+    return sorted(row['seat'] for row in rows)
+
+def get_active_holds(conn, show_id, now=None):
+    """Return seats with an unexpired hold for a show"""
+    rows = conn.execute(
+        'SELECT seat FROM seat_holds WHERE show_id = ? AND expires_at > ?',
+        (show_id, now or time.time())
+    ).fetchall()
+    return [row['seat'] for row in rows]
+
+def hold_seats(conn, user_id, show_id, seat_list, ttl, hold_id=None):
+    """
+    Reserve seats for ttl seconds, replacing the user's earlier hold on the show.
+    Commits and returns (hold, seats the earlier hold had that this one does not).
+    """
+    now = time.time()
+    hold_id = hold_id or f"HD{uuid.uuid4().hex[:8].upper()}"
+    expires_at = now + ttl
+
+    begin_immediate(conn)
+    try:
+        sweep_expired_holds(conn, now)
+        conflicts = find_conflicts(conn, show_id, seat_list, user_id, now)
+        if conflicts:
+            raise SeatUnavailable(conflicts)
+
+        # One hold per user and show, so holds cannot be stacked to keep a whole hall
+        previous = conn.execute(
+            'SELECT seat FROM seat_holds WHERE user_id = ? AND show_id = ?', (user_id, show_id)
+        ).fetchall()
+        conn.execute('DELETE FROM seat_holds WHERE user_id = ? AND show_id = ?', (user_id, show_id))
+        conn.executemany(
+            'INSERT INTO seat_holds (hold_id, user_id, show_id, seat, expires_at) VALUES (?, ?, ?, ?, ?)',
+            [(hold_id, user_id, show_id, seat, expires_at) for seat in seat_list]
+        )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    hold = {'hold_id': hold_id, 'show_id': show_id, 'seats': seat_list, 'expires_at': expires_at}
+    return hold, sorted({row['seat'] for row in previous} - set(seat_list))
+
+def release_hold(conn, hold_id, user_id):
+    """Release a hold owned by user_id; commits and returns the (show_id, seats) freed"""
+    rows = conn.execute(
+        'SELECT show_id, seat FROM seat_holds WHERE hold_id = ? AND user_id = ?',
+        (hold_id, user_id)
+    ).fetchall()
+    conn.execute('DELETE FROM seat_holds WHERE hold_id = ? AND user_id = ?', (hold_id, user_id))
+    conn.commit()
+
+    if not rows:
+        return None
+    return rows[0]['show_id'], [row['seat'] for row in rows]
+
+def find_idempotent_booking(conn, user_id, key, ttl, now=None):
+    """Return (booking_id, request_hash) stored for an unexpired idempotency key, or None"""
+    row = conn.execute(
+        'SELECT booking_id, request_hash FROM idempotency_keys WHERE user_id = ? AND idempotency_key = ? AND created_at > ?',
+        (user_id, key, (now or time.time()) - ttl)
+    ).fetchone()
+    return (row['booking_id'], row['request_hash']) if row else None
+
+def record_idempotency_key(conn, user_id, key, request_hash, booking_id, ttl, now=None):
+    """
+    Remember which booking a key produced, inside the booking's transaction.
+    Expired keys are swept first; raises sqlite3.IntegrityError if another
+    request already committed a booking under the same live key.
+    """
+    now = now or time.time()
+    conn.execute('DELETE FROM idempotency_keys WHERE created_at <= ?', (now - ttl,))
+    conn.execute(
+        'INSERT INTO idempotency_keys (user_id, idempotency_key, request_hash, booking_id, created_at) VALUES (?, ?, ?, ?, ?)',
+        (user_id, key, request_hash, booking_id, now)
+    )
+
+def get_taken_seats(conn, show_id, user_id, now):
+    """Return seats that are booked, or held by someone other than user_id"""
+    rows = conn.execute('''
+        SELECT seat FROM booked_seats WHERE show_id = ?
+        UNION
+        SELECT seat FROM seat_holds WHERE show_id = ? AND expires_at > ? AND user_id != ?
+    ''', (show_id, show_id, now, user_id)).fetchall()
+    return [row['seat'] for row in rows]
+
+def insert_booking(conn, booking_id, user_id, show, seat_list, seats_text, now):
+    """Write the booking rows inside an open transaction; returns held seats that were not booked"""
+    held = conn.execute(
+        'SELECT seat FROM seat_holds WHERE user_id = ? AND show_id = ? AND expires_at > ?',
+        (user_id, show['id'], now)
+    ).fetchall()
+    conn.execute('DELETE FROM seat_holds WHERE user_id = ? AND show_id = ?', (user_id, show['id']))
+
+    conn.execute(
+        'INSERT INTO bookings (booking_id, user_id, movie_id, show_id, seats, showtime) VALUES (?, ?, ?, ?, ?, ?)',
+        (booking_id, user_id, show['movie_id'], show['id'], seats_text, show_label(show))
+    )
+    conn.executemany(
+        'INSERT INTO booked_seats (show_id, seat, booking_id) VALUES (?, ?, ?)',
+        [(show['id'], seat, booking_id) for seat in seat_list]
+    )
+    return [row['seat'] for row in held if row['seat'] not in seat_list]
+
+def claim_seats(conn, booking_id, user_id, show, seat_list, seats_text):
+    """
+    Book seats in a single BEGIN IMMEDIATE transaction.
+    The transaction is left open so the caller can add related rows before committing;
+    on conflict it is rolled back and SeatUnavailable is raised.
+    Returns seats the user had held for this show but did not book.
+    """
+    now = time.time()
+    begin_immediate(conn)
+    try:
+        conflicts = find_conflicts(conn, show['id'], seat_list, user_id, now)
+        if conflicts:
+            raise SeatUnavailable(conflicts)
+        return insert_booking(conn, booking_id, user_id, show, seat_list, seats_text, now)
+    except Exception:
+        conn.rollback()
+        raise
+
+def claim_best_seats(conn, booking_id, user_id, show, allocator, party_size):
+    """
+    Book the best block of party_size adjacent seats, chosen under the write lock
+    so the block cannot be taken between picking and booking.
+    Like claim_seats the transaction is left open; raises SeatUnavailable with an
+    empty seat list when no block that size is free.
+    Returns (seats booked, held seats that were not booked).
+    """
+    now = time.time()
+    begin_immediate(conn)
+    try:
+        taken = allocator.to_bitmap(get_taken_seats(conn, show['id'], user_id, now))
+        seat_list = allocator.best_block(taken, party_size)
+        if not seat_list:
+            raise SeatUnavailable([])
+        released = insert_booking(conn, booking_id, user_id, show, seat_list, ','.join(seat_list), now)
+    except Exception:
+        conn.rollback()
+        raise
+
+    return seat_list, released
+
+def claim_batch(conn, user_id, items, atomic=True):
+    """
+    Book several (booking_id, show, seat_list) items in one BEGIN IMMEDIATE transaction.
+    Every item is checked, each in its own savepoint; items whose seats conflict are
+    skipped. With atomic=True any conflict rolls the whole batch back.
+    Otherwise the transaction is left open for the caller to commit.
+    Returns (conflicts, released): conflicts[i] lists the unavailable seats of item i
+    (empty when it was booked) and released maps show_id to held seats left unbooked.
+    """
+    now = time.time()
+    conflicts = []
+    released = {}
+    booked = {}
+    begin_immediate(conn)
+    try:
+        for booking_id, show, seat_list in items:
+            taken = find_conflicts(conn, show['id'], seat_list, user_id, now)
+            if taken:
+                conflicts.append(taken)
+                continue
+
+            conn.execute('SAVEPOINT batch_item')
+            try:
+                left = insert_booking(conn, booking_id, user_id, show, seat_list, ','.join(seat_list), now)
+            except sqlite3.IntegrityError:
+                conn.execute('ROLLBACK TO batch_item')
+                conn.execute('RELEASE batch_item')
+                conflicts.append(list(seat_list))
+                continue
+            conn.execute('RELEASE batch_item')
+
+            conflicts.append([])
+            released.setdefault(show['id'], set()).update(left)
+            booked.setdefault(show['id'], set()).update(seat_list)
+
+        if atomic and any(conflicts):
+            conn.rollback()
+            return conflicts, {}
+    except Exception:
+        conn.rollback()
+        raise
+
+    return conflicts, {
+        show_id: sorted(seats - booked.get(show_id, set()))
+        for show_id, seats in released.items() if seats - booked.get(show_id, set())
+    }
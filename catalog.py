@@ -0,0 +1,84 @@
+"""
+Movie Catalog Cache for Movie Reservation System
+Holds the sorted movie list and its encoded JSON until the catalog version changes
+"""
+
+import gzip
+import hashlib
+import threading
+from collections import namedtuple
+from datetime import datetime, timezone
+
+CatalogSnapshot = namedtuple('CatalogSnapshot', 'version movies keys body gzip_body etag last_modified')
+
+CATALOG_TRIGGERS = [
+    '''
+    CREATE TRIGGER IF NOT EXISTS movies_version_insert AFTER INSERT ON movies BEGIN
+        UPDATE catalog_meta SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE id = 1;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS movies_version_update AFTER UPDATE ON movies BEGIN
+        UPDATE catalog_meta SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE id = 1;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS movies_version_delete AFTER DELETE ON movies BEGIN
+        UPDATE catalog_meta SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE id = 1;
+    END
+    ''',
+]
+
+def create_catalog_version(conn):
+    """Create the catalog version counter and the triggers that bump it on every movie write"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS catalog_meta (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.execute('INSERT OR IGNORE INTO catalog_meta (id, version) VALUES (1, 0)')
+    for trigger in CATALOG_TRIGGERS:
+        conn.execute(trigger)
+
+def get_catalog_version(conn):
+    """Return (version, updated_at) of the movie catalog"""
+    row = conn.execute('SELECT version, updated_at FROM catalog_meta WHERE id = 1').fetchone()
+    return row['version'], row['updated_at']
+
+class CatalogCache:
+    """In-process copy of the movie catalog, rebuilt only when catalog_meta.version moves"""
+
+    def __init__(self, dumps):
+        self.dumps = dumps
+        self._snapshot = None
+        self._lock = threading.Lock()
+
+    def get(self, conn):
+        """Return the current snapshot, reloading it if the catalog changed"""
+        version, updated_at = get_catalog_version(conn)
+        snapshot = self._snapshot
+        if snapshot and snapshot.version == version:
+            return snapshot
+
+        with self._lock:
+            if self._snapshot and self._snapshot.version == version:
+                return self._snapshot
+
+            movies = [dict(row) for row in conn.execute('SELECT * FROM movies ORDER BY title, id').fetchall()]
+            body = self.dumps(movies).encode('utf-8')
+            self._snapshot = CatalogSnapshot(
+                version=version,
+                movies=movies,
+                keys=[(movie['title'], movie['id']) for movie in movies],
+                body=body,
+                gzip_body=gzip.compress(body, compresslevel=6),
+                etag=hashlib.sha1(body).hexdigest()[:16],
+                last_modified=datetime.strptime(updated_at, '%Y-%m-%d %H:%M:%S').replace(tzinfo=timezone.utc)
+            )
+            return self._snapshot
+
+    def invalidate(self):
+        """Forget the cached snapshot"""
+        self._snapshot = None
@@ -0,0 +1,29 @@
+"""
+Response Compression for Movie Reservation System
+gzip and, when the optional brotli package is installed, brotli encoders
+"""
+
+import gzip
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Preferred first; brotli is only offered when it can be produced
+ENCODINGS = ('br', 'gzip') if brotli else ('gzip',)
+
+def encode(data, encoding, level=None):
+    """Compress bytes with one of ENCODINGS; level None means the encoder's build-time maximum"""
+    if encoding == 'br':
+        return brotli.compress(data, quality=11 if level is None else level)
+    if encoding == 'gzip':
+        return gzip.compress(data, compresslevel=9 if level is None else level, mtime=0)
+    raise ValueError(f"Unsupported encoding '{encoding}'")
+
+def negotiate(accept_encodings, offered=ENCODINGS):
+    """Pick the first offered encoding the client accepts, or None"""
+    for encoding in offered:
+        if accept_encodings[encoding]:
+            return encoding
+    return None
@@ -0,0 +1,313 @@
+"""
+Database Connection Pool for Movie Reservation System
+Reuses tuned SQLite connections instead of opening a new one on every request
+"""
+
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+from offload import NativeThreads, native_lock
+
+PRAGMAS = [
+    ('journal_mode', 'WAL'),
+    ('synchronous', 'NORMAL'),
+    ('cache_size', -16000),
+    ('mmap_size', 268435456),
+    ('busy_timeout', 5000),
+    ('temp_store', 'MEMORY'),
+]
+# Under gevent every SQLite call runs on one of these OS threads; a statement waiting out busy_timeout holds one
+SQLITE_THREADS = int(os.getenv('SQLITE_THREADS', 16))
+# Rows a cursor fetches per trip to a SQLite thread while it is iterated
+ITER_BATCH = 256
+# Every pooled connection keeps several file descriptors open (database, WAL, shared memory and any attached
+# files); past this many databases the least recently used pool is closed
+SQLITE_MAX_POOLS = int(os.getenv('SQLITE_MAX_POOLS', 32))
+
+sqlite_threads = NativeThreads('sqlite', SQLITE_THREADS)
+
+def _timed(fn, *args):
+    """Return (fn(*args), seconds it took), measured on the thread that ran it"""
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+class TimedCursor:
+    """Cursor wrapper that fetches on the SQLite threads and reports a statement's execute-plus-fetch time
+    and row count once
+
+    The report goes out on the first fetchone()/fetchall(), or when iteration or
+    fetchmany() runs out of rows.
+    """
+
+    def __init__(self, cursor, observer, conn, sql, params, elapsed):
+        self._cursor = cursor
+        self._observer = observer
+        self._conn = conn
+        self._sql = sql
+        self._params = params
+        self._elapsed = elapsed
+        self._rows = 0
+        self._reported = False
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        while True:
+            rows = self._fetch('fetchmany', ITER_BATCH)
+            self._rows += len(rows)
+            yield from rows
+            if len(rows) < ITER_BATCH:
+                self.report()
+                return
+
+    def _fetch(self, method, *args):
+        result, elapsed = sqlite_threads.call(_timed, getattr(self._cursor, method), *args)
+        self._elapsed += elapsed
+        return result
+
+    def fetchone(self):
+        row = self._fetch('fetchone')
+        if row is not None:
+            self._rows += 1
+        self.report()
+        return row
+
+    def fetchmany(self, size=None):
+        size = self._cursor.arraysize if size is None else size
+        rows = self._fetch('fetchmany', size)
+        self._rows += len(rows)
+        if len(rows) < size:
+            self.report()
+        return rows
+
+    def fetchall(self):
+        rows = self._fetch('fetchall')
+        self._rows += len(rows)
+        self.report()
+        return rows
+
+    def report(self):
+        """Hand the accumulated timing to the observer; later calls are no-ops"""
+        if not self._reported:
+            self._reported = True
+            if self._observer is not None:
+                self._observer(self._conn, self._sql, self._params, self._elapsed, self._rows)
+
+    def close(self):
+        self.report()
+        self._cursor.close()
+
+class PooledConnection:
+    """Wrapper around sqlite3.Connection whose close() returns it to the pool and whose statements,
+    commits and rollbacks run on the SQLite threads"""
+
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+
+    def __getattr__(self, name):
+        if self._conn is None:
+            raise sqlite3.ProgrammingError('Cannot operate on a closed database.')
+        return getattr(self._conn, name)
+
+    def execute(self, sql, params=()):
+        """Run one statement, timing it when the pool has a statement observer"""
+        cursor, elapsed = sqlite_threads.call(_timed, self.__getattr__('execute'), sql, params)
+        observer = self._pool.observer
+        if cursor.description is not None:
+            return TimedCursor(cursor, observer, self._conn, sql, params, elapsed)
+        if observer is not None:
+            observer(self._conn, sql, params, elapsed, max(cursor.rowcount, 0))
+        return cursor
+
+    def executemany(self, sql, seq_of_params):
+        """Run one statement per parameter set, timing the batch as a whole"""
+        cursor, elapsed = sqlite_threads.call(_timed, self.__getattr__('executemany'), sql, seq_of_params)
+        observer = self._pool.observer
+        if observer is not None:
+            observer(self._conn, sql, None, elapsed, max(cursor.rowcount, 0))
+        return cursor
+
+    def executescript(self, script):
+        return sqlite_threads.call(self.__getattr__('executescript'), script)
+
+    def commit(self):
+        sqlite_threads.call(self.__getattr__('commit'))
+
+    def rollback(self):
+        sqlite_threads.call(self.__getattr__('rollback'))
+
+    def __enter__(self):
+        self._conn.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return sqlite_threads.call(self._conn.__exit__, exc_type, exc, tb)
+
+    def close(self):
+        """Release the connection back to the pool"""
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            self._pool.release(conn)
+
+class ConnectionPool:
+    """Bounded LIFO pool of SQLite connections shared by the worker's threads
+
+    Setting observer to a callable(conn, sql, params, seconds, rows) times every
+    statement run through execute()/executemany() on the pooled connections.
+    attach maps schema aliases to database files attached read-only to every
+    connection, so their tables can be read and joined without taking their write lock.
+    SQLite connections must not be used across fork(), so a pool first used in a
+    forked worker drops whatever it inherited and opens its own. Once closed, a pool
+    closes connections as they come back instead of keeping them.
+    """
+
+    def __init__(self, database, max_idle=16, cached_statements=256, timeout=5.0, attach=None):
+        self.database = database
+        self.attach = attach or {}
+        self.max_idle = max_idle
+        self.cached_statements = cached_statements
+        self.timeout = timeout
+        self.observer = None
+        self._idle = []
+        self._closed = False
+        self._lock = native_lock()
+        self._pid = os.getpid()
+        self._stats = {'created': 0, 'reused': 0, 'released': 0, 'discarded': 0, 'in_use': 0, 'peak_in_use': 0}
+
+    def _open(self):
+        conn = sqlite3.connect(
+            self.database,
+            timeout=self.timeout,
+            check_same_thread=False,
+            cached_statements=self.cached_statements
+        )
+        for name, value in PRAGMAS:
+            conn.execute(f'PRAGMA {name} = {value}')
+        for alias, path in self.attach.items():
+            conn.execute('ATTACH DATABASE ? AS ' + alias, (Path(path).resolve().as_uri() + '?mode=ro',))
+        return conn
+
+    def connect(self):
+        """Check a connection out of the pool, opening a new one if none are idle"""
+        with self._lock:
+            if self._pid != os.getpid():
+                # Closing the parent's handles here could disturb its locks; leave them to the parent
+                self._pid = os.getpid()
+                self._idle = []
+                self._stats = dict.fromkeys(self._stats, 0)
+            conn = self._idle.pop() if self._idle else None
+            self._stats['reused' if conn else 'created'] += 1
+            self._stats['in_use'] += 1
+            self._stats['peak_in_use'] = max(self._stats['peak_in_use'], self._stats['in_use'])
+
+        if conn is None:
+            try:
+                conn = sqlite_threads.call(self._open)
+            except Exception:
+                with self._lock:
+                    self._stats['in_use'] -= 1
+                raise
+
+        conn.row_factory = sqlite3.Row
+        return PooledConnection(self, conn)
+
+    def release(self, conn):
+        """Return a connection, rolling back anything left uncommitted"""
+        try:
+            if conn.in_transaction:
+                sqlite_threads.call(conn.rollback)
+        except sqlite3.Error:
+            sqlite_threads.call(conn.close)
+            conn = None
+
+        with self._lock:
+            self._stats['in_use'] -= 1
+            if conn is not None and len(self._idle) < self.max_idle and self._pid == os.getpid() and not self._closed:
+                self._idle.append(conn)
+                self._stats['released'] += 1
+                return
+            self._stats['discarded'] += 1
+
+        if conn is not None:
+            sqlite_threads.call(conn.close)
+
+    def close_all(self):
+        """Close every idle connection"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            sqlite_threads.call(conn.close)
+
+    def close(self):
+        """Close the idle connections and the ones still checked out as soon as they are released"""
+        with self._lock:
+            self._closed = True
+        self.close_all()
+
+    def stats(self):
+        """Snapshot of pool usage counters"""
+        with self._lock:
+            return dict(self._stats, idle=len(self._idle), max_idle=self.max_idle)
+
+_pools = OrderedDict()
+_pools_lock = native_lock()
+_observer = None
+
+def get_pool(database, attach=None, max_idle=16):
+    """
+    Return the shared pool for a database file, creating it on first use. At most
+    SQLITE_MAX_POOLS pools stay open; the least recently used one is closed to make room.
+    """
+    evicted = None
+    with _pools_lock:
+        pool = _pools.get(database)
+        if pool is None:
+            pool = _pools[database] = ConnectionPool(database, max_idle=max_idle, attach=attach)
+            pool.observer = _observer
+            if len(_pools) > SQLITE_MAX_POOLS:
+                _, evicted = _pools.popitem(last=False)
+        else:
+            _pools.move_to_end(database)
+    if evicted is not None:
+        evicted.close()
+    return pool
+
+def close_pools():
+    """Close the idle connections of every pool, e.g. before forking worker processes"""
+    with _pools_lock:
+        pools = list(_pools.values())
+    for pool in pools:
+        pool.close_all()
+
+def set_statement_observer(observer):
+    """Install a statement observer on every pool, including ones created later"""
+    global _observer
+    with _pools_lock:
+        _observer = observer
+        for pool in _pools.values():
+            pool.observer = observer
+
+def connect_readonly(database, attach=None, timeout=5.0):
+    """
+    Open an unpooled read-only connection for long scans such as exports.
+    It can never take the write lock, and large sorts spill to temporary
+    files instead of memory. The caller closes it.
+    """
+    return sqlite_threads.call(_open_readonly, database, attach, timeout)
+
+def _open_readonly(database, attach, timeout):
+    conn = sqlite3.connect(Path(database).resolve().as_uri() + '?mode=ro', uri=True, timeout=timeout,
+                           check_same_thread=False)
+    conn.execute('PRAGMA query_only = ON')
+    conn.execute('PRAGMA temp_store = FILE')
+    conn.execute(f'PRAGMA busy_timeout = {int(timeout * 1000)}')
+    for alias, path in (attach or {}).items():
+        conn.execute('ATTACH DATABASE ? AS ' + alias, (Path(path).resolve().as_uri() + '?mode=ro',))
+    conn.row_factory = sqlite3.Row
+    return conn
@@ -0,0 +1,66 @@
+"""
+Seat Event Broker for Movie Reservation System
+In-process publish/subscribe fan-out of seat changes to server-sent event streams
+"""
+
+import json
+import queue
+import threading
+
+class Subscription:
+    """One listener's bounded queue of events for a single show"""
+
+    def __init__(self, show_id, maxsize):
+        self.show_id = show_id
+        self.events = queue.Queue(maxsize)
+        self.overflowed = False
+
+class SeatEventBroker:
+    """Fans seat deltas out to every subscriber of a show"""
+
+    def __init__(self, max_queue=100):
+        self.max_queue = max_queue
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, show_id):
+        """Register a new listener for a show"""
+        subscription = Subscription(show_id, self.max_queue)
+        with self._lock:
+            self._subscribers.setdefault(show_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """Remove a listener"""
+        with self._lock:
+            listeners = self._subscribers.get(subscription.show_id)
+            if listeners:
+                listeners.discard(subscription)
+                if not listeners:
+                    del self._subscribers[subscription.show_id]
+
+    def publish(self, show_id, event, seats):
+        """Send an event to every listener of a show; slow listeners are flagged for a resync"""
+        if not seats:
+            return
+        with self._lock:
+            listeners = list(self._subscribers.get(show_id, ()))
+        for subscription in listeners:
+            try:
+                subscription.events.put_nowait((event, list(seats)))
+            except queue.Full:
+                subscription.overflowed = True
+
+    def subscriber_count(self):
+        """Total number of open listeners"""
+        with self._lock:
+            return sum(len(listeners) for listeners in self._subscribers.values())
+
+def format_sse(event, data, event_id=None):
+    """Encode one server-sent event"""
+    lines = []
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    lines.append(f'event: {event}')
+    lines.append(f'data: {json.dumps(data)}')
+    return '\n'.join(lines) + '\n\n'
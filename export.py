@@ -0,0 +1,205 @@
+"""
+Bulk Export for Movie Reservation System
+Streams bookings and per-show seat manifests as CSV or NDJSON in constant memory
+
+    python export.py bookings --booked-on 2026-10-18 > bookings.csv
+    python export.py seats --show-id 42 --format ndjson -o manifest.ndjson
+"""
+
+import argparse
+import csv
+import io
+import itertools
+import json
+import os
+import sys
+from datetime import date, timedelta
+
+from dotenv import load_dotenv
+
+from archive import HISTORY_DATABASE, HistoryArchive
+from storage import create_storage
+
+load_dotenv()
+
+DATABASE = 'database.db'
+EXPORT_CHUNK_SIZE = 1000
+FORMATS = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+
+EXPORTS = {
+    'bookings': (
+        ('booking_id', 'booking_date', 'show_id', 'show_date', 'start_time', 'hall', 'movie_id', 'title',
+         'user_id', 'first_name', 'last_name', 'email', 'seats'),
+        '''
+        SELECT b.booking_id, b.booking_date, b.show_id, s.show_date, s.start_time, s.hall, b.movie_id, m.title,
+               b.user_id, u.first_name, u.last_name, u.email, b.seats
+        FROM bookings b
+        JOIN shows s ON s.id = b.show_id
+        JOIN movies m ON m.id = b.movie_id
+        JOIN users u ON u.id = b.user_id
+        ''',
+        'b.booking_date, b.booking_id',
+    ),
+    'seats': (
+        ('show_id', 'show_date', 'start_time', 'hall', 'title', 'seat', 'booking_id', 'first_name', 'last_name',
+         'email'),
+        '''
+        SELECT bs.show_id, s.show_date, s.start_time, s.hall, m.title, bs.seat, bs.booking_id,
+               u.first_name, u.last_name, u.email
+        FROM booked_seats bs
+        JOIN bookings b ON b.booking_id = bs.booking_id
+        JOIN shows s ON s.id = bs.show_id
+        JOIN movies m ON m.id = s.movie_id
+        JOIN users u ON u.id = b.user_id
+        ''',
+        # Seat rows in order, then numbers numerically so A2 comes before A10
+        'bs.show_id, substr(bs.seat, 1, 1), CAST(substr(bs.seat, 2) AS INTEGER)',
+    ),
+}
+
+def build_query(kind, show_id=None, movie_id=None, date_from=None, date_to=None, booked_on=None):
+    """Return (columns, sql, params) for an export; dates are ISO strings and every filter is optional"""
+    columns, select, order = EXPORTS[kind]
+    clauses = []
+    params = []
+    if show_id is not None:
+        clauses.append('s.id = ?')
+        params.append(show_id)
+    if movie_id is not None:
+        clauses.append('s.movie_id = ?')
+        params.append(movie_id)
+    if date_from:
+        clauses.append('s.show_date >= ?')
+        params.append(date_from)
+    if date_to:
+        clauses.append('s.show_date <= ?')
+        params.append(date_to)
+    if booked_on:
+        clauses.append('b.booking_date >= ? AND b.booking_date < ?')
+        params += [booked_on, (date.fromisoformat(booked_on) + timedelta(days=1)).isoformat()]
+
+    where = f" WHERE {' AND '.join(clauses)}" if clauses else ''
+    return columns, f'{select}{where} ORDER BY {order}', params
+
+def iter_rows(storage, sql, params, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield result tuples from every booking database, holding at most chunk_size rows at a time"""
+    for database in storage.shard_databases():
+        conn = storage.connect_readonly(database)
+        try:
+            cursor = conn.execute(sql, params)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield tuple(row)
+        finally:
+            conn.close()
+
+def seat_order(seat):
+    """Sort key putting A2 before A10, matching the seats export's SQL ordering"""
+    return seat[0], int(seat[1:])
+
+def iter_archived_rows(storage, history, kind, **filters):
+    """
+    Yield result tuples for bookings the archive moved into the history database, in the same
+    columns as the live rows. Show halls, titles and users come from the catalog database.
+    """
+    for batch in history.export_shows(**filters):
+        bookings = [booking for _, show_bookings in batch for booking in show_bookings]
+        if not bookings:
+            continue
+        show_ids = sorted({show['show_id'] for show, _ in batch})
+        user_ids = sorted({booking['user_id'] for booking in bookings})
+        conn = storage.connect_readonly(storage.database)
+        try:
+            shows = {row['id']: row for row in conn.execute(f'''
+                SELECT s.id, s.hall, m.title FROM shows s JOIN movies m ON m.id = s.movie_id
+                WHERE s.id IN ({','.join('?' * len(show_ids))})
+            ''', show_ids)}
+            users = {row['id']: row for row in conn.execute(
+                f"SELECT id, first_name, last_name, email FROM users WHERE id IN ({','.join('?' * len(user_ids))})",
+                user_ids
+            )}
+        finally:
+            conn.close()
+
+        for archived, show_bookings in batch:
+            show = shows.get(archived['show_id'])
+            if show is None:
+                continue
+            if kind == 'bookings':
+                for b in show_bookings:
+                    user = users.get(b['user_id'])
+                    if user is not None:
+                        yield (b['booking_id'], b['booking_date'], b['show_id'], archived['show_date'],
+                               archived['start_time'], show['hall'], b['movie_id'], show['title'], b['user_id'],
+                               user['first_name'], user['last_name'], user['email'], b['seats'])
+            else:
+                seats = sorted(
+                    ((seat, b) for b in show_bookings if b['user_id'] in users for seat in b['seats'].split(',')),
+                    key=lambda item: seat_order(item[0])
+                )
+                for seat, b in seats:
+                    user = users[b['user_id']]
+                    yield (archived['show_id'], archived['show_date'], archived['start_time'], show['hall'],
+                           show['title'], seat, b['booking_id'], user['first_name'], user['last_name'], user['email'])
+
+def to_csv(columns, rows, chunk_size=EXPORT_CHUNK_SIZE):
+    """Encode rows as CSV text, one string per chunk of rows"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for count, row in enumerate(rows, 1):
+        writer.writerow(row)
+        if count % chunk_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+def to_ndjson(columns, rows, chunk_size=EXPORT_CHUNK_SIZE):
+    """Encode rows as one JSON object per line, one string per chunk of rows"""
+    lines = []
+    for row in rows:
+        lines.append(json.dumps(dict(zip(columns, row)), separators=(',', ':')))
+        if len(lines) == chunk_size:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+def export(storage, kind, fmt='csv', history=None, **filters):
+    """Generator of text chunks for a whole export: live bookings, then any archived to history's database"""
+    columns, sql, params = build_query(kind, **filters)
+    rows = iter_rows(storage, sql, params)
+    if history is not None:
+        rows = itertools.chain(rows, iter_archived_rows(storage, history, kind, **filters))
+    encode = to_csv if fmt == 'csv' else to_ndjson
+    return encode(columns, rows)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Export bookings or seat manifests without locking the database')
+    parser.add_argument('kind', choices=sorted(EXPORTS), help='bookings, or one row per booked seat')
+    parser.add_argument('--format', choices=sorted(FORMATS), default='csv')
+    parser.add_argument('--show-id', type=int)
+    parser.add_argument('--movie-id', type=int)
+    parser.add_argument('--from', dest='date_from', type=date.fromisoformat, help='first show date (YYYY-MM-DD)')
+    parser.add_argument('--to', dest='date_to', type=date.fromisoformat, help='last show date (YYYY-MM-DD)')
+    parser.add_argument('--booked-on', type=date.fromisoformat, help='only bookings made on this day (YYYY-MM-DD)')
+    parser.add_argument('-o', '--output', help='file to write (defaults to stdout)')
+    args = parser.parse_args()
+
+    storage = create_storage(os.getenv('STORAGE_BACKEND', 'single'), DATABASE, os.getenv('SHARD_DIR', 'shards'))
+    chunks = export(
+        storage, args.kind, args.format, history=HistoryArchive(HISTORY_DATABASE), show_id=args.show_id, movie_id=args.movie_id,
+        date_from=args.date_from and args.date_from.isoformat(), date_to=args.date_to and args.date_to.isoformat(),
+        booked_on=args.booked_on and args.booked_on.isoformat()
+    )
+    out = open(args.output, 'w', newline='', encoding='utf-8') if args.output else sys.stdout
+    try:
+        for chunk in chunks:
+            out.write(chunk)
+    finally:
+        if args.output:
+            out.close()
@@ -0,0 +1,66 @@
+"""
+Rendered Fragment Cache for Movie Reservation System
+Keeps rendered HTML fragments in a memory-bounded LRU keyed by (show, occupancy)
+"""
+
+import sys
+import threading
+from collections import OrderedDict
+
+class FragmentCache:
+    """LRU of rendered fragments; keys are (group, version) tuples so a whole group can be dropped at once"""
+
+    def __init__(self, max_bytes=4 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._groups = {}
+        self._bytes = 0
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0}
+        self._lock = threading.Lock()
+
+    def get(self, key, render):
+        """Return the fragment for key, calling render() and storing the result on a miss"""
+        with self._lock:
+            fragment = self._entries.get(key)
+            if fragment is not None:
+                self._entries.move_to_end(key)
+                self._stats['hits'] += 1
+                return fragment
+            self._stats['misses'] += 1
+
+        fragment = render()
+        size = sys.getsizeof(fragment)
+        if size > self.max_bytes:
+            return fragment
+
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = fragment
+                self._groups.setdefault(key[0], set()).add(key)
+                self._bytes += size
+                while self._bytes > self.max_bytes:
+                    self._remove(next(iter(self._entries)))
+                    self._stats['evictions'] += 1
+        return fragment
+
+    def _remove(self, key):
+        fragment = self._entries.pop(key)
+        self._bytes -= sys.getsizeof(fragment)
+        group = self._groups.get(key[0])
+        if group is not None:
+            group.discard(key)
+            if not group:
+                del self._groups[key[0]]
+
+    def invalidate(self, group=None):
+        """Drop every fragment of one group (e.g. a show), or everything when group is None"""
+        with self._lock:
+            keys = list(self._entries) if group is None else list(self._groups.get(group, ()))
+            for key in keys:
+                self._remove(key)
+            self._stats['invalidations'] += len(keys)
+
+    def stats(self):
+        """Hit/miss counters plus current size"""
+        with self._lock:
+            return dict(self._stats, entries=len(self._entries), bytes=self._bytes, max_bytes=self.max_bytes)
@@ -0,0 +1,29 @@
+"""
+Gunicorn Settings for Movie Reservation System
+Loads the application in the master before forking, so workers start warm and share its memory
+"""
+
+import os
+
+from gevent import monkey
+
+# Patch before the app is preloaded, so the locks it creates are gevent locks its greenlets can wait on
+monkey.patch_all()
+
+bind = os.getenv('BIND', '0.0.0.0:8000')
+workers = int(os.getenv('WEB_CONCURRENCY', (os.cpu_count() or 1) * 2 + 1))
+# Each connection is a greenlet, not a thread: an open seat-map stream idles at the cost of a little
+# memory, and WEB_CONNECTIONS of them per worker leave room for every other request. SQLite calls
+# run on db.sqlite_threads, real OS threads, so one waiting out a lock only suspends its own greenlet
+worker_class = 'gevent'
+worker_connections = int(os.getenv('WEB_CONNECTIONS', 1000))
+preload_app = True
+timeout = int(os.getenv('WEB_TIMEOUT', 30))
+graceful_timeout = 30
+# An empty ACCESS_LOG turns request logging off
+accesslog = os.getenv('ACCESS_LOG', '-') or None
+
+def post_worker_init(worker):
+    """Start each worker's own mail queue threads once it has loaded the preloaded app"""
+    from app import start_background_workers
+    start_background_workers(worker.wsgi)
@@ -4,21 +4,39 @@ Creates SQLite database with Users, Movies, and Bookings tables
 Also fetches initial movie data from OMDb API
 """
 
-import sqlite3
+import argparse
 import os
-import requests
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 from dotenv import load_dotenv
 
+from booking import create_booking_tables, rebuild_occupancy
+from catalog import create_catalog_version
+from db import get_pool
+from omdb import OmdbClient
+from posters import PosterCache, resizing_available
+from search import create_search_index
+from storage import create_shard_routes
+from shows import DEFAULT_CAPACITY, DEFAULT_HALL, schedule_shows, to_24h
+
 load_dotenv()
 
 DATABASE = 'database.db'
 OMDB_API_KEY = os.getenv('OMDB_API_KEY', 'demo')
+OMDB_API_URL = os.getenv('OMDB_API_URL', 'https://www.omdbapi.com/')
+OMDB_CACHE_DIR = os.getenv('OMDB_CACHE_DIR', '.omdb_cache')
+OMDB_CACHE_TTL = int(os.getenv('OMDB_CACHE_TTL', 86400))
+OMDB_WORKERS = int(os.getenv('OMDB_WORKERS', 8))
+POSTER_CACHE_DIR = os.getenv('POSTER_CACHE_DIR', 'poster_cache')
+
+SEARCH_TERMS = ['batman', 'avengers', 'spider', 'star wars', 'matrix', 'inception']
+RESULTS_PER_TERM = 3
 
 def get_db_connection():
-    """Create and return a database connection"""
-    conn = sqlite3.connect(DATABASE)
-    conn.row_factory = sqlite3.Row
-    return conn
+    """Check out a pooled database connection; close() returns it to the pool"""
+    return get_pool(DATABASE).connect()
 
 def create_tables():
     """Create all required database tables"""
@@ -51,75 +69,171 @@ def create_tables():
     ''')
     
     cursor.execute('''
-        CREATE TABLE IF NOT EXISTS bookings (
+        CREATE TABLE IF NOT EXISTS shows (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
-            booking_id TEXT UNIQUE NOT NULL,
-            user_id INTEGER NOT NULL,
             movie_id INTEGER NOT NULL,
-            seats TEXT NOT NULL,
-            showtime TEXT NOT NULL,
-            booking_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (user_id) REFERENCES users (id),
-            FOREIGN KEY (movie_id) REFERENCES movies (id)
+            show_date TEXT NOT NULL,
+            start_time TEXT NOT NULL,
+            hall TEXT NOT NULL,
+            capacity INTEGER NOT NULL,
+            FOREIGN KEY (movie_id) REFERENCES movies (id),
+            UNIQUE(movie_id, show_date, start_time, hall)
         )
     ''')
     
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS booked_seats (
+    migrate_showtimes_to_shows(conn)
+    create_booking_tables(conn)
+    # Counts bookings made before the occupancy counters existed; a no-op once they agree
+    rebuild_occupancy(conn)
+    
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_shows_movie_date ON shows (movie_id, show_date, start_time)')
+    cursor.execute('DROP INDEX IF EXISTS idx_bookings_user_date')
+    
+    create_search_index(conn)
+    create_catalog_version(conn)
+    create_shard_routes(conn)
+    
+    conn.commit()
+    conn.close()
+    print("Database tables created successfully!")
+
+def table_columns(conn, table):
+    """Return the column names of a table (empty if it does not exist)"""
+    return [row['name'] for row in conn.execute(f'PRAGMA table_info({table})').fetchall()]
+
+def migrate_showtimes_to_shows(conn):
+    """Move seat data keyed by (movie_id, showtime) text onto integer show ids"""
+    if 'movie_id' not in table_columns(conn, 'booked_seats'):
+        return
+    
+    print("Migrating bookings to the shows table...")
+    
+    if 'show_id' not in table_columns(conn, 'bookings'):
+        conn.execute('ALTER TABLE bookings ADD COLUMN show_id INTEGER REFERENCES shows (id)')
+    
+    # A legacy showtime had no date, so its seats belong to one show on the day it was first booked
+    legacy = conn.execute('''
+        SELECT movie_id, showtime, MIN(DATE(booking_date)) AS show_date
+        FROM bookings
+        WHERE show_id IS NULL
+        GROUP BY movie_id, showtime
+    ''').fetchall()
+    
+    for row in legacy:
+        conn.execute(
+            'INSERT OR IGNORE INTO shows (movie_id, show_date, start_time, hall, capacity) VALUES (?, ?, ?, ?, ?)',
+            (row['movie_id'], row['show_date'], to_24h(row['showtime']), DEFAULT_HALL, DEFAULT_CAPACITY)
+        )
+        show = conn.execute(
+            'SELECT id FROM shows WHERE movie_id = ? AND show_date = ? AND start_time = ? AND hall = ?',
+            (row['movie_id'], row['show_date'], to_24h(row['showtime']), DEFAULT_HALL)
+        ).fetchone()
+        conn.execute(
+            'UPDATE bookings SET show_id = ? WHERE movie_id = ? AND showtime = ? AND show_id IS NULL',
+            (show['id'], row['movie_id'], row['showtime'])
+        )
+    
+    conn.execute('''
+        CREATE TABLE booked_seats_new (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
-            movie_id INTEGER NOT NULL,
-            showtime TEXT NOT NULL,
+            show_id INTEGER NOT NULL,
             seat TEXT NOT NULL,
             booking_id TEXT NOT NULL,
-            FOREIGN KEY (movie_id) REFERENCES movies (id),
-            UNIQUE(movie_id, showtime, seat)
+            FOREIGN KEY (show_id) REFERENCES shows (id),
+            UNIQUE(show_id, seat)
         )
     ''')
+    conn.execute('''
+        INSERT INTO booked_seats_new (id, show_id, seat, booking_id)
+        SELECT bs.id, b.show_id, bs.seat, bs.booking_id
+        FROM booked_seats bs
+        JOIN bookings b ON bs.booking_id = b.booking_id
+    ''')
+    conn.execute('DROP TABLE booked_seats')
+    conn.execute('ALTER TABLE booked_seats_new RENAME TO booked_seats')
     
+    # Holds only live for minutes, so they are dropped rather than migrated
+    conn.execute('DROP TABLE IF EXISTS seat_holds')
     conn.commit()
-    conn.close()
-    print("Database tables created successfully!")
 
-def fetch_movies_from_omdb():
-    """Fetch movies from OMDb API and save to database"""
+def movie_row(detail_data):
+    """Map an OMDb detail response onto a movies table row"""
+    return (
+        detail_data.get('imdbID'),
+        detail_data.get('Title'),
+        detail_data.get('Poster') if detail_data.get('Poster') != 'N/A' else '/static/images/no-poster.png',
+        detail_data.get('Year'),
+        detail_data.get('Plot') if detail_data.get('Plot') != 'N/A' else 'No description available.',
+        detail_data.get('Genre') if detail_data.get('Genre') != 'N/A' else 'Unknown',
+        detail_data.get('imdbRating') if detail_data.get('imdbRating') != 'N/A' else 'N/A'
+    )
+
+def cache_posters(conn, cache=None):
+    """Download every stored movie's poster that is not cached yet, so pages never hotlink it"""
+    if not resizing_available():
+        print("WARNING: Pillow is not installed (pip install -r requirements.txt); posters are cached without "
+              "thumbnail variants and every page will serve full-size originals.", file=sys.stderr)
+    cache = cache or PosterCache(POSTER_CACHE_DIR, pool_size=OMDB_WORKERS)
+    started = time.perf_counter()
+    cache.fetch_all([row['poster_url'] for row in conn.execute('SELECT poster_url FROM movies')], workers=OMDB_WORKERS)
+    cache.close()
+    print(f"Posters: {cache.stats['downloads']} downloaded, {cache.stats['cached']} already cached, "
+          f"{cache.stats['failures']} failed in {time.perf_counter() - started:.2f}s")
+
+def fetch_movies_from_omdb(search_terms=None, refresh=False, client=None):
+    """Fetch movies from OMDb API concurrently and save new ones to the database"""
     conn = get_db_connection()
     cursor = conn.cursor()
+    started = time.perf_counter()
     
-    search_terms = ['batman', 'avengers', 'spider', 'star wars', 'matrix', 'inception']
+    search_terms = search_terms or SEARCH_TERMS
+    client = client or OmdbClient(OMDB_API_KEY, base_url=OMDB_API_URL, cache_dir=OMDB_CACHE_DIR, cache_ttl=OMDB_CACHE_TTL)
+    known_ids = set() if refresh else {row[0] for row in cursor.execute('SELECT imdb_id FROM movies WHERE imdb_id IS NOT NULL')}
     
-    for term in search_terms:
+    def search(term):
         try:
-            url = f"https://www.omdbapi.com/?apikey={OMDB_API_KEY}&s={term}&type=movie"
-            response = requests.get(url, timeout=10)
-            data = response.json()
-            
+            data = client.search(term)
             if data.get('Response') == 'True' and 'Search' in data:
-                for movie in data['Search'][:3]:
-                    detail_url = f"https://www.omdbapi.com/?apikey={OMDB_API_KEY}&i={movie['imdbID']}&plot=short"
-                    detail_response = requests.get(detail_url, timeout=10)
-                    detail_data = detail_response.json()
-                    
-                    if detail_data.get('Response') == 'True':
-                        try:
-                            cursor.execute('''
-                                INSERT OR IGNORE INTO movies (imdb_id, title, poster_url, release_year, description, genre, rating)
-                                VALUES (?, ?, ?, ?, ?, ?, ?)
-                            ''', (
-                                detail_data.get('imdbID'),
-                                detail_data.get('Title'),
-                                detail_data.get('Poster') if detail_data.get('Poster') != 'N/A' else '/static/images/no-poster.png',
-                                detail_data.get('Year'),
-                                detail_data.get('Plot') if detail_data.get('Plot') != 'N/A' else 'No description available.',
-                                detail_data.get('Genre') if detail_data.get('Genre') != 'N/A' else 'Unknown',
-                                detail_data.get('imdbRating') if detail_data.get('imdbRating') != 'N/A' else 'N/A'
-                            ))
-                            print(f"Added: {detail_data.get('Title')}")
-                        except sqlite3.IntegrityError:
-                            pass
+                return [movie['imdbID'] for movie in data['Search'][:RESULTS_PER_TERM]]
         except Exception as e:
             print(f"Error fetching movies for '{term}': {e}")
+        return []
+    
+    def details(imdb_id):
+        try:
+            detail_data = client.details(imdb_id)
+            if detail_data.get('Response') == 'True':
+                return movie_row(detail_data)
+        except Exception as e:
+            print(f"Error fetching details for '{imdb_id}': {e}")
+        return None
+    
+    with ThreadPoolExecutor(max_workers=OMDB_WORKERS) as pool:
+        found = list(dict.fromkeys(imdb_id for ids in pool.map(search, search_terms) for imdb_id in ids))
+        new_ids = [imdb_id for imdb_id in found if imdb_id not in known_ids]
+        rows = [row for row in pool.map(details, new_ids) if row]
     
+    if refresh:
+        cursor.executemany('''
+            INSERT INTO movies (imdb_id, title, poster_url, release_year, description, genre, rating)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (imdb_id) DO UPDATE SET
+                title = excluded.title, poster_url = excluded.poster_url, release_year = excluded.release_year,
+                description = excluded.description, genre = excluded.genre, rating = excluded.rating
+        ''', rows)
+    else:
+        cursor.executemany('''
+            INSERT OR IGNORE INTO movies (imdb_id, title, poster_url, release_year, description, genre, rating)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', rows)
     conn.commit()
+    client.close()
+    
+    for row in rows:
+        print(f"Added: {row[1]}")
+    print(f"Fetched {len(rows)} movies ({len(found) - len(new_ids)} already stored) in "
+          f"{time.perf_counter() - started:.2f}s; {client.stats['requests']} API requests, "
+          f"{client.stats['cache_hits']} cache hits")
     
     cursor.execute("SELECT COUNT(*) FROM movies")
     count = cursor.fetchone()[0]
@@ -144,11 +258,19 @@ def fetch_movies_from_omdb():
         conn.commit()
         print("Sample movies added successfully!")
     
+    cache_posters(conn)
+    scheduled = schedule_shows(conn)
     conn.close()
     print(f"Total movies in database: {count if count > 0 else len(sample_movies)}")
+    print(f"Shows scheduled: {scheduled}")
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Initialize the Movie Reservation System database')
+    parser.add_argument('--refresh', action='store_true', help='re-fetch and update movies that are already stored')
+    parser.add_argument('terms', nargs='*', help='OMDb search terms (defaults to a built-in list)')
+    args = parser.parse_args()
+    
     print("Initializing Movie Reservation System Database...")
     create_tables()
-    fetch_movies_from_omdb()
+    fetch_movies_from_omdb(args.terms, refresh=args.refresh)
     print("Database initialization complete!")
@@ -0,0 +1,242 @@
+"""
+Outbound Email Queue for Movie Reservation System
+Booking emails are written to a durable outbox table and delivered by background workers
+"""
+
+import os
+import smtplib
+import threading
+import time
+
+from flask_mail import Message
+
+from metrics import email_failures, emails_sent
+from offload import NativeThreads
+
+# Errors that reject a single message but leave the SMTP session usable
+MESSAGE_ERRORS = (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError)
+
+def enqueue_email(conn, recipient, subject, body):
+    """Add a message to the outbox inside the caller's transaction"""
+    conn.execute(
+        'INSERT INTO email_outbox (recipient, subject, body, next_attempt_at) VALUES (?, ?, ?, ?)',
+        (recipient, subject, body, time.time())
+    )
+
+class MailQueue:
+    """
+    Delivers queued emails in batches over one reused SMTP connection per worker.
+    Every booking database from storage.shard_databases() has its own outbox.
+    SMTP sessions run on smtp_threads, one real OS thread per worker under gevent.
+    Each pass also counts every outbox's pending messages, so stats() reads no database.
+    Sent messages are deleted once they are older than retention seconds, checked every purge_interval.
+    """
+
+    def __init__(self, app, mail, storage, workers=1, batch_size=20,
+                 poll_interval=5.0, max_attempts=5, backoff=30.0, lease=300.0,
+                 retention=7 * 24 * 3600, purge_interval=3600.0, purge_batch=500):
+        self.app = app
+        self.mail = mail
+        self.storage = storage
+        self.workers = workers
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.lease = lease
+        self.retention = retention
+        self.purge_interval = purge_interval
+        self.purge_batch = purge_batch
+        self.smtp_threads = NativeThreads('smtp', workers)
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._threads = []
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._pending = {}
+        self._purged_at = 0.0
+
+    def start(self):
+        """Start the worker threads if they are not already running"""
+        with self._lock:
+            if self._pid != os.getpid():
+                # Threads do not survive fork(); a forked worker starts its own
+                self._pid = os.getpid()
+                self._threads = []
+            if self._threads:
+                return
+            self._stop.clear()
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f'mail-queue-{i}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def stop(self, timeout=None):
+        """Signal the workers to exit and wait for them"""
+        with self._lock:
+            threads, self._threads = self._threads, []
+        self._stop.set()
+        self._wake.set()
+        for thread in threads:
+            thread.join(timeout)
+
+    def wake(self):
+        """Tell an idle worker that new messages were committed"""
+        self.start()
+        self._wake.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.deliver_pending()
+                if self._purge_due():
+                    self.purge_sent()
+            except Exception as e:
+                print(f"Mail queue error: {e}")
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+    def claim_batch(self, database):
+        """Lease up to batch_size due messages so no other worker sends them"""
+        now = time.time()
+        conn = self.storage.connect_shard(database)
+        try:
+            self._count_pending(conn, database)
+            due = conn.execute(
+                "SELECT 1 FROM email_outbox WHERE status IN ('pending', 'sending') AND next_attempt_at <= ? LIMIT 1",
+                (now,)
+            ).fetchone()
+            if not due:
+                return []
+
+            conn.execute('BEGIN IMMEDIATE')
+            rows = conn.execute('''
+                SELECT id, recipient, subject, body, attempts FROM email_outbox
+                WHERE status IN ('pending', 'sending') AND next_attempt_at <= ?
+                ORDER BY next_attempt_at
+                LIMIT ?
+            ''', (now, self.batch_size)).fetchall()
+            conn.executemany(
+                "UPDATE email_outbox SET status = 'sending', next_attempt_at = ? WHERE id = ?",
+                [(now + self.lease, row['id']) for row in rows]
+            )
+            conn.commit()
+            self._count_pending(conn, database)
+            return rows
+        finally:
+            conn.close()
+
+    def _count_pending(self, conn, database):
+        self._pending[database] = conn.execute(
+            "SELECT COUNT(*) FROM email_outbox WHERE status = 'pending'"
+        ).fetchone()[0]
+
+    def _record(self, database, sent, failed):
+        now = time.time()
+        conn = self.storage.connect_shard(database)
+        try:
+            conn.executemany(
+                "UPDATE email_outbox SET status = 'sent', sent_at = ?, attempts = attempts + 1 WHERE id = ?",
+                [(now, message_id) for message_id in sent]
+            )
+            conn.executemany('''
+                UPDATE email_outbox
+                SET status = CASE WHEN attempts + 1 >= ? THEN 'failed' ELSE 'pending' END,
+                    attempts = attempts + 1, next_attempt_at = ?, last_error = ?
+                WHERE id = ?
+            ''', [
+                (self.max_attempts, now + self.backoff * 2 ** attempts, error, message_id)
+                for message_id, attempts, error in failed
+            ])
+            conn.commit()
+            self._count_pending(conn, database)
+        finally:
+            conn.close()
+        emails_sent.inc(amount=len(sent))
+        email_failures.inc(amount=len(failed))
+
+    def deliver_pending(self):
+        """Send every due message, reusing one SMTP session while batches keep coming"""
+        delivered = 0
+        pending = [(database, rows) for database in self.storage.shard_databases()
+                   for rows in [self.claim_batch(database)] if rows]
+        if not pending:
+            return delivered
+
+        with self.app.app_context():
+            smtp = None
+            try:
+                for database, rows in pending:
+                    if self._stop.is_set():
+                        break
+                    while rows:
+                        sent, failed = [], []
+                        for i, row in enumerate(rows):
+                            try:
+                                if smtp is None:
+                                    smtp = self._smtp(self.mail.connect().__enter__)
+                                message = Message(row['subject'], recipients=[row['recipient']], body=row['body'])
+                                self._smtp(smtp.send, message)
+                                sent.append(row['id'])
+                            except MESSAGE_ERRORS as e:
+                                failed.append((row['id'], row['attempts'], str(e)))
+                            except (smtplib.SMTPException, OSError) as e:
+                                failed.extend((r['id'], r['attempts'], str(e)) for r in rows[i:])
+                                smtp = self._discard(smtp)
+                                break
+                        self._record(database, sent, failed)
+                        delivered += len(sent)
+                        rows = [] if smtp is None or self._stop.is_set() else self.claim_batch(database)
+            finally:
+                self._discard(smtp)
+        return delivered
+
+    def _purge_due(self):
+        """Claim this purge_interval's purge, so one worker thread runs it"""
+        now = time.time()
+        with self._lock:
+            if now - self._purged_at < self.purge_interval:
+                return False
+            self._purged_at = now
+            return True
+
+    def purge_sent(self, now=None):
+        """Delete sent messages older than retention from every outbox, a batch per transaction; returns how many"""
+        cutoff = (now or time.time()) - self.retention
+        purged = 0
+        for database in self.storage.shard_databases():
+            conn = self.storage.connect_shard(database)
+            try:
+                while not self._stop.is_set():
+                    # Small batches keep each write lock short while bookings share the database
+                    deleted = conn.execute('''
+                        DELETE FROM email_outbox WHERE id IN (
+                            SELECT id FROM email_outbox WHERE status = 'sent' AND sent_at < ? LIMIT ?
+                        )
+                    ''', (cutoff, self.purge_batch)).rowcount
+                    conn.commit()
+                    purged += deleted
+                    if deleted < self.purge_batch:
+                        break
+            finally:
+                conn.close()
+        return purged
+
+    def _smtp(self, fn, *args):
+        """Run one SMTP step on the smtp threads; Flask-Mail reads current_app, so the app context goes along"""
+        def step():
+            with self.app.app_context():
+                return fn(*args)
+        return self.smtp_threads.call(step)
+
+    def _discard(self, smtp):
+        if smtp is not None:
+            try:
+                self._smtp(smtp.__exit__, None, None, None)
+            except (smtplib.SMTPException, OSError):
+                pass
+        return None
+
+    def stats(self):
+        """Pending messages across every outbox, as of the workers' latest pass (at most poll_interval old)"""
+        return {'pending': sum(self._pending.copy().values())}
@@ -0,0 +1,173 @@
+"""
+Metrics for Movie Reservation System
+Counters, gauges and latency histograms rendered in the Prometheus text format
+"""
+
+import bisect
+import re
+from collections import defaultdict
+
+from offload import native_lock
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PLACEHOLDER_LIST = re.compile(r'\?(\s*,\s*\?)+')
+WHITESPACE = re.compile(r'\s+')
+STATEMENT_TABLE = re.compile(r'\b(?:FROM|INTO|UPDATE|TABLE)\s+(?:IF\s+(?:NOT\s+)?EXISTS\s+)?([A-Za-z_][\w.]*)', re.IGNORECASE)
+
+def normalize_sql(sql):
+    """Collapse whitespace and IN (?, ?, ...) lists, for logging one statement on one line"""
+    return PLACEHOLDER_LIST.sub('?, ...', WHITESPACE.sub(' ', sql).strip())
+
+def statement_name(sql):
+    """Short metric label for a statement: its verb and the first table it reads or writes, e.g. 'select bookings'"""
+    words = sql.split(None, 1)
+    if not words:
+        return 'empty'
+    verb = words[0].lower()
+    match = STATEMENT_TABLE.search(sql)
+    return f'{verb} {match.group(1).lower()}' if match else verb
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def format_labels(names, values, extra=None):
+    pairs = [f'{name}="{escape_label(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+class Counter:
+    """Monotonic counter with optional labels"""
+
+    kind = 'counter'
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self._values = defaultdict(float)
+        self._lock = native_lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] += amount
+
+    def render(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f'{self.name}{format_labels(self.labels, key)} {value:g}' for key, value in items]
+
+class Gauge:
+    """Value read from a callback at scrape time; with labels, read() returns {label values: value}"""
+
+    kind = 'gauge'
+
+    def __init__(self, name, help_text, read, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.read = read
+        self.labels = labels
+
+    def render(self):
+        if not self.labels:
+            return [f'{self.name} {self.read():g}']
+        return [f'{self.name}{format_labels(self.labels, key)} {value:g}' for key, value in sorted(self.read().items())]
+
+class CounterCallback(Gauge):
+    """Counter whose total is kept elsewhere and read at scrape time"""
+
+    kind = 'counter'
+
+class Histogram:
+    """Cumulative-bucket histogram with optional labels"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = buckets
+        self._series = {}
+        self._lock = native_lock()
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * len(self.buckets), 0.0, 0]
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        with self._lock:
+            items = sorted((key, (list(counts), total, count)) for key, (counts, total, count) in self._series.items())
+        lines = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = format_labels(self.labels, key, 'le="%g"' % bound)
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            labels = format_labels(self.labels, key, 'le="+Inf"')
+            lines.append(f'{self.name}_bucket{labels} {count}')
+            labels = format_labels(self.labels, key)
+            lines.append(f'{self.name}_sum{labels} {total:.6f}')
+            lines.append(f'{self.name}_count{labels} {count}')
+        return lines
+
+class MetricsRegistry:
+    """Holds every metric and renders them for a scrape"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = native_lock()
+
+    def register(self, metric):
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, help_text, labels=()):
+        return self.register(Counter(name, help_text, labels))
+
+    def histogram(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, help_text, labels, buckets))
+
+    def gauge(self, name, help_text, read, labels=()):
+        return self.register(Gauge(name, help_text, read, labels))
+
+    def counter_callback(self, name, help_text, read, labels=()):
+        return self.register(CounterCallback(name, help_text, read, labels))
+
+    def render(self):
+        """Prometheus text exposition of every registered metric"""
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda metric: metric.name)
+        lines = []
+        for metric in metrics:
+            lines.append(f'# HELP {metric.name} {metric.help_text}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+registry = MetricsRegistry()
+
+http_requests = registry.counter(
+    'http_requests_total', 'HTTP requests by endpoint, method and status', ('endpoint', 'method', 'status'))
+http_request_duration = registry.histogram(
+    'http_request_duration_seconds', 'Time spent handling HTTP requests', ('endpoint', 'method'))
+sql_statement_duration = registry.histogram(
+    'sql_statement_duration_seconds', 'Time spent executing and fetching SQL statements', ('statement',))
+sql_statement_rows = registry.counter(
+    'sql_statement_rows_total', 'Rows returned or changed by SQL statements', ('statement',))
+slow_queries = registry.counter(
+    'sql_slow_queries_total', 'SQL statements slower than the slow-query threshold', ('statement',))
+booking_conflicts = registry.counter(
+    'booking_conflicts_total', 'Bookings and holds rejected because seats were taken', ('operation',))
+admission_rejections = registry.counter(
+    'admission_rejections_total', 'Checkouts turned away by admission control', ('reason',))
+emails_sent = registry.counter('emails_sent_total', 'Outbox emails delivered')
+email_failures = registry.counter('email_failures_total', 'Outbox email delivery attempts that failed')
@@ -0,0 +1,53 @@
+"""
+Occupancy Reconciliation for Movie Reservation System
+Rebuilds the per-show booked seat counters from booked_seats in every booking database
+
+    python occupancy.py            # recount and report the shows that had drifted
+    python occupancy.py --check    # report drift only
+"""
+
+import argparse
+import os
+
+from dotenv import load_dotenv
+
+from booking import begin_immediate, create_booking_tables, find_occupancy_drift, rebuild_occupancy
+from storage import create_storage
+
+load_dotenv()
+
+DATABASE = 'database.db'
+
+def reconcile(storage, check_only=False):
+    """Recount (or with check_only just compare) every booking database; returns {database: drift}"""
+    results = {}
+    for database in storage.shard_databases():
+        conn = storage.connect_shard(database)
+        try:
+            if check_only:
+                results[database] = find_occupancy_drift(conn)
+                continue
+            begin_immediate(conn)
+            # Databases created before the counters existed gain the table and triggers here
+            create_booking_tables(conn)
+            results[database] = rebuild_occupancy(conn)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+    return results
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Rebuild per-show occupancy counters from booked seats')
+    parser.add_argument('--check', action='store_true', help='only report shows whose counters drifted')
+    args = parser.parse_args()
+
+    storage = create_storage(os.getenv('STORAGE_BACKEND', 'single'), DATABASE, os.getenv('SHARD_DIR', 'shards'))
+    drifted = 0
+    for database, drift in reconcile(storage, check_only=args.check).items():
+        for show_id, (counted, actual) in sorted(drift.items()):
+            print(f"{database}: show {show_id} counted {counted}, booked_seats has {actual}")
+        drifted += len(drift)
+    print(f"{drifted} show(s) {'drifted' if args.check else 'reconciled'}")
@@ -0,0 +1,174 @@
+"""
+Work Offloading for Movie Reservation System
+Bounded worker pools that keep CPU-heavy and blocking work off the request threads
+"""
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+try:
+    from gevent import monkey as gevent_monkey
+    from gevent.threadpool import ThreadPool as NativeThreadPool, ThreadPoolExecutor as NativeThreadPoolExecutor
+except ImportError:
+    gevent_monkey = None
+
+# Per OS thread even under gevent: marks the native threads this module starts
+_native = (gevent_monkey.get_original('threading', 'local') if gevent_monkey else threading.local)()
+
+def cooperative():
+    """Whether gevent has patched threading in this process, so 'threads' are greenlets sharing one OS thread"""
+    return gevent_monkey is not None and gevent_monkey.is_module_patched('threading')
+
+def native_lock():
+    """
+    A lock that also excludes real OS threads when gevent has patched threading.
+    It blocks the whole OS thread while contended, so it must never be held across a call that yields.
+    """
+    if cooperative():
+        return gevent_monkey.get_original('threading', 'Lock')()
+    return threading.Lock()
+
+class PoolSaturated(Exception):
+    """Raised instead of queueing when a pool already has max_pending jobs waiting or running"""
+
+    def __init__(self, name):
+        super().__init__(f"Worker pool '{name}' is saturated")
+        self.name = name
+
+class BoundedPool:
+    """
+    Wraps a thread or process pool with a limit on queued jobs, so a burst is
+    refused immediately rather than growing an unbounded backlog, and counts
+    queued, running, completed and rejected jobs for the metrics endpoint.
+    The executor is created on first use, and again in a forked worker, whose
+    copy of the parent's executor has no threads or processes behind it.
+    Under gevent its threads are real OS threads, not greenlets.
+    """
+
+    def __init__(self, name, workers, max_pending=None, processes=False):
+        self.name = name
+        self.workers = workers
+        self.max_pending = max_pending
+        self.processes = processes
+        self._executor = None
+        self._pid = os.getpid()
+        self._stats = {'queued': 0, 'running': 0, 'completed': 0, 'rejected': 0}
+        self._lock = native_lock()
+
+    def _create(self):
+        if not self.processes:
+            if cooperative():
+                # Patched threads would be greenlets taking turns with the requests they are meant to offload
+                return NativeThreadPoolExecutor(self.workers)
+            return ThreadPoolExecutor(self.workers, thread_name_prefix=f'{self.name}-pool')
+        # Forking a process that already runs threads can copy held locks; start workers from a clean process
+        method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+        return ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context(method))
+
+    def submit(self, fn, *args):
+        """Queue fn(*args) and return its future; raises PoolSaturated when the pool is full"""
+        with self._lock:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._executor = None
+                self._stats = dict.fromkeys(self._stats, 0)
+            pending = self._stats['queued'] + self._stats['running']
+            if self.max_pending is not None and pending >= self.max_pending:
+                self._stats['rejected'] += 1
+                raise PoolSaturated(self.name)
+            if self._executor is None:
+                self._executor = self._create()
+            self._stats['queued'] += 1
+
+        future = self._executor.submit(self._track(fn) if not self.processes else fn, *args)
+        if self.processes:
+            # Process jobs cannot report their start, so they count as running once queued
+            with self._lock:
+                self._stats['queued'] -= 1
+                self._stats['running'] += 1
+        future.add_done_callback(self._done)
+        return future
+
+    def _track(self, fn):
+        def run(*args):
+            _native.thread = True
+            with self._lock:
+                self._stats['queued'] -= 1
+                self._stats['running'] += 1
+            return fn(*args)
+        return run
+
+    def _done(self, future):
+        with self._lock:
+            if self.processes or not future.cancelled():
+                self._stats['running'] -= 1
+            else:
+                self._stats['queued'] -= 1
+            self._stats['completed'] += 1
+
+    def call(self, fn, *args, timeout=None):
+        """Run fn(*args) in the pool and wait for its result"""
+        return self.submit(fn, *args).result(timeout)
+
+    def map(self, fn, iterable):
+        """Like Executor.map, subject to the same limit"""
+        futures = [self.submit(fn, item) for item in iterable]
+        return [future.result() for future in futures]
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, workers=self.workers, max_pending=self.max_pending)
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+class NativeThreads:
+    """
+    Runs blocking calls on up to `workers` real OS threads when gevent has patched
+    the process, so a call that waits - on a SQLite lock, the disk or a socket -
+    suspends only the greenlet that made it, not every request of the worker.
+    Without gevent, or when already on one of these native threads, calls run directly.
+    """
+
+    def __init__(self, name, workers):
+        self.name = name
+        self.workers = workers
+        self._threads = None
+        self._pid = os.getpid()
+        self._stats = {'queued': 0, 'running': 0, 'completed': 0}
+        self._lock = native_lock()
+
+    def call(self, fn, *args):
+        """Return fn(*args), computed on one of the pool's threads if the caller is a greenlet"""
+        if not cooperative() or getattr(_native, 'thread', False):
+            return fn(*args)
+
+        if self._threads is None or self._pid != os.getpid():
+            # A forked worker's copy of the parent's pool has no threads behind it
+            self._pid = os.getpid()
+            self._threads = NativeThreadPool(self.workers)
+            self._stats = dict.fromkeys(self._stats, 0)
+        with self._lock:
+            self._stats['queued'] += 1
+        return self._threads.apply(self._run, (fn, args))
+
+    def _run(self, fn, args):
+        _native.thread = True
+        with self._lock:
+            self._stats['queued'] -= 1
+            self._stats['running'] += 1
+        try:
+            return fn(*args)
+        finally:
+            with self._lock:
+                self._stats['running'] -= 1
+                self._stats['completed'] += 1
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, workers=self.workers)
@@ -0,0 +1,73 @@
+"""
+OMDb API Client for Movie Reservation System
+Shared keep-alive HTTP session with an on-disk response cache
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+class OmdbClient:
+    """Thread-safe OMDb client; responses are cached on disk for cache_ttl seconds"""
+
+    def __init__(self, api_key, base_url='https://www.omdbapi.com/', cache_dir='.omdb_cache',
+                 cache_ttl=86400, pool_size=16, timeout=10):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.cache_dir = cache_dir
+        self.cache_ttl = cache_ttl
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.stats = {'requests': 0, 'cache_hits': 0}
+        self._stats_lock = threading.Lock()
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def _cache_path(self, params):
+        key = json.dumps(params, sort_keys=True)
+        return os.path.join(self.cache_dir, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.json')
+
+    def get(self, **params):
+        """Fetch one OMDb response, from the disk cache when it is fresh enough"""
+        path = self._cache_path(params) if self.cache_dir else None
+        if path and os.path.exists(path) and time.time() - os.path.getmtime(path) < self.cache_ttl:
+            with open(path, encoding='utf-8') as f:
+                data = json.load(f)
+            self._count('cache_hits')
+            return data
+
+        response = self.session.get(self.base_url, params={'apikey': self.api_key, **params}, timeout=self.timeout)
+        response.raise_for_status()
+        data = response.json()
+        self._count('requests')
+
+        if path:
+            tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, path)
+        return data
+
+    def _count(self, name):
+        with self._stats_lock:
+            self.stats[name] += 1
+
+    def search(self, term):
+        """Search movies by title keyword"""
+        return self.get(s=term, type='movie')
+
+    def details(self, imdb_id):
+        """Fetch full details of one movie"""
+        return self.get(i=imdb_id, plot='short')
+
+    def close(self):
+        """Close pooled HTTP connections"""
+        self.session.close()
@@ -0,0 +1,32 @@
+"""
+Keyset Pagination Helpers for Movie Reservation System
+Opaque cursors carry the sort key of the last row on a page
+"""
+
+import base64
+import binascii
+import json
+
+def encode_cursor(*values):
+    """Encode the sort key of the last row into an opaque URL-safe cursor"""
+    raw = json.dumps(values, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor, types):
+    """Decode a cursor back into its sort key, one value per type in types; returns None when missing or malformed"""
+    if not cursor:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (binascii.Error, ValueError):
+        return None
+    if not isinstance(values, list) or len(values) != len(types):
+        return None
+    # bool is an int subclass, but no sort key column holds one
+    if any(isinstance(value, bool) or not isinstance(value, kind) for value, kind in zip(values, types)):
+        return None
+    return values
+
+def page_size(requested, default, maximum):
+    """Clamp a requested page size to 1..maximum"""
+    return min(max(requested or default, 1), maximum)
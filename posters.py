@@ -0,0 +1,151 @@
+"""
+Poster Image Cache for Movie Reservation System
+Downloads each poster once and keeps resized variants on disk for local serving
+
+    python posters.py          # cache posters of every stored movie that is missing one
+"""
+
+import hashlib
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+# Target widths; without Pillow (a listed requirement) every variant is served from the original download
+VARIANTS = {'thumb': 160, 'card': 320, 'large': 600}
+ORIGINAL = 'original'
+EXTENSIONS = {'image/jpeg': '.jpg', 'image/png': '.png', 'image/webp': '.webp', 'image/gif': '.gif'}
+MAX_POSTER_BYTES = 5 * 1024 * 1024
+KEY_PATTERN = re.compile(r'^[0-9a-f]{16}$')
+
+def resizing_available():
+    """True when Pillow is installed and posters get resized variants"""
+    return Image is not None
+
+def poster_key(url):
+    """Stable cache key for a poster URL; a new URL gets a new key, so served files never change in place"""
+    return hashlib.sha1(url.encode('utf-8')).hexdigest()[:16]
+
+def is_remote(url):
+    return bool(url) and url.startswith(('http://', 'https://'))
+
+class PosterCache:
+    """Thread-safe poster downloader; files live under cache_dir/<key>/<variant><ext>"""
+
+    def __init__(self, cache_dir='poster_cache', pool_size=8, timeout=10):
+        self.cache_dir = cache_dir
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.stats = {'downloads': 0, 'cached': 0, 'failures': 0}
+        self._stats_lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _directory(self, key):
+        return os.path.join(self.cache_dir, key)
+
+    def find(self, key, variant):
+        """Path of a cached variant (or the original when that variant was not produced), else None"""
+        if not KEY_PATTERN.match(key):
+            return None
+        try:
+            names = os.listdir(self._directory(key))
+        except OSError:
+            return None
+        for wanted in (variant, ORIGINAL):
+            for name in names:
+                if os.path.splitext(name)[0] == wanted:
+                    return os.path.join(self._directory(key), name)
+        return None
+
+    def fetch(self, url):
+        """Download one poster and write its variants; return its key, or None if it could not be cached"""
+        if not is_remote(url):
+            return None
+        key = poster_key(url)
+        if self.find(key, ORIGINAL):
+            self._count('cached')
+            return key
+
+        try:
+            response = self.session.get(url, timeout=self.timeout, stream=True)
+            response.raise_for_status()
+            extension = EXTENSIONS.get(response.headers.get('Content-Type', '').split(';')[0].strip())
+            if extension is None:
+                raise ValueError(f"unexpected content type '{response.headers.get('Content-Type')}'")
+            data = response.raw.read(MAX_POSTER_BYTES + 1, decode_content=True)
+            response.close()
+            if len(data) > MAX_POSTER_BYTES:
+                raise ValueError(f"poster larger than {MAX_POSTER_BYTES} bytes")
+        except (requests.RequestException, ValueError) as e:
+            print(f"Error caching poster {url}: {e}")
+            self._count('failures')
+            return None
+
+        os.makedirs(self._directory(key), exist_ok=True)
+        for variant, body, ext in self._variants(data):
+            self._write(key, variant + ext, body)
+        # The original is written last: its presence marks the poster as fully cached
+        self._write(key, ORIGINAL + extension, data)
+        self._count('downloads')
+        return key
+
+    def _variants(self, data):
+        """Yield (variant, bytes, extension) for each width smaller than the original"""
+        if Image is None:
+            return
+        try:
+            image = Image.open(BytesIO(data))
+            image.load()
+        except Exception as e:
+            print(f"Error resizing poster: {e}")
+            return
+        image = image.convert('RGB')
+        for variant, width in VARIANTS.items():
+            if width >= image.width:
+                continue
+            resized = image.resize((width, round(image.height * width / image.width)), Image.LANCZOS)
+            buffer = BytesIO()
+            resized.save(buffer, 'JPEG', quality=85, optimize=True, progressive=True)
+            yield variant, buffer.getvalue(), '.jpg'
+
+    def _write(self, key, name, data):
+        path = os.path.join(self._directory(key), name)
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def fetch_all(self, urls, workers=8):
+        """Cache many posters concurrently; returns {url: key or None}"""
+        urls = list(dict.fromkeys(url for url in urls if is_remote(url)))
+        if not urls:
+            return {}
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='poster-fetch') as pool:
+            return dict(zip(urls, pool.map(self.fetch, urls)))
+
+    def _count(self, name):
+        with self._stats_lock:
+            self.stats[name] += 1
+
+    def close(self):
+        """Close pooled HTTP connections"""
+        self.session.close()
+
+if __name__ == '__main__':
+    from init_db import cache_posters, get_db_connection
+
+    conn = get_db_connection()
+    cache_posters(conn)
+    conn.close()
@@ -0,0 +1,90 @@
+"""
+Movie Search for Movie Reservation System
+Full-text search over the movie catalog using SQLite FTS5, with a LIKE fallback
+"""
+
+import re
+import sqlite3
+
+# Column weights for bm25(): title matches rank above genre, genre above description
+BM25_WEIGHTS = (10.0, 5.0, 1.0)
+TOKEN_PATTERN = re.compile(r'\w+', re.UNICODE)
+
+SEARCH_TRIGGERS = [
+    '''
+    CREATE TRIGGER IF NOT EXISTS movies_fts_insert AFTER INSERT ON movies BEGIN
+        INSERT INTO movies_fts (rowid, title, genre, description)
+        VALUES (new.id, new.title, new.genre, new.description);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS movies_fts_delete AFTER DELETE ON movies BEGIN
+        INSERT INTO movies_fts (movies_fts, rowid, title, genre, description)
+        VALUES ('delete', old.id, old.title, old.genre, old.description);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS movies_fts_update AFTER UPDATE OF title, genre, description ON movies BEGIN
+        INSERT INTO movies_fts (movies_fts, rowid, title, genre, description)
+        VALUES ('delete', old.id, old.title, old.genre, old.description);
+        INSERT INTO movies_fts (rowid, title, genre, description)
+        VALUES (new.id, new.title, new.genre, new.description);
+    END
+    ''',
+]
+
+def create_search_index(conn):
+    """Create the FTS5 index and sync triggers; returns False when FTS5 is not compiled in"""
+    if has_search_index(conn):
+        return True
+
+    try:
+        conn.execute('''
+            CREATE VIRTUAL TABLE movies_fts USING fts5(
+                title, genre, description,
+                content='movies', content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2',
+                prefix='2 3'
+            )
+        ''')
+    except sqlite3.OperationalError as e:
+        print(f"FTS5 unavailable, movie search will use LIKE: {e}")
+        return False
+
+    for trigger in SEARCH_TRIGGERS:
+        conn.execute(trigger)
+    conn.execute("INSERT INTO movies_fts (movies_fts) VALUES ('rebuild')")
+    conn.commit()
+    return True
+
+def has_search_index(conn):
+    """Whether the database has the FTS5 movie index"""
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'movies_fts'").fetchone() is not None
+
+def build_match_query(query):
+    """Turn free text into an FTS5 query where every word is a prefix match"""
+    tokens = TOKEN_PATTERN.findall(query)
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+def search_movies(conn, query, limit, offset=0, use_fts=True):
+    """Return movies matching query, best match first"""
+    match = build_match_query(query)
+    if not match:
+        return conn.execute(
+            'SELECT * FROM movies ORDER BY title LIMIT ? OFFSET ?', (limit, offset)
+        ).fetchall()
+
+    if use_fts:
+        return conn.execute(f'''
+            SELECT m.* FROM movies_fts
+            JOIN movies m ON m.id = movies_fts.rowid
+            WHERE movies_fts MATCH ?
+            ORDER BY bm25(movies_fts, {', '.join(map(str, BM25_WEIGHTS))}), m.title
+            LIMIT ? OFFSET ?
+        ''', (match, limit, offset)).fetchall()
+
+    pattern = f'%{query.strip().lower()}%'
+    return conn.execute(
+        'SELECT * FROM movies WHERE LOWER(title) LIKE ? OR LOWER(genre) LIKE ? ORDER BY title LIMIT ? OFFSET ?',
+        (pattern, pattern, limit, offset)
+    ).fetchall()
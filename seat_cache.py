@@ -0,0 +1,109 @@
+"""
+Seat Occupancy Cache for Movie Reservation System
+Keeps one bitmap per show so seat maps can be served without a database query
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+class SeatMapCache:
+    """
+    Per-show seat occupancy stored as an integer bitmap (one bit per seat).
+    At most max_shows shows are kept; the least recently used one is dropped first.
+    A load that raced with mark_booked, mark_free or invalidate for its show is returned but not cached.
+    """
+
+    def __init__(self, rows, cols, ttl=5.0, max_shows=5000):
+        self.seat_ids = [f"{row}{col}" for row in rows for col in cols]
+        self.seat_bits = {seat: 1 << i for i, seat in enumerate(self.seat_ids)}
+        self.ttl = ttl
+        self.max_shows = max_shows
+        self._shows = OrderedDict()
+        # Loads in flight per show, and how many changes each show has seen since its first load started
+        self._loads = {}
+        self._changes = {}
+        self._lock = threading.Lock()
+
+    def to_bitmap(self, seats):
+        """Convert an iterable of seat ids into a bitmap"""
+        bitmap = 0
+        for seat in seats:
+            bitmap |= self.seat_bits.get(seat, 0)
+        return bitmap
+
+    def to_seats(self, bitmap):
+        """Convert a bitmap back into the ordered list of seat ids"""
+        return [seat for i, seat in enumerate(self.seat_ids) if bitmap >> i & 1]
+
+    def get(self, key, loader):
+        """
+        Return the bitmap for a show, calling loader() for the seat list on a miss.
+        A loader returning None (no such show) yields None and caches nothing.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._shows.get(key)
+            if entry and now - entry[1] < self.ttl:
+                self._shows.move_to_end(key)
+                return entry[0]
+            self._loads[key] = self._loads.get(key, 0) + 1
+            changes = self._changes.get(key, 0)
+
+        bitmap = None
+        try:
+            seats = loader()
+            bitmap = None if seats is None else self.to_bitmap(seats)
+        finally:
+            with self._lock:
+                # A change during the load may be missing from what it read; caching it would hide that change
+                current = self._changes.get(key, 0) == changes
+                self._loads[key] -= 1
+                if not self._loads[key]:
+                    del self._loads[key]
+                    self._changes.pop(key, None)
+                if bitmap is not None and current:
+                    self._shows[key] = (bitmap, now)
+                    self._shows.move_to_end(key)
+                    while len(self._shows) > self.max_shows:
+                        self._shows.popitem(last=False)
+        return bitmap
+
+    def mark_booked(self, key, seats):
+        """Set the bits for newly booked seats if the show is cached"""
+        bits = self.to_bitmap(seats)
+        with self._lock:
+            self._changed(key)
+            entry = self._shows.get(key)
+            if entry:
+                self._shows[key] = (entry[0] | bits, entry[1])
+
+    def mark_free(self, key, seats):
+        """Clear the bits for released seats if the show is cached"""
+        bits = self.to_bitmap(seats)
+        with self._lock:
+            self._changed(key)
+            entry = self._shows.get(key)
+            if entry:
+                self._shows[key] = (entry[0] & ~bits, entry[1])
+
+    def invalidate(self, key=None):
+        """Drop one show, or every show when key is None"""
+        with self._lock:
+            if key is None:
+                self._shows.clear()
+                for loading in self._loads:
+                    self._changed(loading)
+            else:
+                self._changed(key)
+                self._shows.pop(key, None)
+
+    def _changed(self, key):
+        """Note a change to a show that is being loaded; call with the lock held"""
+        if key in self._loads:
+            self._changes[key] = self._changes.get(key, 0) + 1
+
+    @staticmethod
+    def etag(bitmap):
+        """ETag for a seat map; identical occupancy always yields the same tag"""
+        return f"seats-{bitmap:x}"
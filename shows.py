@@ -0,0 +1,92 @@
+"""
+Show Scheduling for Movie Reservation System
+Each screening is a row in the shows table keyed by an integer show id
+"""
+
+from datetime import date, datetime, timedelta
+
+DEFAULT_SHOWTIMES = '10:00 AM,1:00 PM,4:00 PM,7:00 PM,10:00 PM'
+DEFAULT_HALL = 'Hall 1'
+DEFAULT_CAPACITY = 80
+SCHEDULE_DAYS = 7
+
+def to_24h(showtime):
+    """Convert '7:00 PM' into '19:00'"""
+    return datetime.strptime(showtime.strip(), '%I:%M %p').strftime('%H:%M')
+
+def format_start_time(start_time):
+    """Convert '19:00' into '7:00 PM'"""
+    return datetime.strptime(start_time, '%H:%M').strftime('%I:%M %p').lstrip('0')
+
+def show_label(show):
+    """Human readable date and time of a show, e.g. 'Sun 18 Oct 2026, 7:00 PM'"""
+    show_date = date.fromisoformat(show['show_date'])
+    return f"{show_date:%a %d %b %Y}, {format_start_time(show['start_time'])}"
+
+def show_is_open(show, now=None):
+    """Whether a show has not started yet"""
+    now = now or datetime.now()
+    return f"{show['show_date']} {show['start_time']}" > now.strftime('%Y-%m-%d %H:%M')
+
+def schedule_shows(conn, days=SCHEDULE_DAYS, start=None, movie_id=None, capacity=DEFAULT_CAPACITY):
+    """Create shows for the next `days` days from each movie's daily showtimes template"""
+    start = start or date.today()
+    query = 'SELECT id, showtimes FROM movies'
+    params = ()
+    if movie_id is not None:
+        query += ' WHERE id = ?'
+        params = (movie_id,)
+
+    rows = []
+    for movie in conn.execute(query, params).fetchall():
+        times = [to_24h(s) for s in (movie['showtimes'] or DEFAULT_SHOWTIMES).split(',') if s.strip()]
+        for offset in range(days):
+            show_date = (start + timedelta(days=offset)).isoformat()
+            rows.extend((movie['id'], show_date, t, DEFAULT_HALL, capacity) for t in times)
+
+    conn.executemany(
+        'INSERT OR IGNORE INTO shows (movie_id, show_date, start_time, hall, capacity) VALUES (?, ?, ?, ?, ?)',
+        rows
+    )
+    conn.commit()
+    return len(rows)
+
+def get_show(conn, show_id):
+    """Return a show joined with its movie, or None"""
+    return conn.execute('''
+        SELECT s.*, m.title, m.poster_url
+        FROM shows s
+        JOIN movies m ON s.movie_id = m.id
+        WHERE s.id = ?
+    ''', (show_id,)).fetchone()
+
+def get_shows(conn, show_ids):
+    """Return {show_id: show joined with its movie} for several shows in one query"""
+    show_ids = list(show_ids)
+    if not show_ids:
+        return {}
+    rows = conn.execute(f'''
+        SELECT s.*, m.title, m.poster_url
+        FROM shows s
+        JOIN movies m ON s.movie_id = m.id
+        WHERE s.id IN ({','.join('?' * len(show_ids))})
+    ''', show_ids).fetchall()
+    return {row['id']: row for row in rows}
+
+def get_upcoming_shows(conn, movie_id, today=None):
+    """Return a movie's shows from today onwards in date and time order"""
+    today = (today or date.today()).isoformat()
+    return conn.execute('''
+        SELECT * FROM shows
+        WHERE movie_id = ? AND show_date >= ?
+        ORDER BY show_date, start_time
+    ''', (movie_id, today)).fetchall()
+
+def get_shows_by_date(conn, first_day, last_day, movie_id=None):
+    """Return shows dated first_day to last_day (ISO dates, inclusive), optionally for one movie"""
+    query = 'SELECT * FROM shows WHERE show_date BETWEEN ? AND ?'
+    params = [first_day, last_day]
+    if movie_id is not None:
+        query += ' AND movie_id = ?'
+        params.append(movie_id)
+    return conn.execute(query + ' ORDER BY movie_id, show_date, start_time', params).fetchall()
@@ -77,9 +77,59 @@ document.addEventListener('DOMContentLoaded', function() {
         updateDisplay();
     });
     
+    function setSeatState(seatId, booked) {
+        const seat = seatMap.querySelector(`[data-seat="${seatId}"]`);
+        if (!seat) return;
+        
+        if (booked) {
+            if (selectedSeats.delete(seatId)) {
+                alert(`Seat ${seatId} was just taken by someone else.`);
+            }
+            seat.classList.remove('available', 'selected');
+            seat.classList.add('booked');
+            seat.disabled = true;
+        } else if (seat.classList.contains('booked')) {
+            seat.classList.remove('booked');
+            seat.classList.add('available');
+            seat.disabled = false;
+        }
+    }
+    
+    function listenForSeatChanges() {
+        const streamUrl = seatMap.dataset.streamUrl;
+        if (!streamUrl || !window.EventSource) return;
+        
+        const source = new EventSource(streamUrl);
+        
+        source.addEventListener('snapshot', function(e) {
+            const booked = new Set(JSON.parse(e.data).booked);
+            seatMap.querySelectorAll('.seat').forEach(seat => {
+                setSeatState(seat.dataset.seat, booked.has(seat.dataset.seat));
+            });
+            updateDisplay();
+        });
+        
+        source.addEventListener('taken', function(e) {
+            JSON.parse(e.data).seats.forEach(seatId => setSeatState(seatId, true));
+            updateDisplay();
+        });
+        
+        source.addEventListener('freed', function(e) {
+            JSON.parse(e.data).seats.forEach(seatId => setSeatState(seatId, false));
+            updateDisplay();
+        });
+        
+        window.addEventListener('beforeunload', () => source.close());
+    }
+    
     const bookingForm = document.getElementById('bookingForm');
     if (bookingForm) {
         bookingForm.addEventListener('submit', function(e) {
+            if (e.submitter && e.submitter.name === 'auto_assign') {
+                e.submitter.innerHTML = '<span class="loading me-2"></span>Finding seats...';
+                return true;
+            }
+            
             if (selectedSeats.size === 0) {
                 e.preventDefault();
                 alert('Please select at least one seat before booking.');
@@ -94,4 +144,5 @@ document.addEventListener('DOMContentLoaded', function() {
     }
     
     updateDisplay();
+    listenForSeatChanges();
 });
@@ -0,0 +1,48 @@
+/* Waiting Room JavaScript */
+
+document.addEventListener('DOMContentLoaded', function() {
+    const waitingRoom = document.getElementById('waitingRoom');
+    if (!waitingRoom) return;
+    
+    const form = document.getElementById('admissionForm');
+    const position = document.getElementById('queuePosition');
+    const wait = document.getElementById('queueWait');
+    const message = document.getElementById('queueMessage');
+    let interval = parseFloat(waitingRoom.dataset.pollInterval) * 1000;
+    
+    function poll() {
+        fetch(waitingRoom.dataset.statusUrl, { headers: { 'Accept': 'application/json' } })
+            .then(response => response.json().then(data => ({ ok: response.ok, status: response.status, data: data })))
+            .then(({ ok, status, data }) => {
+                if (status === 404) {
+                    // The ticket lapsed; the form still carries its idempotency key, so resubmitting is safe
+                    message.textContent = 'Your place in line expired - rejoining the queue...';
+                    form.submit();
+                    return;
+                }
+                if (status === 503) {
+                    // The line is briefly busy; the ticket still holds its place
+                    message.textContent = data.error;
+                    setTimeout(poll, data.poll_interval * 1000);
+                    return;
+                }
+                if (!ok) {
+                    message.textContent = data.error;
+                    message.classList.add('text-danger');
+                    return;
+                }
+                if (data.status === 'admitted') {
+                    message.textContent = "It's your turn - completing your booking...";
+                    form.submit();
+                    return;
+                }
+                position.textContent = data.position;
+                wait.textContent = Math.max(1, Math.ceil(data.estimated_wait));
+                interval = data.poll_interval * 1000;
+                setTimeout(poll, interval);
+            })
+            .catch(() => setTimeout(poll, interval * 2));
+    }
+    
+    setTimeout(poll, interval);
+});
@@ -0,0 +1,276 @@
+"""
+Storage Backends for Movie Reservation System
+Decide which SQLite file holds each show's bookings, seats, holds and booking emails
+"""
+
+import os
+import re
+import threading
+import uuid
+
+from booking import create_booking_tables
+from db import connect_readonly, get_pool
+from offload import BoundedPool
+
+CATALOG_ALIAS = 'catalog'
+# Idle connections kept per shard; with hundreds of shards their file descriptors add up
+SHARD_POOL_IDLE = 4
+# Booking and hold ids minted by ShardedStorage end in M<movie id>
+RECORD_MOVIE = re.compile(r'^[A-Z]{2}[0-9A-F]{8}M([0-9]+)$')
+
+def create_shard_routes(conn):
+    """Create the routing table that maps movies to their booking database"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS shard_routes (
+            movie_id INTEGER PRIMARY KEY,
+            database TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+class SingleFileStorage:
+    """Every table lives in one database file (the default backend)"""
+
+    name = 'single'
+
+    def __init__(self, database, max_workers=8):
+        self.database = database
+        self.max_workers = max_workers
+        self.pool = BoundedPool('storage-scatter', max_workers)
+
+    def connect(self):
+        """Connection to the catalog database (users, movies, shows)"""
+        return get_pool(self.database).connect()
+
+    def connect_shard(self, database):
+        """Connection to one booking database"""
+        return get_pool(database).connect()
+
+    def connect_readonly(self, database):
+        """Unpooled read-only connection to one booking database, for long scans"""
+        return connect_readonly(database)
+
+    def shard_for_movie(self, movie_id):
+        """Path of the database holding a movie's bookings"""
+        return self.database
+
+    def shard_for_show(self, show_id):
+        """Path of the database holding a show's bookings"""
+        return self.database
+
+    def connect_for_movie(self, movie_id):
+        return self.connect_shard(self.shard_for_movie(movie_id))
+
+    def connect_for_show(self, show_id):
+        return self.connect_shard(self.shard_for_show(show_id))
+
+    def shard_databases(self):
+        """Every database that can hold bookings"""
+        return [self.database]
+
+    def new_record_id(self, prefix, movie_id):
+        """Random id for a new booking (BK) or seat hold (HD) on one of a movie's shows"""
+        return f"{prefix}{uuid.uuid4().hex[:8].upper()}"
+
+    def shard_for_record(self, record_id):
+        """Database holding a booking or hold, or None when its id does not say and every database must be searched"""
+        return self.database
+
+    def preload(self):
+        """Look up routing state ahead of the first request; a single file has none"""
+
+    def group_shows(self, shows):
+        """{database: [show ids]} for the booking databases that can hold any of these shows' bookings"""
+        show_ids = [show['id'] for show in shows]
+        return {self.database: show_ids} if show_ids else {}
+
+    def _run_each(self, databases, query):
+        """Run query(conn, database) against each database, in parallel when there are several"""
+        def run(database):
+            conn = self.connect_shard(database)
+            try:
+                return query(conn, database)
+            finally:
+                conn.close()
+
+        if len(databases) == 1:
+            return [run(databases[0])]
+        return self.pool.map(run, databases)
+
+    def scatter(self, query):
+        """Run query(conn) against every booking database and return the results in shard order"""
+        return self._run_each(self.shard_databases(), lambda conn, database: query(conn))
+
+    def scatter_shows(self, shows, query):
+        """Run query(conn, show_ids) only against the databases holding these shows, one call per database"""
+        groups = self.group_shows(shows)
+        return self._run_each(list(groups), lambda conn, database: query(conn, groups[database]))
+
+    def find(self, query):
+        """Return (database, result) for the first shard where query(conn) is not None, else (None, None)"""
+        for database, result in zip(self.shard_databases(), self.scatter(query)):
+            if result is not None:
+                return database, result
+        return None, None
+
+    def find_record(self, record_id, query):
+        """Like find() for one booking or hold, asking only the database its id names when it names one"""
+        database = self.shard_for_record(record_id)
+        if database is None:
+            return self.find(query)
+        conn = self.connect_shard(database)
+        try:
+            result = query(conn)
+        finally:
+            conn.close()
+        return (database, result) if result is not None else (None, None)
+
+class ShardedStorage(SingleFileStorage):
+    """
+    Bookings, seats, holds and booking emails for each movie live in their own
+    file under shard_dir, so bookings for different films commit in parallel.
+    Users, movies and shows stay in the catalog database, which every shard
+    connection attaches read-only so existing joins keep working.
+    The catalog's shard_routes table records which file serves which movie.
+    """
+
+    name = 'sharded'
+
+    def __init__(self, database, shard_dir='shards', max_workers=8):
+        super().__init__(database, max_workers)
+        self.shard_dir = shard_dir
+        self._routes = {}
+        self._show_movies = {}
+        self._lock = threading.Lock()
+        os.makedirs(shard_dir, exist_ok=True)
+
+    def connect_shard(self, database):
+        if database == self.database:
+            return get_pool(database).connect()
+        return get_pool(database, attach={CATALOG_ALIAS: self.database}, max_idle=SHARD_POOL_IDLE).connect()
+
+    def connect_readonly(self, database):
+        if database == self.database:
+            return connect_readonly(database)
+        return connect_readonly(database, attach={CATALOG_ALIAS: self.database})
+
+    def shard_for_movie(self, movie_id):
+        """Look up a movie's shard, creating the file and its route on first use"""
+        database = self._routes.get(movie_id)
+        if database:
+            return database
+
+        with self._lock:
+            conn = self.connect()
+            try:
+                row = conn.execute('SELECT database FROM shard_routes WHERE movie_id = ?', (movie_id,)).fetchone()
+                if row:
+                    database = row['database']
+                else:
+                    database = os.path.join(self.shard_dir, f"movie_{movie_id}.db")
+                    # Build the shard before publishing its route so no reader finds an empty file
+                    shard = self.connect_shard(database)
+                    create_booking_tables(shard)
+                    shard.commit()
+                    shard.close()
+                    conn.execute(
+                        'INSERT OR IGNORE INTO shard_routes (movie_id, database) VALUES (?, ?)',
+                        (movie_id, database)
+                    )
+                    conn.commit()
+                    database = conn.execute(
+                        'SELECT database FROM shard_routes WHERE movie_id = ?', (movie_id,)
+                    ).fetchone()['database']
+            finally:
+                conn.close()
+            self._routes[movie_id] = database
+        return database
+
+    def shard_for_show(self, show_id):
+        """Route a show through its movie; unknown shows fall back to the catalog database"""
+        movie_id = self._show_movies.get(show_id)
+        if movie_id is None:
+            conn = self.connect()
+            row = conn.execute('SELECT movie_id FROM shows WHERE id = ?', (show_id,)).fetchone()
+            conn.close()
+            if not row:
+                return self.database
+            movie_id = self._show_movies[show_id] = row['movie_id']
+        return self.shard_for_movie(movie_id)
+
+    def new_record_id(self, prefix, movie_id):
+        """Random id ending in the movie id, so the booking or hold is found in its shard without a search"""
+        return f"{super().new_record_id(prefix, movie_id)}M{movie_id}"
+
+    def shard_for_record(self, record_id):
+        match = RECORD_MOVIE.match(record_id)
+        if not match:
+            # Ids minted before the movie was encoded in them could be in any shard
+            return None
+        movie_id = int(match.group(1))
+        database = self._routes.get(movie_id)
+        if database is None:
+            conn = self.connect()
+            row = conn.execute('SELECT database FROM shard_routes WHERE movie_id = ?', (movie_id,)).fetchone()
+            conn.close()
+            if not row:
+                # A movie without a shard has never had a booking or hold
+                return self.database
+            database = self._routes[movie_id] = row['database']
+        return database
+
+    def preload(self):
+        """Load every shard route and show-to-movie mapping, e.g. once before forking workers"""
+        conn = self.connect()
+        try:
+            routes = conn.execute('SELECT movie_id, database FROM shard_routes').fetchall()
+            shows = conn.execute('SELECT id, movie_id FROM shows').fetchall()
+        finally:
+            conn.close()
+        self._routes.update((row['movie_id'], row['database']) for row in routes)
+        self._show_movies.update((row['id'], row['movie_id']) for row in shows)
+
+    def group_shows(self, shows):
+        """
+        The catalog database with every show (for bookings made before sharding), plus the shard of each
+        routed movie with its shows. Movies without a route have no shard and no bookings in one yet, so
+        nothing is created for them.
+        """
+        show_ids = [show['id'] for show in shows]
+        if not show_ids:
+            return {}
+
+        missing = list({show['movie_id'] for show in shows} - self._routes.keys())
+        if missing:
+            conn = self.connect()
+            try:
+                rows = conn.execute(
+                    f"SELECT movie_id, database FROM shard_routes WHERE movie_id IN ({','.join('?' * len(missing))})",
+                    missing
+                ).fetchall()
+            finally:
+                conn.close()
+            self._routes.update((row['movie_id'], row['database']) for row in rows)
+
+        groups = {self.database: show_ids}
+        for show in shows:
+            self._show_movies[show['id']] = show['movie_id']
+            database = self._routes.get(show['movie_id'])
+            if database and database != self.database:
+                groups.setdefault(database, []).append(show['id'])
+        return groups
+
+    def shard_databases(self):
+        """The catalog database (for bookings made before sharding) plus every routed shard"""
+        conn = self.connect()
+        rows = conn.execute('SELECT DISTINCT database FROM shard_routes ORDER BY database').fetchall()
+        conn.close()
+        return [self.database] + [row['database'] for row in rows]
+
+def create_storage(backend, database, shard_dir='shards'):
+    """Build the storage backend named by STORAGE_BACKEND"""
+    if backend == SingleFileStorage.name:
+        return SingleFileStorage(database)
+    if backend == ShardedStorage.name:
+        return ShardedStorage(database, shard_dir)
+    raise ValueError(f"Unknown storage backend '{backend}'; expected 'single' or 'sharded'")
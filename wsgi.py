@@ -0,0 +1,11 @@
+"""
+Production Entry Point for Movie Reservation System
+Builds and warms the application once in the master process of a prefork server
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+"""
+
+from app import create_app, warm_start
+
+app = create_app()
+warm_start(app)